@@ -0,0 +1,140 @@
+# beatmap_format.py
+# JSON 비트맵을 시간순으로 정렬된 구조체 배열(.hxbm)로 컴파일하고, 메모리 맵으로 읽어 캐시합니다.
+#
+# 파일 구조: MAGIC(4) | version(uint16) | 메타데이터 길이(uint32) | 노트 수(uint32) | 메타데이터 JSON
+#           | NOTE_DTYPE 노트 배열 | 시간 인덱스(int32, index_step초마다 그 시각 이후 첫 노트 번호)
+# 사용법: python beatmap_format.py level1.json [level1.hxbm]
+import json
+import math
+import os
+import struct
+import sys
+import numpy as np
+
+MAGIC = b'HXBM'
+VERSION = 1
+HEADER = struct.Struct('<4sHII')
+INDEX_STEP = 1.0  # 초
+
+NOTE_TYPES = ('tap', 'hold', 'swipe')
+DIRECTIONS = {None: 0, "LEFT": -1, "RIGHT": 1}
+DIRECTION_NAMES = {code: name for name, code in DIRECTIONS.items()}
+
+NOTE_DTYPE = np.dtype([
+    ('time', '<f8'),
+    ('pose', '<u2'),       # meta['poses']의 인덱스
+    ('type', 'u1'),        # NOTE_TYPES의 인덱스
+    ('direction', 'i1'),   # 0: 없음, -1: LEFT, 1: RIGHT
+    ('duration', '<f8'),
+])
+
+_cache = {}  # 절대 경로 -> (수정 시각, CompiledBeatmap)
+
+
+class CompiledBeatmap:
+    """정렬된 노트 배열 + 시간 인덱스. notes는 NOTE_DTYPE 구조체 배열(파일에서 읽으면 메모리 맵)입니다."""
+    def __init__(self, metadata, notes, time_index):
+        self.metadata = metadata
+        self.pose_names = metadata['poses']
+        self.notes = notes
+        self.times = notes['time']
+        self.time_index = time_index
+
+    @classmethod
+    def from_notes(cls, notes, song="", bpm=0):
+        """JSON 스키마의 노트 dict 리스트로부터 메모리 안에서 만듭니다."""
+        ordered = sorted(notes, key=lambda x: x['time'])
+        pose_names = list(dict.fromkeys(n['pose'] for n in ordered))
+        pose_ids = {name: i for i, name in enumerate(pose_names)}
+        array = np.zeros(len(ordered), dtype=NOTE_DTYPE)
+        for i, n in enumerate(ordered):
+            array[i] = (n['time'], pose_ids[n['pose']], NOTE_TYPES.index(n.get('type', 'tap')), DIRECTIONS[n.get('direction')], n.get('duration', 0))
+        return cls.from_array(array, pose_names, song, bpm)
+
+    @classmethod
+    def from_array(cls, array, pose_names, song="", bpm=0):
+        """이미 만든 NOTE_DTYPE 배열로부터 만듭니다 (자동 채보 등). 시간순이 아니면 정렬합니다."""
+        array = array[np.argsort(array['time'], kind='stable')] if len(array) > 1 and np.any(np.diff(array['time']) < 0) else array
+        metadata = {'song': song, 'bpm': bpm, 'poses': list(pose_names), 'index_step': INDEX_STEP}
+        return cls(metadata, array, _build_time_index(array['time'], INDEX_STEP))
+
+    def __len__(self): return len(self.notes)
+
+    def note_fields(self, index):
+        """Note 생성자 인자 순서대로 (time, pose, type, duration, direction)을 반환합니다."""
+        record = self.notes[index]
+        return (float(record['time']), self.pose_names[record['pose']], NOTE_TYPES[record['type']],
+                float(record['duration']), DIRECTION_NAMES[int(record['direction'])])
+
+    def seek(self, time):
+        """time 이후(포함) 첫 노트의 인덱스. 시간 인덱스로 구간을 좁힌 뒤 그 안에서만 이진 탐색합니다."""
+        if time <= 0 or len(self.notes) == 0: return 0
+        bucket = int(time // self.metadata['index_step'])
+        if bucket >= len(self.time_index) - 1: return len(self.notes)
+        lo, hi = int(self.time_index[bucket]), int(self.time_index[bucket + 1])
+        return lo + int(np.searchsorted(self.times[lo:hi], time, side='left'))
+
+    def to_notes(self):
+        """원래 JSON 스키마의 노트 리스트로 되돌립니다."""
+        notes = []
+        for i in range(len(self.notes)):
+            time, pose, note_type, duration, direction = self.note_fields(i)
+            note = {"time": time, "pose": pose, "type": note_type}
+            if note_type != 'tap' or duration: note["duration"] = duration
+            if direction: note["direction"] = direction
+            notes.append(note)
+        return notes
+
+
+def _build_time_index(times, step):
+    bucket_count = int(math.floor(times[-1] / step)) + 2 if len(times) else 1
+    return np.searchsorted(times, np.arange(bucket_count) * step, side='left').astype(np.int32)
+
+
+def compile_beatmap(json_path, out_path=None):
+    """JSON 비트맵을 .hxbm으로 컴파일하고 출력 경로를 반환합니다."""
+    out_path = out_path or os.path.splitext(json_path)[0] + '.hxbm'
+    with open(json_path, 'r') as f: data = json.load(f)
+    beatmap = CompiledBeatmap.from_notes(data['notes'], data.get('song', ""), data.get('bpm', 0))
+    meta = json.dumps(beatmap.metadata).encode('utf-8')
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta), len(beatmap.notes)) + meta)
+        f.write(beatmap.notes.tobytes())
+        f.write(beatmap.time_index.tobytes())
+    return out_path
+
+
+def read_compiled(path):
+    with open(path, 'rb') as f:
+        magic, version, meta_len, note_count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{path}' is not a compiled beatmap (v{VERSION}).")
+        metadata = json.loads(f.read(meta_len).decode('utf-8'))
+    offset = HEADER.size + meta_len
+    notes = np.memmap(path, dtype=NOTE_DTYPE, mode='r', offset=offset, shape=(note_count,)) if note_count else np.zeros(0, dtype=NOTE_DTYPE)
+    time_index = np.memmap(path, dtype=np.int32, mode='r', offset=offset + note_count * NOTE_DTYPE.itemsize)
+    return CompiledBeatmap(metadata, notes, time_index)
+
+
+def load_beatmap(path):
+    """비트맵을 읽습니다. .json이면 옆의 .hxbm이 없거나 오래됐을 때만 다시 컴파일하고, 결과는 파일이 바뀔 때까지 캐시합니다."""
+    compiled_path = path
+    if path.endswith('.json'):
+        compiled_path = os.path.splitext(path)[0] + '.hxbm'
+        if os.path.exists(path) and (not os.path.exists(compiled_path) or os.path.getmtime(compiled_path) < os.path.getmtime(path)):
+            compile_beatmap(path, compiled_path)
+    if not os.path.exists(compiled_path):
+        raise FileNotFoundError(path)
+
+    key = os.path.abspath(compiled_path); mtime = os.path.getmtime(compiled_path)
+    cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = _cache[key] = (mtime, read_compiled(compiled_path))
+    return cached[1]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python beatmap_format.py <beatmap.json> [out.hxbm]"); sys.exit(1)
+    out = compile_beatmap(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Compiled {sys.argv[1]} -> {out} ({len(read_compiled(out))} notes)")
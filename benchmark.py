@@ -0,0 +1,274 @@
+# benchmark.py
+# 카메라/화면 없이(SDL dummy) 포즈 인식, 노트 갱신+판정, 화면 그리기, 자동 채보/검사, 리플레이 처리량, 게임 시작 시간을 재서 JSON으로 출력합니다.
+# 커밋 사이 회귀는 --compare로 이전 결과와 비교하고, 리플레이 처리량은 --min-replay-rate 하한으로도 검사합니다.
+# 사용법: python benchmark.py [--only match,judge,draw,chart,replay,startup] [--landmarks play.hxlm] [--output bench.json] [--compare old.json] [--min-replay-rate 1000]
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy'); os.environ.setdefault('SDL_AUDIODRIVER', 'dummy'); os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import argparse
+import contextlib
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+SECTIONS = ('match', 'judge', 'draw', 'chart', 'replay', 'startup')
+REGRESSION_RATIO = 1.10  # --compare에서 p50이 이 배율 이상 느려지면 표시
+MIN_REPLAY_PLAYS_PER_MIN = 1000  # 리플레이 처리량 하한 (40초 플레이 기준). 이전 결과 없이도 이보다 느리면 exit 1
+
+
+def _summarize(durations):
+    """초 단위 측정값 목록 -> 마이크로초 통계."""
+    us = np.asarray(durations, dtype=np.float64) * 1e6
+    p50, p95, p99 = np.percentile(us, (50, 95, 99))
+    return {'n': len(us), 'mean_us': float(us.mean()), 'p50_us': float(p50), 'p95_us': float(p95), 'p99_us': float(p99)}
+
+
+def _synthetic_hands(count, rng, base=None):
+    """손목 원점 근처의 (count x 21 x 3) 랜드마크. base가 있으면 그 주변으로 흔듭니다."""
+    if base is None: base = rng.normal(0, 0.1, (21, 3)) + 0.5
+    return base + rng.normal(0, 0.02, (count, 21, 3))
+
+
+def bench_match(library_sizes=(3, 10, 30, 100), samples_per_pose=8, queries=2000, landmarks=None, seed=0):
+    """PoseComparator.match_pose 한 번 호출 비용과 match_pose_batch 처리량을 라이브러리 크기별로 잽니다."""
+    from pose_recognition import PoseComparator, normalize_landmark_array
+    rng = np.random.default_rng(seed)
+    if landmarks is None: landmarks = _synthetic_hands(queries, rng)
+    normalized, valid = normalize_landmark_array(landmarks)
+    normalized = normalized[valid]
+    results = []
+    for size in library_sizes:
+        library = {f"POSE_{i}": normalize_landmark_array(_synthetic_hands(samples_per_pose, rng))[0].tolist() for i in range(size)}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f: json.dump(library, f)
+        try: comparator = PoseComparator(f.name)
+        finally: os.unlink(f.name)
+        durations = []
+        for hand in landmarks:
+            start = time.perf_counter(); comparator.match_pose(hand); durations.append(time.perf_counter() - start)
+        start = time.perf_counter(); comparator.match_pose_batch(normalized); batch_seconds = time.perf_counter() - start
+        results.append({'name': 'match_pose', 'params': {'poses': size, 'samples_per_pose': samples_per_pose}, **_summarize(durations),
+                        'batch_frames_per_s': len(normalized) / max(batch_seconds, 1e-12)})
+    return results
+
+
+def _density_chart(notes_per_second, seconds, poses):
+    notes = []; types = ('tap', 'hold', 'swipe')
+    for i in range(int(notes_per_second * seconds)):
+        note = {'time': 2.0 + i / notes_per_second, 'pose': poses[i % len(poses)], 'type': types[i % 3]}
+        if note['type'] != 'tap': note['duration'] = 0.5
+        if note['type'] == 'swipe': note['direction'] = "LEFT" if i % 2 else "RIGHT"
+        notes.append(note)
+    return notes
+
+
+def bench_judge(densities=(1, 4, 16, 64), seconds=30.0, tick_rate=60.0):
+    """NoteController.update + JudgementEngine.check_judgements 한 틱 비용을 초당 노트 수별로 잽니다. 입력은 가장 앞 노트를 맞추는 오토플레이."""
+    from main import JUDGEMENT_LINE_Y, JUDGEMENT_THRESHOLDS, NOTE_SPEED, SWIPE_PARAMS, NOTE_RADIUS, JUDGEMENT_MODE, SCREEN_WIDTH
+    from note_system import NoteController
+    from judgement_engine import JudgementEngine
+    results = []
+    for density in densities:
+        notes = _density_chart(density, seconds, ("DEFAULT", "GRAB", "PICK"))
+        controller = NoteController(None, speed=NOTE_SPEED, beatmap=notes, time_based=JUDGEMENT_MODE == "time")
+        engine = JudgementEngine(JUDGEMENT_LINE_Y, JUDGEMENT_THRESHOLDS, NOTE_SPEED, SWIPE_PARAMS, NOTE_RADIUS, mode=JUDGEMENT_MODE)
+        delta_time = 1.0 / tick_rate; durations = []; max_active = 0; hand_pos = (SCREEN_WIDTH // 2, JUDGEMENT_LINE_Y)
+        for tick in range(1, int((seconds + 5.0) * tick_rate)):
+            game_time = tick * delta_time
+            pose = next((n.target_pose for n in controller.notes if not n.is_failed), "UNKNOWN")
+            start = time.perf_counter()
+            controller.update(game_time, delta_time)
+            judgements = engine.check_judgements(controller.notes, pose, hand_pos, game_time, delta_time, sample_time=game_time)
+            controller.resolve_judgements(judgements, JUDGEMENT_LINE_Y)
+            durations.append(time.perf_counter() - start); max_active = max(max_active, len(controller.notes))
+        results.append({'name': 'note_update_and_judgement', 'params': {'notes_per_second': density, 'tick_rate': tick_rate}, **_summarize(durations), 'max_active_notes': max_active})
+    return results
+
+
+class _StaticCamera:
+    """cap.read(image) 흉내. 항상 같은 BGR 프레임을 돌려줍니다."""
+    def __init__(self, shape=(480, 640, 3)): self.frame = np.random.default_rng(0).integers(0, 255, shape, dtype=np.uint8)
+    def read(self, image=None):
+        if image is None or image.shape != self.frame.shape: image = np.empty_like(self.frame)
+        image[...] = self.frame; return True, image
+
+
+def bench_draw(note_counts=(0, 10, 40, 160), frames=300):
+    """Game.draw_playing 한 프레임 비용을 화면 위 노트 수별로 잽니다. 웹캠 프레임과 랜드마크 오버레이를 포함합니다."""
+    import main
+    from capture_pipeline import FrameResult
+    from hand_tracker import Landmark
+    from note_system import Note
+    game = main.Game(); game.loader.wait()
+    try:
+        frame_index, frame = game.capture_pipeline.frames.read(_StaticCamera(), True)
+        rng = np.random.default_rng(0)
+        landmarks = [Landmark(*point) for point in rng.uniform(0.3, 0.7, (21, 3))]
+        game.webcam_result = FrameResult(time.time(), landmarks, "DEFAULT", 1.0, (400, 300), frame, frame_index, time.time())
+        game.hand_pos = (400, 300); game.score = 12345; game.combo = 10
+        results = []
+        for count in note_counts:
+            notes = []
+            for i in range(count):
+                note = Note(0.0, ("DEFAULT", "GRAB", "PICK")[i % 3], ('tap', 'hold', 'swipe')[i % 3], 0.5, "LEFT" if i % 2 else "RIGHT")
+                note.y_pos = main.SCREEN_HEIGHT * (i + 0.5) / count; notes.append(note)
+            game.note_controller.notes = dict.fromkeys(notes)
+            durations = []
+            for _ in range(frames):
+                start = time.perf_counter(); game.draw_playing(); durations.append(time.perf_counter() - start)
+            results.append({'name': 'draw_playing', 'params': {'notes_on_screen': count}, **_summarize(durations)})
+        return results
+    finally:
+        game.quit()
+
+
+# run()과 같은 순서로 LOADING 화면을 돌리며 첫 프레임/메뉴 진입 시각을 잼 (프로세스 시작 대신 스크립트 시작 기준)
+_STARTUP_SCRIPT = """
+import time; started = time.perf_counter()
+import main, pygame; imported = time.perf_counter()
+game = main.Game(); initialized = time.perf_counter(); first_frame = None
+while game.game_state == "LOADING" and time.perf_counter() - started < 60:
+    game.delta_time = game.clock.tick(60) / 1000.0; game.update_loading(); game.draw_loading(); pygame.display.flip()
+    if first_frame is None: first_frame = time.perf_counter()
+menu = time.perf_counter()
+game.quit()
+import json; print(json.dumps({'import_s': imported - started, 'init_s': initialized - imported, 'first_frame_s': first_frame - started, 'menu_s': menu - started}))
+"""
+
+
+def bench_startup(runs=3):
+    """새 프로세스에서 main import, Game.__init__, 첫 프레임, 메뉴 진입까지의 시간을 잽니다 (모듈 캐시 영향 없이)."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _STARTUP_SCRIPT], capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    return [{'name': 'startup', 'params': {}, 'n': runs, **{key[:-2] + '_ms': float(np.median([s[key] for s in samples])) * 1000 for key in ('import_s', 'init_s', 'first_frame_s', 'menu_s')}}]
+
+
+def bench_chart(song_lengths=(60, 600, 3600), difficulty=8.0, repeats=5):
+    """ChartEngine.generate / validate 비용을 곡 길이별로 잽니다 (1시간 곡이면 노트 수천 개)."""
+    from charting import ChartEngine
+    engine = ChartEngine(); results = []
+    for length in song_lengths:
+        generate_durations, validate_durations = [], []
+        for seed in range(repeats):
+            start = time.perf_counter(); beatmap = engine.generate(("DEFAULT", "GRAB", "PICK"), 120, difficulty, length, seed=seed); generate_durations.append(time.perf_counter() - start)
+            start = time.perf_counter(); engine.validate(beatmap); validate_durations.append(time.perf_counter() - start)
+        params = {'song_seconds': length, 'difficulty': difficulty}
+        results.append({'name': 'chart_generate', 'params': params, **_summarize(generate_durations), 'notes': len(beatmap)})
+        results.append({'name': 'chart_validate', 'params': params, **_summarize(validate_durations), 'notes': len(beatmap)})
+    return results
+
+
+def _write_synthetic_play(path, seconds, fps=30.0, seed=0):
+    """seconds초짜리 녹화 로그(.hxlm)를 만듭니다. 차트는 ChartEngine으로 만들고, 매 프레임 가장 앞 노트의 포즈 샘플을 흔들어 넣고
+    스와이프 중에는 손목을 목표 방향으로 옮깁니다 (리플레이 처리량 측정용이라 점수는 상관없음)."""
+    from main import JUDGEMENT_LINE_Y, JUDGEMENT_THRESHOLDS, NOTE_SPEED, SWIPE_PARAMS, NOTE_RADIUS, JUDGEMENT_MODE, SCREEN_WIDTH, WEBCAM_Y_OFFSET
+    from charting import ChartEngine, beatmap_to_json
+    from landmark_log import FRAME_DTYPE, HEADER, MAGIC, VERSION
+    from pose_recognition import PoseComparator
+    rng = np.random.default_rng(seed); library = PoseComparator().pose_library
+    notes = beatmap_to_json(ChartEngine(NOTE_SPEED, JUDGEMENT_LINE_Y, NOTE_RADIUS, JUDGEMENT_THRESHOLDS['GREAT']).generate(list(library), 120, 5.0, seconds, seed=seed))['notes']
+    hit_times = np.array([n['time'] + (JUDGEMENT_LINE_Y - (0 if n['type'] == 'swipe' else NOTE_RADIUS)) / NOTE_SPEED for n in notes])
+    frame_size = (640, 480); center = frame_size[0] // 2
+    frames = np.zeros(int(seconds * fps), dtype=FRAME_DTYPE); frames['t'] = np.arange(len(frames)) / fps; frames['has_hand'] = 1
+    for i, t in enumerate(frames['t']):
+        index = min(int(np.searchsorted(hit_times, t - 0.1)), len(notes) - 1); note = notes[index]
+        samples = np.asarray(library[note['pose']], dtype=np.float64).reshape(-1, 21, 3)
+        frames['landmarks'][i] = samples[i % len(samples)] + rng.normal(0, 0.01, (21, 3))
+        progress = np.clip((t - hit_times[index]) / note['duration'], 0, 1) if note['type'] == 'swipe' else 0.0
+        frames['hand_pos'][i] = (center + (1 if note.get('direction') == "RIGHT" else -1) * SWIPE_PARAMS['distance'] * progress, JUDGEMENT_LINE_Y - WEBCAM_Y_OFFSET)
+    metadata = {'beatmap': {'notes': notes}, 'screen_width': SCREEN_WIDTH, 'webcam_y_offset': WEBCAM_Y_OFFSET, 'judgement_line_y': JUDGEMENT_LINE_Y, 'thresholds': JUDGEMENT_THRESHOLDS,
+                'note_speed': NOTE_SPEED, 'swipe_params': SWIPE_PARAMS, 'note_radius': NOTE_RADIUS, 'judgement_mode': JUDGEMENT_MODE, 'input_offset': 0.0, 'frame_size': list(frame_size)}
+    meta = json.dumps(metadata).encode('utf-8')
+    with open(path, 'wb') as f: f.write(HEADER.pack(MAGIC, VERSION, len(meta)) + meta + frames.tobytes())
+
+
+def bench_replay(seconds=40.0, repeats=5):
+    """replay.replay_log로 seconds초짜리 녹화 한 판을 다시 계산하는 시간(분당 처리 판 수)을 잽니다. 게임 로직은 게임과 같은 240Hz 스텝."""
+    from landmark_log import LandmarkLog
+    from pose_recognition import PoseComparator
+    from replay import replay_log
+    comparator = PoseComparator(); durations = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'play.hxlm'); _write_synthetic_play(path, seconds)
+        log = LandmarkLog(path)
+        for _ in range(repeats):
+            start = time.perf_counter(); result = replay_log(log, comparator); durations.append(time.perf_counter() - start)
+        del log
+    summary = _summarize(durations)
+    return [{'name': 'replay', 'params': {'play_seconds': seconds}, **summary, 'plays_per_min': 60e6 / summary['p50_us'], 'score': result['score'], 'judgements': result['judgements']}]
+
+
+def _environment():
+    try: commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError: commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(),
+            'machine': platform.node(), 'time': time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def _key(result): return result['name'] + json.dumps(result['params'], sort_keys=True)
+
+
+def compare(current, baseline, threshold=REGRESSION_RATIO):
+    """같은 (이름, 파라미터) 측정끼리 p50(시작 시간은 menu_ms) 비율을 출력하고, 느려진 항목 수를 반환합니다."""
+    previous = {_key(r): r for r in baseline['results']}; regressions = 0
+    for result in current['results']:
+        old = previous.get(_key(result))
+        if old is None: continue
+        metric = 'menu_ms' if result['name'] == 'startup' else 'p50_us'
+        ratio = result[metric] / max(old[metric], 1e-12); flag = ratio >= threshold; regressions += flag
+        print(f"{'REGRESSION ' if flag else ''}{result['name']} {result['params']}: {old[metric]:.1f} -> {result[metric]:.1f} ({ratio:.2f}x)", file=sys.stderr)
+    return regressions
+
+
+def check_replay_rate(report, minimum=MIN_REPLAY_PLAYS_PER_MIN):
+    """리플레이 처리량이 minimum(분당 판 수)보다 낮은 측정 수를 반환합니다."""
+    slow = 0
+    for result in report['results']:
+        if result['name'] != 'replay': continue
+        flag = result['plays_per_min'] < minimum; slow += flag
+        print(f"{'REGRESSION ' if flag else ''}replay {result['params']}: {result['plays_per_min']:.0f} plays/min (minimum {minimum:.0f})", file=sys.stderr)
+    return slow
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Headless performance benchmarks (no camera, SDL dummy video).")
+    parser.add_argument('--only', default=','.join(SECTIONS), help=f"comma-separated subset of {','.join(SECTIONS)}")
+    parser.add_argument('--landmarks', help="recorded .hxlm log to use as match_pose input instead of synthetic hands")
+    parser.add_argument('--output', help="write JSON here instead of stdout")
+    parser.add_argument('--compare', help="previous benchmark JSON; exits 1 if any p50 regressed past --threshold")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_RATIO, help="slowdown ratio counted as a regression (default 1.10)")
+    parser.add_argument('--min-replay-rate', type=float, default=MIN_REPLAY_PLAYS_PER_MIN, help=f"exit 1 if replay throughput falls below this many plays/min (default {MIN_REPLAY_PLAYS_PER_MIN}, 0 disables)")
+    args = parser.parse_args()
+
+    sections = [s for s in args.only.split(',') if s]
+    for section in sections:
+        if section not in SECTIONS: parser.error(f"unknown section '{section}'")
+    landmarks = None
+    if args.landmarks:
+        from landmark_log import LandmarkLog
+        frames = LandmarkLog(args.landmarks).frames
+        landmarks = np.asarray(frames['landmarks'][frames['has_hand'] == 1], dtype=np.float64)
+
+    results = []
+    with contextlib.redirect_stdout(sys.stderr):  # 게임 모듈의 로그 출력이 JSON에 섞이지 않게
+        if 'match' in sections: results += bench_match(landmarks=landmarks)
+        if 'judge' in sections: results += bench_judge()
+        if 'draw' in sections: results += bench_draw()
+        if 'chart' in sections: results += bench_chart()
+        if 'replay' in sections: results += bench_replay()
+        if 'startup' in sections: results += bench_startup()
+    report = {'environment': _environment(), 'results': results}
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f: f.write(text + '\n')
+    else: print(text)
+    regressions = check_replay_rate(report, args.min_replay_rate) if args.min_replay_rate > 0 else 0
+    if args.compare:
+        with open(args.compare, 'r') as f: baseline = json.load(f)
+        regressions += compare(report, baseline, args.threshold)
+    sys.exit(1 if regressions else 0)
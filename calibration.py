@@ -0,0 +1,77 @@
+# calibration.py
+# 박자에 맞춰 포즈를 바꾸는 탭 테스트로 "실제 동작 -> 판정 엔진이 받는 샘플 시각" 사이의 지연을 재고, 기기별로 저장합니다.
+# 카메라 노출/버퍼, MediaPipe 추론, 포즈 필터 지연, 화면 표시 지연이 모두 한 값(input_offset, 초)에 포함됩니다.
+import json
+import platform
+import time
+import numpy as np
+
+CALIBRATION_FILE = 'calibration.json'
+
+
+class LatencyCalibrator:
+    """beat_interval초 간격의 박자 beats개를 보여 주고, 포즈가 바뀐 샘플 시각을 가장 가까운 박자와 비교합니다.
+    처음 warmup박은 박자를 익히는 구간으로 버리고, 박자 사이 절반 이상 어긋난 입력은 무시합니다.
+    결과는 오차의 중앙값이며, 유효한 입력이 min_taps개보다 적으면 None입니다."""
+    def __init__(self, beat_interval=0.75, beats=20, warmup=4, min_taps=8, lead_in=2.0):
+        self.beat_interval = beat_interval
+        self.beats = beats
+        self.warmup = warmup
+        self.min_taps = min_taps
+        self.lead_in = lead_in
+        self.start_time = None
+        self.last_pose = None
+        self.errors = []
+
+    def start(self, now):
+        self.start_time = now + self.lead_in; self.last_pose = None; self.errors = []
+
+    def beat_time(self, index): return self.start_time + index * self.beat_interval
+
+    def beat_phase(self, now):
+        """(현재까지 지난 박자 번호, 다음 박자까지 남은 비율 0~1). 첫 박자 전이면 번호는 -1."""
+        position = (now - self.start_time) / self.beat_interval
+        index = int(np.floor(position))
+        return index, 1.0 - (position - index)
+
+    def add_sample(self, timestamp, pose):
+        """캡처 결과 하나를 반영합니다. UNKNOWN이 아닌 다른 포즈로 바뀐 순간을 탭으로 봅니다."""
+        changed = self.last_pose is not None and pose != self.last_pose and pose != "UNKNOWN"
+        if pose != "UNKNOWN": self.last_pose = pose
+        if not changed: return
+        index = int(round((timestamp - self.start_time) / self.beat_interval))
+        if index < self.warmup or index >= self.beats: return
+        error = timestamp - self.beat_time(index)
+        if abs(error) < self.beat_interval / 2: self.errors.append(error)
+
+    def is_complete(self, now): return now >= self.beat_time(self.beats - 1) + self.beat_interval
+
+    def result(self):
+        """(input_offset 초, 오차의 중앙 절대 편차 초) 또는 탭이 부족하면 None."""
+        if len(self.errors) < self.min_taps: return None
+        errors = np.asarray(self.errors)
+        offset = float(np.median(errors))
+        return offset, float(np.median(np.abs(errors - offset)))
+
+
+def device_key(cap, camera_index=0):
+    """지연은 컴퓨터와 카메라(와 캡처 백엔드)에 따라 다르므로 이 조합을 저장 키로 씁니다."""
+    try: backend = cap.getBackendName()
+    except Exception: backend = "unknown"
+    return f"{platform.node()}/camera{camera_index}/{backend}"
+
+
+def load_input_offset(device, path=CALIBRATION_FILE):
+    """저장된 기기별 input_offset(초). 보정한 적이 없으면 0."""
+    try:
+        with open(path, 'r') as f: return float(json.load(f).get(device, {}).get('input_offset', 0.0))
+    except (FileNotFoundError, ValueError): return 0.0
+
+
+def save_input_offset(device, offset, spread, taps, path=CALIBRATION_FILE):
+    calibrations = {}
+    try:
+        with open(path, 'r') as f: calibrations = json.load(f)
+    except (FileNotFoundError, ValueError): pass
+    calibrations[device] = {'input_offset': offset, 'spread': spread, 'taps': taps, 'measured': time.strftime("%Y-%m-%d %H:%M:%S")}
+    with open(path, 'w') as f: json.dump(calibrations, f, indent=4)
@@ -0,0 +1,203 @@
+# capture_pipeline.py
+# 웹캠 캡처 + 손 추적 + 포즈 인식을 렌더 루프와 분리된 백그라운드 스레드에서 수행합니다.
+import threading
+import time
+from frame_buffer import FrameBufferRing
+from pose_recognition import StreamingPoseClassifier, update_classifiers
+from players import PlayerAssigner
+from profiler import StageProfiler
+
+
+class PlayerInput:
+    """플레이어 한 명의 이번 프레임 입력. 손이 배정되지 않았으면 landmarks/hand_pos는 None."""
+    __slots__ = ('landmarks', 'pose', 'similarity', 'hand_pos')
+    def __init__(self, landmarks, pose, similarity, hand_pos): self.landmarks = landmarks; self.pose = pose; self.similarity = similarity; self.hand_pos = hand_pos
+
+
+class FrameResult:
+    """한 프레임의 추적 결과. timestamp는 캡처 시각(time.time())입니다."""
+    __slots__ = ('timestamp', 'landmarks', 'pose', 'similarity', 'hand_pos', 'frame', 'frame_index', 'processed_time', 'players')
+
+    # frame: FrameBufferRing의 RGB 버퍼 (랜드마크가 그려지지 않은 원본), frame_index: 그 버퍼 번호
+    # players: 플레이어별 PlayerInput 리스트. 생략하면 1인용(landmarks/pose/... 가 1P 입력)
+    def __init__(self, timestamp, landmarks, pose, similarity, hand_pos, frame, frame_index, processed_time, players=None):
+        self.timestamp = timestamp
+        self.landmarks = landmarks
+        self.pose = pose
+        self.similarity = similarity
+        self.hand_pos = hand_pos
+        self.frame = frame
+        self.frame_index = frame_index
+        self.processed_time = processed_time
+        self.players = players if players is not None else [PlayerInput(landmarks, pose, similarity, hand_pos)]
+
+
+class LatestValueBuffer:
+    """가장 최근 값 하나만 보관하는 버퍼. 읽히기 전에 덮어쓴 값은 드롭으로 집계합니다."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._value = None
+        self.seq = 0
+        self._read_seq = 0
+        self.dropped = 0
+
+    def put(self, value):
+        with self._lock:
+            if self._value is not None and self._read_seq != self.seq:
+                self.dropped += 1
+            self._value = value
+            self.seq += 1
+
+    def get(self):
+        """(값, 새 값 여부)를 반환합니다."""
+        with self._lock:
+            is_new = self._read_seq != self.seq
+            self._read_seq = self.seq
+            return self._value, is_new
+
+    def clear(self):
+        with self._lock:
+            self._value = None
+            self._read_seq = self.seq
+
+
+class InjectedInput:
+    """헤드리스 모드용 입력 소스. CapturePipeline과 같은 인터페이스로, 직접 주입한 포즈/손 위치(화면 좌표)를 돌려줍니다."""
+    def __init__(self, time_source=time.time):
+        self.time_source = time_source
+        self.pose_comparator = None
+        self.recorder = None
+        self._result = None
+
+    def inject(self, pose, hand_pos, landmarks=None, players=None):
+        """players: 여러 명일 때 플레이어별 (포즈, 손 위치) 리스트. 이때 pose/hand_pos는 무시됩니다."""
+        now = self.time_source()
+        if players is not None:
+            inputs = [PlayerInput(None, p, 1.0 if p != "UNKNOWN" else 0.0, pos) for p, pos in players]
+            self._result = FrameResult(now, None, inputs[0].pose, inputs[0].similarity, inputs[0].hand_pos, None, None, now, inputs); return
+        self._result = FrameResult(now, landmarks, pose, 1.0 if pose != "UNKNOWN" else 0.0, hand_pos, None, None, now)
+
+    def latest(self): return self._result
+    def start(self): pass
+    def stop(self): pass
+    def set_active(self, active): pass
+    def set_flip(self, flip): pass
+    def get_stats(self): return {}
+
+
+class CapturePipeline:
+    """카메라 읽기와 MediaPipe 추론을 백그라운드에서 돌리고, 최신 결과만 메인 루프에 넘겨줍니다."""
+    LATENCY_SMOOTHING = 0.1
+
+    # player_count > 1: hand_tracker는 max_hands >= player_count로 만들어야 하며, 한 번의 추론으로 찾은 손들을
+    # PlayerAssigner로 플레이어에 배정하고 플레이어별 분류기를 update_classifiers로 한 번에 갱신합니다.
+    def __init__(self, cap, hand_tracker, pose_comparator, flip=True, profiler=None, player_count=1):
+        self.cap = cap
+        self.hand_tracker = hand_tracker
+        self.player_count = player_count
+        self.assigner = PlayerAssigner(player_count) if player_count > 1 else None
+        self.set_pose_comparator(pose_comparator)
+        self.flip = flip
+        self.buffer = LatestValueBuffer()
+        self.frames = FrameBufferRing()
+        self._active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.recorder = None  # LandmarkRecorder가 설정되면 모든 처리 프레임을 기록
+        self.profiler = profiler or StageProfiler()  # camera_read / hand_tracking / pose_match 단계 시간
+
+        self.frames_processed = 0
+        self.read_failures = 0
+        self.processing_ms = 0.0  # 캡처 -> 결과 게시까지
+        self.latency_ms = 0.0     # 캡처 -> 메인 루프가 읽을 때까지
+
+    def start(self):
+        if self._thread is not None: return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="CapturePipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set(); self._active.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def set_active(self, active):
+        """메뉴 등 카메라가 필요 없는 화면에서는 캡처를 멈춥니다."""
+        if active: self._active.set()
+        else: self._active.clear()
+
+    def set_pose_comparator(self, pose_comparator):
+        """포즈 라이브러리가 바뀌면 필터/히스테리시스 상태도 새로 시작합니다."""
+        self.pose_comparator = pose_comparator
+        self.player_classifiers = [StreamingPoseClassifier(pose_comparator) for _ in range(self.player_count)]
+        self.pose_classifier = self.player_classifiers[0]
+
+    def set_flip(self, flip):
+        if self.flip != flip:
+            self.flip = flip
+            self.buffer.clear()
+            for classifier in self.player_classifiers: classifier.reset()
+            if self.assigner: self.assigner.reset()
+
+    def latest(self):
+        """가장 최근 결과를 반환합니다. 결과가 아직 없으면 None."""
+        result, is_new = self.buffer.get()
+        if result is not None: self.frames.mark_reading(result.frame_index)
+        if result is not None and is_new:
+            age_ms = (time.time() - result.timestamp) * 1000.0
+            self.latency_ms += (age_ms - self.latency_ms) * self.LATENCY_SMOOTHING
+        return result
+
+    def get_stats(self):
+        return {
+            'frames': self.frames_processed,
+            'dropped': self.buffer.dropped,
+            'read_failures': self.read_failures,
+            'processing_ms': self.processing_ms,
+            'latency_ms': self.latency_ms,
+            'full_detections': getattr(self.hand_tracker, 'full_detections', 0),
+            'roi_frames': getattr(self.hand_tracker, 'roi_frames', 0),
+            'pose_latency_ms': self.pose_classifier.latency_ms,
+            'pose_switches': self.pose_classifier.switch_count,
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._active.wait(timeout=0.1): continue
+            if self._stop.is_set(): break
+            # 읽기 -> (반전) -> RGB 변환을 미리 할당한 버퍼 안에서 끝내고, 같은 버퍼를 MediaPipe와 화면이 공유
+            with self.profiler.span('camera_read'): frame_index, frame = self.frames.read(self.cap, self.flip)
+            timestamp = time.time()
+            if frame is None:
+                self.read_failures += 1
+                time.sleep(0.01)
+                continue
+
+            with self.profiler.span('hand_tracking'): self.hand_tracker.process_rgb(frame)
+            players = None
+            if self.assigner is None:
+                landmarks = self.hand_tracker.get_landmarks()
+                with self.profiler.span('pose_match'): pose, similarity = self.pose_classifier.update(landmarks, timestamp)
+                hand_pos = self.hand_tracker.get_hand_position(frame.shape[1], frame.shape[0])
+            else:
+                players = self._track_players(frame.shape, timestamp)
+                landmarks, pose, similarity, hand_pos = players[0].landmarks, players[0].pose, players[0].similarity, players[0].hand_pos
+
+            processed_time = time.time()
+            recorder = self.recorder
+            if recorder is not None: recorder.record(timestamp, landmarks, hand_pos, frame.shape)
+            self.frames.publish(frame_index)
+            self.buffer.put(FrameResult(timestamp, landmarks, pose, similarity, hand_pos, frame, frame_index, processed_time, players))
+            self.frames_processed += 1
+            self.processing_ms += ((processed_time - timestamp) * 1000.0 - self.processing_ms) * self.LATENCY_SMOOTHING
+
+    def _track_players(self, frame_shape, timestamp):
+        height, width = frame_shape[:2]
+        hands = self.hand_tracker.get_all_hands()
+        assigned = self.assigner.assign([(lm[0].x, lm[0].y) for lm, _ in hands], [label for _, label in hands], timestamp)
+        player_landmarks = [hands[hand][0] if hand is not None else None for hand in assigned]
+        with self.profiler.span('pose_match'): poses = update_classifiers(self.player_classifiers, player_landmarks, timestamp)
+        return [PlayerInput(lm, pose, similarity, (int(lm[0].x * width), int(lm[0].y * height)) if lm is not None else None)
+                for lm, (pose, similarity) in zip(player_landmarks, poses)]
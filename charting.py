@@ -0,0 +1,200 @@
+# charting.py
+# 비트맵 분석과 자동 채보. 노트 배열(NOTE_DTYPE) 전체를 한 번에 비교하는 벡터 연산으로 노트 겹침, 포즈 전환 가능 여부,
+# 최소 반응 시간을 검사하고, bpm과 목표 난이도로 이 검사를 통과하는 비트맵을 만듭니다. 노트 수천 개짜리 긴 곡도 수십 ms면 됩니다.
+# 사용법: python charting.py validate level1.json [...]
+#        python charting.py generate [--bpm 120] [--difficulty 5] [--length 90] [--seed 0] [-o chart.json]
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from beatmap_format import CompiledBeatmap, NOTE_DTYPE, NOTE_TYPES, load_beatmap
+
+TAP, HOLD, SWIPE = (NOTE_TYPES.index(name) for name in ('tap', 'hold', 'swipe'))
+
+# 사람이 실제로 칠 수 있는지에 대한 기준 (초)
+CHART_RULES = {
+    'min_reaction': 0.3,       # 한 입력이 끝난 뒤 같은 포즈로 다음 입력까지 최소 간격
+    'pose_change_time': 0.45,  # 다른 포즈로 바꿀 때 최소 간격 (손 모양 변경 + 포즈 분류기 전환 지연)
+    'pose_transitions': {},    # {(이전 포즈, 다음 포즈): 초} 특정 전환만 따로 지정
+    'swipe_recovery': 0.4,     # 스와이프 뒤 손을 레인 가운데로 되돌리는 시간 (다음 노트까지 간격에 더함)
+    'min_hold': 0.4,           # 홀드 최소 길이
+    'min_swipe': 0.5,          # 스와이프 최소 길이 (스와이프 거리를 움직일 시간)
+}
+CHECKS = ('overlap', 'transition', 'reaction', 'duration', 'direction', 'spawn')
+TIME_EPSILON = 1e-6  # 격자 위 시각의 부동소수점 오차는 위반으로 보지 않음
+DIFFICULTY_SCALE = 4.5  # 난이도 = 초당 입력 수 x DIFFICULTY_SCALE x (1 + 포즈가 바뀌는 비율). 기본 규칙으로 칠 수 있는 가장 빽빽한 채보가 10 정도
+
+
+class ChartEngine:
+    """게임의 노트 속도/판정선/노트 크기/판정 폭(px)을 받아 비트맵을 검사하고 만듭니다.
+    노트의 time은 생성(화면 위) 시각이므로, 모든 검사는 판정선에 닿는 히트 시각 기준으로 합니다."""
+    def __init__(self, note_speed=300, judgement_line_y=500, note_radius=30, great_pixels=45, rules=CHART_RULES):
+        self.note_speed = note_speed
+        self.judgement_line_y = judgement_line_y
+        self.note_radius = note_radius
+        self.rules = rules
+        # 두 노트가 화면에서 겹치거나 판정 폭(±GREAT)이 겹쳐 한 입력으로 둘 다 판정될 수 있는 간격
+        self.min_spacing = max(2 * note_radius, 2 * great_pixels) / note_speed
+
+    def travel_times(self, types):
+        """노트 종류별 생성 -> 판정까지 걸리는 시간. JudgementEngine.hit_time과 같은 기준 (tap/hold는 노트 아래쪽, swipe는 중심)."""
+        return np.where(types == SWIPE, self.judgement_line_y, self.judgement_line_y - self.note_radius) / self.note_speed
+
+    def transition_matrix(self, pose_names):
+        """(포즈 수 x 포즈 수) 이전 포즈 -> 다음 포즈로 넘어가는 데 필요한 최소 간격."""
+        count = len(pose_names)
+        matrix = np.full((count, count), self.rules['pose_change_time'])
+        np.fill_diagonal(matrix, self.rules['min_reaction'])
+        index = {name: i for i, name in enumerate(pose_names)}
+        for (before, after), seconds in self.rules['pose_transitions'].items():
+            if before in index and after in index: matrix[index[before], index[after]] = seconds
+        return matrix
+
+    def _pair_violations(self, notes, pose_names):
+        """히트 시각 순으로 이웃한 노트 쌍을 한 번에 검사합니다. (히트 순서, 쌍별 위반 종류 dict)를 반환합니다.
+        쌍 i는 order[i] -> order[i + 1]이고, 앞 노트는 그 전까지 가장 늦게 끝난 홀드/스와이프 끝 시각까지 이어진 것으로 봅니다."""
+        types = notes['type'].astype(np.intp); poses = notes['pose'].astype(np.intp)
+        hits = notes['time'] + self.travel_times(types)
+        ends = hits + np.where(types == TAP, 0.0, notes['duration'])
+        order = np.argsort(hits, kind='stable')
+        before, after = order[:-1], order[1:]
+        gaps = hits[after] - np.maximum.accumulate(ends[order])[:-1]
+        required = self.transition_matrix(pose_names)[poses[before], poses[after]] + np.where(types[before] == SWIPE, self.rules['swipe_recovery'], 0.0)
+        overlap = gaps < self.min_spacing - TIME_EPSILON
+        too_close = ~overlap & (gaps < required - TIME_EPSILON)
+        changed = poses[before] != poses[after]
+        return order, {'overlap': overlap, 'transition': too_close & changed, 'reaction': too_close & ~changed}
+
+    def validate(self, beatmap):
+        """CompiledBeatmap을 검사해 {검사 이름: 문제 있는 노트 인덱스 배열}을 반환합니다 (쌍 검사는 뒤쪽 노트). 모두 비어 있으면 칠 수 있는 비트맵입니다."""
+        notes = beatmap.notes
+        issues = {name: np.zeros(0, dtype=np.intp) for name in CHECKS}
+        if len(notes) == 0: return issues
+        if len(notes) > 1:
+            order, pairs = self._pair_violations(notes, beatmap.pose_names)
+            for name, mask in pairs.items(): issues[name] = np.sort(order[1:][mask])
+        types = notes['type']
+        issues['duration'] = np.flatnonzero(((types == HOLD) & (notes['duration'] < self.rules['min_hold'] - TIME_EPSILON)) | ((types == SWIPE) & (notes['duration'] < self.rules['min_swipe'] - TIME_EPSILON)))
+        issues['direction'] = np.flatnonzero((types == SWIPE) & (notes['direction'] == 0))
+        issues['spawn'] = np.flatnonzero(notes['time'] < 0)
+        return issues
+
+    def difficulty(self, beatmap):
+        """초당 입력 수와 포즈 전환 비율로 매기는 난이도 (DIFFICULTY_SCALE 참고). 노트가 2개 미만이면 0."""
+        notes = beatmap.notes
+        if len(notes) < 2: return 0.0
+        types = notes['type'].astype(np.intp)
+        hits = notes['time'] + self.travel_times(types)
+        order = np.argsort(hits, kind='stable')
+        span = max(float(np.max(hits + np.where(types == TAP, 0.0, notes['duration'])) - hits[order[0]]), 1.0)
+        changes = float(np.mean(np.diff(notes['pose'][order].astype(np.intp)) != 0))
+        return len(notes) / span * DIFFICULTY_SCALE * (1 + changes)
+
+    def generate(self, pose_names, bpm=120, difficulty=5.0, length=90.0, seed=None, song="auto_chart", lead_in=2.0,
+                 hold_ratio=0.15, swipe_ratio=0.15):
+        """bpm 박자 격자 위에 히트 시각을 맞춘 비트맵(CompiledBeatmap)을 만듭니다. 곡 길이는 length초.
+        노트 종류/포즈/길이를 먼저 한꺼번에 뽑고, 이웃한 노트 쌍마다 필요한 최소 간격(격자 칸 수)에 난이도에 맞춘 여유 칸을 더해
+        누적합으로 히트 시각을 정하므로 만들어진 비트맵은 validate를 항상 통과합니다.
+        목표 난이도에 못 미치면 여유 칸을 줄여 다시 만듭니다 (최대 4번, 목표에 가장 가까운 결과를 씀).
+        규칙상 가능한 최대 밀도보다 높은 목표는 그 최대 밀도에서 멈춥니다.
+        difficulty/bpm이 0 이하이거나 length가 짧아 노트가 하나도 들어가지 않으면 ValueError."""
+        if difficulty <= 0 or bpm <= 0: raise ValueError(f"difficulty and bpm must be positive (got difficulty {difficulty:g}, bpm {bpm:g}).")
+        rng = np.random.default_rng(seed)
+        pose_names = list(pose_names) or ["DEFAULT"]
+        beat = 60.0 / bpm
+        change_rate = min(0.7, 0.2 + 0.05 * difficulty) if len(pose_names) > 1 else 0.0
+        density = difficulty / (DIFFICULTY_SCALE * (1 + change_rate))  # 초당 노트 수
+        subdivision = 1
+        while subdivision < 4 and subdivision / beat < 2 * density: subdivision *= 2
+        step = beat / subdivision
+        # 첫 노트도 lead_in초 이후에 생성되도록, 가장 오래 걸리는 노트의 이동 시간 뒤 첫 박자부터
+        first_hit = np.ceil((lead_in + self.judgement_line_y / self.note_speed) / beat) * beat
+        count = max(2, int((length - first_hit) / max(min(step, self.min_spacing), 1e-3)) + 1)  # 넉넉히 뽑고 length 뒤는 자름
+        transitions = self.transition_matrix(pose_names)
+
+        best, best_error = None, None
+        for _ in range(4):
+            roll = rng.random(count)
+            types = np.where(roll < hold_ratio, HOLD, np.where(roll < hold_ratio + swipe_ratio, SWIPE, TAP))
+            if len(pose_names) > 1: poses = np.cumsum((rng.random(count) < change_rate) * rng.integers(1, len(pose_names), count)) % len(pose_names)
+            else: poses = np.zeros(count, dtype=np.intp)
+            # 길이는 1~2박, 최소 길이보다 짧으면 격자 단위로 올림 (모두 격자 칸 수로 계산)
+            minimum = np.where(types == SWIPE, self.rules['min_swipe'], self.rules['min_hold'])
+            duration_steps = np.where(types == TAP, 0, np.maximum(rng.integers(1, 3, count) * subdivision, np.ceil(minimum / step - 1e-9))).astype(np.int64)
+            required = np.maximum(transitions[poses[:-1], poses[1:]] + np.where(types[:-1] == SWIPE, self.rules['swipe_recovery'], 0.0), self.min_spacing)
+            gap_steps = np.ceil(required / step - 1e-9).astype(np.int64)
+            slack = max(0.0, 1.0 / density - float(np.mean(duration_steps[:-1] + gap_steps)) * step)  # 난이도를 맞추려고 더 띄울 평균 시간
+            intervals = duration_steps[:-1] + gap_steps + rng.poisson(slack / step, count - 1)
+            hit_steps = np.concatenate(([0], np.cumsum(intervals)))
+            hits = first_hit + hit_steps * step
+            keep = hits + duration_steps * step <= length
+
+            notes = np.zeros(int(keep.sum()), dtype=NOTE_DTYPE)
+            notes['time'] = hits[keep] - self.travel_times(types[keep]); notes['pose'] = poses[keep]; notes['type'] = types[keep]
+            notes['duration'] = duration_steps[keep] * step; notes['direction'] = np.where(types[keep] == SWIPE, rng.choice((-1, 1), len(notes)), 0)
+            beatmap = CompiledBeatmap.from_array(notes, pose_names, song, bpm)
+            estimate = self.difficulty(beatmap)
+            if best is None or abs(estimate - difficulty) < best_error: best, best_error = beatmap, abs(estimate - difficulty)
+            if abs(estimate - difficulty) <= 0.1 * difficulty or (slack == 0 and estimate < difficulty): break
+            density *= difficulty / max(estimate, 0.1)
+        if len(best) == 0: raise ValueError(f"length {length:g}s is too short for any note (the first note is hit at {first_hit:.2f}s).")
+        best.metadata['difficulty'] = round(self.difficulty(best), 2)
+        return best
+
+
+def beatmap_to_json(beatmap):
+    """CompiledBeatmap -> 게임이 읽는 JSON 스키마 dict."""
+    data = {"song": beatmap.metadata.get('song', ""), "bpm": beatmap.metadata.get('bpm', 0)}
+    if 'difficulty' in beatmap.metadata: data["difficulty"] = beatmap.metadata['difficulty']
+    data["notes"] = beatmap.to_notes()
+    return data
+
+
+def describe_issues(beatmap, issues, limit=5):
+    """validate 결과를 사람이 읽을 줄 목록으로."""
+    lines = []
+    for name, indices in issues.items():
+        if len(indices) == 0: continue
+        examples = ", ".join(f"#{i} ({float(beatmap.notes['time'][i]):.2f}s {beatmap.pose_names[beatmap.notes['pose'][i]]})" for i in indices[:limit])
+        lines.append(f"  {name}: {len(indices)} notes, e.g. {examples}")
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate beatmaps for playability or generate a chart from bpm and a difficulty target.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    validate = commands.add_parser('validate', help="check note overlap, pose transitions and reaction time")
+    validate.add_argument('beatmaps', nargs='+', help="beatmap .json or .hxbm files")
+    generate = commands.add_parser('generate', help="generate a playable chart")
+    generate.add_argument('--bpm', type=float, default=120)
+    generate.add_argument('--difficulty', type=float, default=5.0)
+    generate.add_argument('--length', type=float, default=90.0, help="song length in seconds")
+    generate.add_argument('--poses', nargs='+', default=None, help="poses to use (default: poses.json keys)")
+    generate.add_argument('--seed', type=int, default=None)
+    generate.add_argument('-o', '--output', default=None, help="write the chart JSON here")
+    args = parser.parse_args()
+
+    engine = ChartEngine()
+    if args.command == 'validate':
+        failed = False
+        for path in args.beatmaps:
+            beatmap = load_beatmap(path)
+            started = time.perf_counter(); issues = engine.validate(beatmap); elapsed = time.perf_counter() - started
+            problems = sum(len(indices) for indices in issues.values()); failed |= problems > 0
+            print(f"{path}: {len(beatmap)} notes, difficulty {engine.difficulty(beatmap):.1f}, {'OK' if not problems else f'{problems} problems'} ({elapsed * 1000:.1f} ms)")
+            for line in describe_issues(beatmap, issues): print(line)
+        sys.exit(1 if failed else 0)
+
+    pose_names = args.poses
+    if not pose_names and os.path.exists('poses.json'):
+        with open('poses.json', 'r') as f: pose_names = list(json.load(f).keys())
+    started = time.perf_counter()
+    try: beatmap = engine.generate(pose_names or ["DEFAULT", "GRAB", "PICK"], args.bpm, args.difficulty, args.length, args.seed)
+    except ValueError as e: parser.error(str(e))
+    elapsed = time.perf_counter() - started
+    problems = sum(len(indices) for indices in engine.validate(beatmap).values())
+    print(f"Generated {len(beatmap)} notes at {args.bpm:g} bpm, difficulty {beatmap.metadata['difficulty']} (target {args.difficulty:g}), {problems} problems ({elapsed * 1000:.1f} ms)")
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(beatmap_to_json(beatmap), f, indent=4)
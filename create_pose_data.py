@@ -1,33 +1,24 @@
+# create_pose_data.py
+# 포즈 샘플 만들기. 인자 없이 실행하면 웹캠으로 한 포즈씩 찍어 poses.json에 저장하고,
+# build/evaluate 하위 명령은 라벨별 폴더의 사진/영상을 프로세스 풀로 한꺼번에 처리해 .npz 데이터셋을 만들고 인식 정확도를 봅니다.
+# 사용법: python create_pose_data.py
+#        python create_pose_data.py build DATA_DIR [...] [-o poses.npz] [--workers N] [--video-stride 2]
+#        python create_pose_data.py evaluate poses.npz [--library poses.json] [--threshold 0.85]
+import argparse
+import multiprocessing
+import time
 import cv2
-import mediapipe as mp
 import numpy as np
 import json
 import os
+from hand_tracker import HandTracker
+from pose_recognition import PoseComparator, StreamingPoseClassifier, normalize_landmark_array, save_pose_dataset, load_pose_dataset
 
-print("Pose Data Creator: Press a key to save the current hand pose.")
-print("Pose ideas: FIST, OPEN, V, OK")
-print("Press 'q' to quit.")
-
-# MediaPipe 핸드 설정
-mp_hands = mp.solutions.hands
-hands = mp_hands.Hands(
-    max_num_hands=1,
-    min_detection_confidence=0.7,
-    min_tracking_confidence=0.7
-)
-mp_drawing = mp.solutions.drawing_utils
-
-# 웹캠 설정
-cap = cv2.VideoCapture(0)
-
-poses = {}
 POSE_FILE = "poses.json"
-
-# 기존 파일 로드
-if os.path.exists(POSE_FILE):
-    with open(POSE_FILE, 'r') as f:
-        poses = json.load(f)
-    print(f"Loaded existing poses: {list(poses.keys())}")
+BURST_SIZE = 15  # 포즈 하나당 연속으로 저장할 프레임 수
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_FPS = 30  # 평가할 때 영상 프레임 번호를 시각으로 바꾸는 기준 (게임 카메라와 같은 30fps로 가정)
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
 
 
 def normalize_landmarks(landmarks):
@@ -46,43 +37,240 @@ def normalize_landmarks(landmarks):
     return coords.flatten().tolist()
 
 
-while cap.isOpened():
-    success, image = cap.read()
-    if not success:
-        continue
+def capture_interactive():
+    print("Pose Data Creator: Press a key to save the current hand pose.")
+    print("Pose ideas: FIST, OPEN, V, OK")
+    print("Press 'q' to quit.")
 
-    image = cv2.flip(image, 1)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    results = hands.process(image_rgb)
+    # MediaPipe 핸드 설정 (손을 찾은 뒤에는 주변 영역만 저해상도로 추적)
+    hand_tracker = HandTracker(
+        max_hands=1,
+        detection_con=0.7,
+        track_con=0.7,
+        roi_tracking=True,
+        detection_width=320
+    )
 
-    if results.multi_hand_landmarks:
-        for hand_landmarks in results.multi_hand_landmarks:
-            mp_drawing.draw_landmarks(
-                image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+    # 웹캠 설정
+    cap = cv2.VideoCapture(0)
 
-            key = cv2.waitKey(5) & 0xFF
+    poses = {}
+    pending_pose = None
+    burst = []
+
+    # 기존 파일 로드
+    if os.path.exists(POSE_FILE):
+        with open(POSE_FILE, 'r') as f:
+            poses = json.load(f)
+        print(f"Loaded existing poses: {list(poses.keys())}")
+
+    while cap.isOpened():
+        success, image = cap.read()
+        if not success:
+            continue
+
+        image = cv2.flip(image, 1)
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        hand_tracker.process_rgb(image_rgb)
+        landmarks = hand_tracker.get_landmarks()
+
+        if landmarks:
+            hand_tracker.draw_landmarks(image, landmarks)
+
+            # 이름을 입력한 뒤 BURST_SIZE 프레임 동안 샘플을 모아서 한 번에 저장
+            if pending_pose:
+                normalized = normalize_landmarks(landmarks)
+                if normalized:
+                    burst.append(normalized)
+                if len(burst) >= BURST_SIZE:
+                    poses[pending_pose] = burst
+                    with open(POSE_FILE, 'w') as f:
+                        json.dump(poses, f, indent=4)
+                    print(f"Saved pose '{pending_pose}' ({len(burst)} samples)!")
+                    pending_pose = None
+                    burst = []
+                cv2.waitKey(1)
+            else:
+                key = cv2.waitKey(5) & 0xFF
 
-            if key != 255 and key != ord('q'):
-                pose_name = input("Enter pose name for the current hand shape: ").upper()
-                if pose_name:
-                    normalized = normalize_landmarks(hand_landmarks.landmark)
-                    if normalized:
-                        poses[pose_name] = normalized
-                        with open(POSE_FILE, 'w') as f:
-                            json.dump(poses, f, indent=4)
-                        print(f"Saved pose '{pose_name}'!")
-                    else:
-                        print("Could not normalize landmarks. Try again.")
-
-            elif key == ord('q'):
+                if key != 255 and key != ord('q'):
+                    pose_name = input("Enter pose name for the current hand shape: ").upper()
+                    if pose_name:
+                        pending_pose = pose_name
+                        burst = []
+                        print(f"Hold the pose... capturing {BURST_SIZE} frames.")
+
+                elif key == ord('q'):
+                    break
+        else:
+            key = cv2.waitKey(5) & 0xFF
+            if key == ord('q'):
                 break
+
+        cv2.imshow('Pose Creator', image)
+
+    cap.release()
+    cv2.destroyAllWindows()
+    hand_tracker.close()
+
+
+# ---- 오프라인 데이터셋: ROOT/포즈이름/사진·영상 -> 프로세스 풀에서 랜드마크 추출 -> .npz ----
+
+def find_labeled_files(roots):
+    """ROOT/포즈이름/... 구조에서 (포즈 이름, 경로) 목록을 찾습니다. 포즈 폴더 아래 하위 폴더도 모두 그 포즈로 봅니다."""
+    files = []
+    for root in roots:
+        for label in sorted(os.listdir(root)):
+            label_dir = os.path.join(root, label)
+            if not os.path.isdir(label_dir): continue
+            for directory, _, names in sorted(os.walk(label_dir)):
+                files.extend((label.upper(), os.path.join(directory, name)) for name in sorted(names) if name.lower().endswith(IMAGE_EXTENSIONS + VIDEO_EXTENSIONS))
+    return files
+
+
+_worker_options = None
+_image_tracker = None
+
+def _init_worker(options):
+    # 작업 프로세스마다 한 번: 사진용 트래커는 정지 이미지 모드로 만들어 두고 재사용
+    global _worker_options, _image_tracker
+    _worker_options = options
+    _image_tracker = HandTracker(max_hands=1, detection_con=options['detection_con'], static_image_mode=True)
+
+
+def _video_frames(path, stride):
+    cap = cv2.VideoCapture(path); index = 0
+    try:
+        while True:
+            success, image = cap.read()
+            if not success: break
+            if index % stride == 0: yield f"{path}#{index}", image
+            index += 1
+    finally: cap.release()
+
+
+def _extract_file(job):
+    """작업 프로세스에서 파일 하나를 처리합니다. (포즈 이름, 경로, (샘플 수 x 21 x 3) 원본 좌표, 샘플별 출처, 읽은 프레임 수)"""
+    label, path = job
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        image = cv2.imread(path)
+        frames = [(path, image)] if image is not None else []
+        tracker = _image_tracker
+    else:
+        # 영상은 프레임 사이 추적을 쓰되, 이전 영상의 추적 상태가 섞이지 않게 영상마다 새로 만듦
+        frames = _video_frames(path, _worker_options['video_stride'])
+        tracker = HandTracker(max_hands=1, detection_con=_worker_options['detection_con'], track_con=_worker_options['detection_con'])
+    coords, sources, frame_count = [], [], 0
+    try:
+        for source, image in frames:
+            frame_count += 1
+            if _worker_options['flip']: image = cv2.flip(image, 1)  # 게임/대화형 캡처와 같은 거울 좌표
+            tracker.process_rgb(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            landmarks = tracker.get_landmarks()
+            if landmarks: coords.append([[lm.x, lm.y, lm.z] for lm in landmarks]); sources.append(source)
+    finally:
+        if tracker is not _image_tracker: tracker.close()
+    return label, path, np.array(coords, dtype=np.float32).reshape(-1, 21, 3), sources, frame_count
+
+
+def build_dataset(roots, output, workers=None, video_stride=1, flip=True, detection_con=0.5):
+    """라벨별 폴더의 사진/영상에서 손 랜드마크를 뽑아 PoseComparator가 읽을 수 있는 .npz 데이터셋으로 저장합니다.
+    파일 단위로 workers개 프로세스에 나눠 처리하며(기본: CPU 수), 결과 순서는 파일 순서 그대로입니다. 저장한 샘플 수를 반환합니다."""
+    files = find_labeled_files(roots)
+    if not files:
+        print(f"No images or videos found under {roots} (expected ROOT/POSE_NAME/<files>)."); return 0
+    names = sorted({label for label, _ in files})
+    options = {'video_stride': max(1, video_stride), 'flip': flip, 'detection_con': detection_con}
+    coords, labels, sources = [], [], []
+    frames_read = 0; started = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(options,)) as pool:
+        for done, (label, path, file_coords, file_sources, frame_count) in enumerate(pool.imap(_extract_file, files), 1):
+            frames_read += frame_count
+            if len(file_coords) == 0: print(f"  no hand found: {path}")
+            coords.append(file_coords); labels.extend([names.index(label)] * len(file_coords)); sources.extend(file_sources)
+            if done % 50 == 0 or done == len(files): print(f"{done}/{len(files)} files, {len(labels)} samples", flush=True)
+
+    vectors, valid = normalize_landmark_array(np.concatenate(coords))
+    save_pose_dataset(output, vectors[valid], np.array(labels, dtype=np.int32)[valid], names, np.array(sources, dtype=str)[valid])
+    elapsed = time.perf_counter() - started
+    print(f"Saved {int(valid.sum())} samples of {names} to {output} ({frames_read} frames in {elapsed:.1f}s, {frames_read / max(elapsed, 1e-9):.0f} frames/s)")
+    return int(valid.sum())
+
+
+def _holdout_split(labels, sources, holdout, rng):
+    """포즈마다 파일(영상은 영상 단위) holdout 비율을 테스트로 뗍니다. 같은 영상의 프레임이 학습/테스트에 섞이지 않게 합니다."""
+    files = np.array([str(source).split('#')[0] for source in sources])
+    test = np.zeros(len(labels), dtype=bool)
+    for label in np.unique(labels):
+        pose_files = np.unique(files[labels == label]); rng.shuffle(pose_files)
+        if len(pose_files) < 2: continue  # 파일이 하나뿐인 포즈는 전부 학습용
+        test_count = min(len(pose_files) - 1, max(1, int(round(len(pose_files) * holdout))))
+        test |= (labels == label) & np.isin(files, pose_files[:test_count])
+    return test
+
+
+def classify_like_game(comparator, vectors, sources, fps=VIDEO_FPS):
+    """게임과 같은 StreamingPoseClassifier(필터 + 히스테리시스 + k-NN 투표)로 샘플을 분류해 포즈 이름 리스트를 반환합니다.
+    영상은 파일마다 프레임 번호 순서로(fps 기준 시각) 이어서 돌리고, 사진은 한 장이 하나의 시퀀스입니다."""
+    files = np.array([str(source).split('#')[0] for source in sources])
+    frames = np.array([int(str(source).split('#')[1]) if '#' in str(source) else 0 for source in sources])
+    predicted = ["UNKNOWN"] * len(vectors); classifier = StreamingPoseClassifier(comparator)
+    for file in np.unique(files):
+        indices = np.flatnonzero(files == file); indices = indices[np.argsort(frames[indices], kind='stable')]
+        names, _ = classifier.classify_sequence(vectors[indices], np.ones(len(indices), dtype=bool), frames[indices] / fps)
+        for index, name in zip(indices, names): predicted[index] = name
+    return predicted
+
+
+def evaluate_dataset(dataset, library=None, threshold=0.85, holdout=0.2, seed=0, max_samples_per_pose=None):
+    """dataset(.npz)의 샘플을 게임과 같은 분류기(classify_like_game)로 분류해 혼동 행렬과 포즈별 정확도를 출력합니다.
+    library(poses.json 또는 .npz)를 주면 그 라이브러리로 dataset 전체를 평가하고,
+    없으면 dataset을 파일 단위로 학습/테스트(holdout 비율)로 나눠 평가합니다.
+    max_samples_per_pose: 라이브러리에 남길 포즈당 샘플 수 (None이면 전부 사용)"""
+    vectors, labels, names, sources = load_pose_dataset(dataset)
+    if library:
+        comparator = PoseComparator(library, threshold=threshold, max_samples_per_pose=max_samples_per_pose); test = np.ones(len(labels), dtype=bool)
     else:
-        key = cv2.waitKey(5) & 0xFF
-        if key == ord('q'):
-            break
+        test = _holdout_split(labels, sources, holdout, np.random.default_rng(seed))
+        train_library = {name: vectors[~test & (labels == index)] for index, name in enumerate(names) if np.any(~test & (labels == index))}
+        comparator = PoseComparator(threshold=threshold, max_samples_per_pose=max_samples_per_pose, pose_library=train_library)
+    predicted = classify_like_game(comparator, vectors[test], sources[test])
+
+    columns = list(dict.fromkeys(list(names) + comparator.pose_names + ["UNKNOWN"]))
+    confusion = np.zeros((len(names), len(columns)), dtype=np.int64)
+    np.add.at(confusion, (labels[test], [columns.index(name) for name in predicted]), 1)
+    totals = confusion.sum(axis=1)
+    accuracy = {name: (confusion[row, row] / totals[row] if totals[row] else float('nan')) for row, name in enumerate(names)}
+    overall = float(np.trace(confusion[:, :len(names)]) / max(totals.sum(), 1))
+
+    width = max(8, max(len(name) for name in columns) + 1); label_width = max(len("true \\ predicted"), max(len(name) for name in names)) + 1
+    print(f"threshold={threshold} test samples={int(totals.sum())} ({'library ' + library if library else f'holdout {holdout:.0%} of files'})")
+    print("true \\ predicted".ljust(label_width) + "".join(name.rjust(width) for name in columns) + "accuracy".rjust(width + 2))
+    for row, name in enumerate(names):
+        print(name.ljust(label_width) + "".join(str(count).rjust(width) for count in confusion[row]) + f"{accuracy[name]:>{width + 2}.1%}")
+    print(f"overall accuracy {overall:.1%}, unknown rate {confusion[:, -1].sum() / max(totals.sum(), 1):.1%}")
+    return {'rows': names, 'columns': columns, 'confusion': confusion, 'accuracy': accuracy, 'overall': overall}
+
 
-    cv2.imshow('Pose Creator', image)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Capture pose samples from the webcam, or build and evaluate a pose dataset offline.")
+    commands = parser.add_subparsers(dest='command')
+    build = commands.add_parser('build', help="extract landmarks from ROOT/POSE_NAME/<images or videos> with a process pool")
+    build.add_argument('roots', nargs='+')
+    build.add_argument('-o', '--output', default='poses.npz')
+    build.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    build.add_argument('--video-stride', type=int, default=1, help="use every Nth video frame")
+    build.add_argument('--no-flip', action='store_true', help="do not mirror frames (use if the files are already mirrored)")
+    build.add_argument('--detection-con', type=float, default=0.5)
+    evaluate = commands.add_parser('evaluate', help="confusion matrix and per-pose accuracy of a dataset")
+    evaluate.add_argument('dataset')
+    evaluate.add_argument('--library', help="pose library to test against (poses.json or .npz); default: hold out part of the dataset")
+    evaluate.add_argument('--threshold', type=float, default=0.85)
+    evaluate.add_argument('--holdout', type=float, default=0.2)
+    evaluate.add_argument('--seed', type=int, default=0)
+    evaluate.add_argument('--max-samples', type=int, default=None, help="samples kept per pose in the library (default: all)")
+    args = parser.parse_args()
 
-cap.release()
-cv2.destroyAllWindows()
-hands.close()
\ No newline at end of file
+    if args.command == 'build': build_dataset(args.roots, args.output, args.workers, args.video_stride, not args.no_flip, args.detection_con)
+    elif args.command == 'evaluate': evaluate_dataset(args.dataset, args.library, args.threshold, args.holdout, args.seed, args.max_samples)
+    else: capture_interactive()
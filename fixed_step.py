@@ -0,0 +1,36 @@
+# fixed_step.py
+# 게임 로직(노트 이동/판정)을 화면 프레임과 무관한 고정 간격 스텝으로 진행시키는 시계. 게임 루프(main.py)와 replay.py가 같이 씁니다.
+import math
+
+SIMULATION_STEP = 1.0 / 240 # 게임 로직 스텝 간격
+MAX_SIMULATION_STEPS = 24 # 한 번에 진행하는 최대 스텝 수 (10fps 미만으로 멈추면 넘치는 스텝은 하나로 합침)
+
+
+class FixedStepClock:
+    """start_time부터 step 간격의 스텝 번호를 셉니다. 스텝 시각은 누적 덧셈 대신 번호로 계산하므로 오래 돌려도 오차가 쌓이지 않습니다.
+    advance(target_time)는 target_time까지 밟을 (스텝 시각, delta) 목록을 돌려줍니다.
+    밀린 스텝이 max_steps보다 많으면 앞쪽 스텝들을 첫 스텝 하나로 합쳐(delta가 그만큼 길어짐) 게임 시각이 항상 target_time을 따라잡습니다.
+    (밀린 시간을 다음 프레임으로 넘기면 게임 시각이 벽시계/입력 샘플 시각보다 계속 뒤처짐)"""
+    def __init__(self, step=SIMULATION_STEP, max_steps=MAX_SIMULATION_STEPS, start_time=0.0):
+        self.step = step
+        self.max_steps = max_steps
+        self.reset(start_time)
+
+    def reset(self, start_time=0.0):
+        self.start_time = start_time; self.index = 0; self.time = start_time
+        self.merged_steps = 0  # 합쳐진(따로 진행하지 못한) 스텝 수 누계
+
+    def advance(self, target_time):
+        due = math.floor((target_time - self.start_time) / self.step + 1e-9) - self.index
+        if due <= 0: return []
+        count = min(due, self.max_steps); merged = due - count
+        self.index += merged; self.merged_steps += merged
+        first = self.index + 1; self.index += count
+        steps = [(self.start_time + index * self.step, self.step) for index in range(first, self.index + 1)]
+        if merged: steps[0] = (steps[0][0], self.step * (merged + 1))
+        self.time = steps[-1][0]
+        return steps
+
+    def render_time(self, target_time):
+        """그리기용 보간 시각: 마지막 두 스텝 사이에서 target_time까지 지난 비율만큼 (한 스텝 늦게 그리는 대신 끊김 없이 움직임)."""
+        return self.time - self.step + min(max(target_time - self.time, 0.0), self.step)
@@ -0,0 +1,71 @@
+# frame_buffer.py
+# 웹캠 프레임을 한 번만 RGB로 변환해 미리 할당한 버퍼에 담고, 그 버퍼를 MediaPipe 입력과 pygame Surface가 함께 씁니다.
+import threading
+import cv2
+import numpy as np
+import pygame
+
+
+class FrameBufferRing:
+    """미리 할당한 RGB 프레임 버퍼 링. 캡처 스레드가 쓰는 버퍼가 최근 게시된 두 버퍼나 메인 루프가 그리는 버퍼와 겹치지 않게 돌려 씁니다.
+    (최근 두 개를 피하는 건 메인 루프가 결과를 읽고 mark_reading 하기 직전에 새 프레임이 게시되는 경우 대비)
+    각 버퍼의 pygame Surface는 frombuffer로 같은 메모리를 공유하므로 그릴 때 변환/복사가 없습니다."""
+    def __init__(self, count=4):
+        self.count = count
+        self.buffers = []
+        self._surfaces = {}
+        self._lock = threading.Lock()
+        self._published = -1
+        self._previous = -1
+        self._reading = -1
+        self._raw = None      # cap.read가 재사용하는 BGR 버퍼
+        self._flipped = None  # 좌우 반전용 BGR 버퍼
+
+    def _allocate(self, shape):
+        """캡처 스레드에서 프레임 크기가 바뀌면 호출. 버퍼 교체와 Surface 초기화를 surface()와 같은 잠금 안에서 해서
+        메인 스레드가 교체 전 버퍼에 묶인 Surface를 새로 캐시하지 않게 합니다 (이미 받아 간 Surface는 옛 버퍼를 계속 붙잡고 있어 안전)."""
+        buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.count)]
+        with self._lock:
+            self.buffers = buffers; self._surfaces = {}
+            self._published = self._previous = -1  # 옛 버퍼 번호
+        self._flipped = np.empty(shape, dtype=np.uint8)
+
+    def read(self, cap, flip):
+        """카메라에서 한 프레임을 읽어 빈 버퍼에 RGB로 채웁니다. (버퍼 번호, RGB 배열) 또는 실패 시 (None, None)."""
+        success, self._raw = cap.read(self._raw)
+        if not success or self._raw is None: return None, None
+        if not self.buffers or self.buffers[0].shape != self._raw.shape: self._allocate(self._raw.shape)
+        source = self._raw
+        if flip: source = cv2.flip(self._raw, 1, dst=self._flipped)
+
+        with self._lock:
+            index = next(i for i in range(self.count) if i not in (self._published, self._previous, self._reading))
+        cv2.cvtColor(source, cv2.COLOR_BGR2RGB, dst=self.buffers[index])
+        return index, self.buffers[index]
+
+    def publish(self, index):
+        with self._lock: self._previous, self._published = self._published, index
+
+    def mark_reading(self, index):
+        """메인 스레드가 그릴 버퍼. 다음 mark_reading 전까지 캡처 스레드가 덮어쓰지 않습니다."""
+        with self._lock: self._reading = index
+
+    def surface(self, index):
+        """이 버퍼와 메모리를 공유하는 Surface (메인 스레드 전용)."""
+        with self._lock:
+            surface = self._surfaces.get(index)
+            if surface is None:
+                frame = self.buffers[index]
+                surface = self._surfaces[index] = pygame.image.frombuffer(frame, (frame.shape[1], frame.shape[0]), 'RGB')
+        return surface
+
+
+def draw_landmark_overlay(surface, landmarks, connections, rect, line_color=(224, 224, 224), point_color=(255, 0, 0)):
+    """프레임을 수정하지 않고, rect 위치/크기로 그려진 웹캠 화면 위에 손 랜드마크를 pygame으로 그립니다."""
+    if not landmarks: return
+    x, y, w, h = rect
+    points = [(x + lm.x * w, y + lm.y * h) for lm in landmarks]
+    for start, end in connections:
+        pygame.draw.line(surface, line_color, points[start], points[end], 2)
+    for point in points:
+        pygame.draw.circle(surface, point_color, point, 3)
@@ -0,0 +1,94 @@
+# hand_motion.py
+# 손목 화면 좌표를 시각과 함께 링 버퍼에 쌓아 두고, 속도 추정과 짧은 끊김 구간 예측을 제공합니다.
+import numpy as np
+
+
+class HandMotionTracker:
+    """타임스탬프가 붙은 손 위치 링 버퍼.
+    - 같은 샘플이 여러 틱에 걸쳐 다시 들어오면(새 프레임이 없을 때) 무시하고, 시각이 되돌아가면 새 판으로 보고 비웁니다.
+    - position_at(t): 샘플 사이는 선형 보간, 마지막 샘플 이후 max_gap초까지는 속도로 외삽, 그 이상이면 None
+    - velocity_window초 안의 샘플로 최소제곱 속도(px/s)를 구합니다."""
+    def __init__(self, capacity=256, max_gap=0.15, velocity_window=0.1):
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.velocity_window = velocity_window
+        self._samples = np.zeros((capacity, 3), dtype=np.float64)  # (t, x, y)
+        self.reset()
+
+    def reset(self):
+        self._head = 0; self._count = 0; self._last_t = None
+        self.predicted_samples = 0
+
+    def update(self, timestamp, hand_pos):
+        """손이 보이는 샘플만 쌓습니다. hand_pos가 None인 프레임은 끊김으로 남겨 두고 예측으로 메웁니다."""
+        if self._last_t is not None:
+            if timestamp < self._last_t: self.reset()
+            elif timestamp == self._last_t: return
+        self._last_t = timestamp
+        if hand_pos is None: return
+        self._samples[self._head] = (timestamp, hand_pos[0], hand_pos[1])
+        self._head = (self._head + 1) % self.capacity; self._count = min(self._count + 1, self.capacity)
+
+    def _segments(self):
+        """링 버퍼를 시간순 두 구간(오래된 쪽, 최근 쪽) 뷰로 나눕니다. 복사하지 않습니다."""
+        if self._count < self.capacity: return self._samples[:self._count], self._samples[:0]
+        return self._samples[self._head:], self._samples[:self._head]
+
+    def samples(self, start=None, end=None):
+        """시간순 (N x 3) 배열. start/end를 주면 그 구간(양끝 포함)만 잘라 줍니다.
+        샘플 시각은 단조 증가하므로 두 구간에서 searchsorted로 필요한 부분만 꺼냅니다 (버퍼 전체를 재배열하지 않음)."""
+        parts = []
+        for part in self._segments():
+            low = 0 if start is None else int(np.searchsorted(part[:, 0], start, side='left'))
+            high = len(part) if end is None else int(np.searchsorted(part[:, 0], end, side='right'))
+            if high > low: parts.append(part[low:high])
+        if not parts: return self._samples[:0]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _neighbors(self, t):
+        """(t 이하 마지막 샘플, t 이후 첫 샘플). 없으면 각각 None."""
+        before = after = None
+        for part in self._segments():
+            i = int(np.searchsorted(part[:, 0], t, side='right'))
+            if i > 0: before = part[i - 1]
+            if i < len(part) and after is None: after = part[i]
+        return before, after
+
+    def velocity(self, at=None):
+        """at 시각(기본: 마지막 샘플) 직전 velocity_window 안의 샘플로 구한 (vx, vy). 샘플이 2개 미만이면 (0, 0)."""
+        last = self._neighbors(np.inf if at is None else at)[0]
+        if last is None: return 0.0, 0.0
+        recent = self.samples(last[0] - self.velocity_window, last[0])
+        if len(recent) < 2: recent = self.samples(None, last[0])[-2:]
+        if len(recent) < 2: return 0.0, 0.0
+        t = recent[:, 0] - recent[:, 0].mean()
+        denominator = float(t @ t)
+        if denominator <= 0: return 0.0, 0.0
+        vx, vy = (t @ (recent[:, 1:] - recent[:, 1:].mean(axis=0))) / denominator
+        return float(vx), float(vy)
+
+    def position_at(self, t):
+        """t 시각의 손 위치 추정값 (x, y), 알 수 없으면 None."""
+        before, after = self._neighbors(t)
+        if before is None: return None
+        if after is not None:
+            (t0, x0, y0), (t1, x1, y1) = before, after
+            if t1 - t0 > self.max_gap:  # 긴 공백 구간은 보간하지 않음
+                return (x0, y0) if t - t0 <= self.max_gap else None
+            ratio = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+            return x0 + (x1 - x0) * ratio, y0 + (y1 - y0) * ratio
+        t_last, x_last, y_last = before
+        gap = t - t_last
+        if gap == 0: return x_last, y_last
+        if gap > self.max_gap: return None
+        self.predicted_samples += 1
+        vx, vy = self.velocity()
+        return x_last + vx * gap, y_last + vy * gap
+
+    def trajectory(self, start, end):
+        """[start, end] 구간의 x 궤적. 실제 샘플에 양 끝의 추정 위치를 붙여 반환합니다 (알 수 없는 끝점은 생략)."""
+        xs = list(self.samples(start, end)[:, 1])
+        first, last = self.position_at(start), self.position_at(end)
+        if first is not None: xs.insert(0, first[0])
+        if last is not None: xs.append(last[0])
+        return np.asarray(xs, dtype=np.float64)
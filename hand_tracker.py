@@ -3,20 +3,47 @@
 import cv2
 import mediapipe as mp
 
+HAND_CONNECTIONS = tuple(mp.solutions.hands.HAND_CONNECTIONS)
+
+class Landmark:
+    """ROI 추론 결과를 전체 프레임 정규화 좌표로 옮긴 랜드마크 (MediaPipe 랜드마크와 같은 x, y, z 속성)"""
+    __slots__ = ('x', 'y', 'z')
+    def __init__(self, x, y, z): self.x = x; self.y = y; self.z = z
+
 class HandTracker:
-    def __init__(self, max_hands=1, detection_con=0.7, track_con=0.7):
+    # roi_tracking=True: 손을 찾은 뒤에는 이전 랜드마크 주변(roi_margin만큼 여유)만 잘라 roi_size 해상도로 추론하고,
+    # 손을 놓치거나 신뢰도가 min_roi_confidence 아래로 떨어질 때만 전체 프레임 검출로 돌아갑니다.
+    # detection_width: 전체 프레임 검출 시 이 폭으로 줄여서 추론 (None이면 원본 크기)
+    # max_hands > 1 (여러 명 플레이): 한 번의 추론으로 모든 손을 찾고, ROI 추적은 손 하나일 때만 씀 (MediaPipe 자체 추적이 손마다 ROI를 유지)
+    # static_image_mode=True: 프레임 사이 추적 없이 매번 검출 (서로 관계없는 사진을 처리할 때)
+    def __init__(self, max_hands=1, detection_con=0.7, track_con=0.7, roi_tracking=False, roi_margin=0.25, roi_size=224, detection_width=None, min_roi_confidence=0.6, static_image_mode=False):
         self.mp_hands = mp.solutions.hands
         self.hands = self.mp_hands.Hands(
+            static_image_mode=static_image_mode,
             max_num_hands=max_hands,
             min_detection_confidence=detection_con,
             min_tracking_confidence=track_con
         )
         self.mp_drawing = mp.solutions.drawing_utils
         self.results = None
+        self.landmarks = None
+        self.all_hands = []  # [(랜드마크, handedness 라벨), ...] 이번 프레임에서 찾은 모든 손
+
+        self.roi_tracking = roi_tracking and max_hands == 1
+        self.roi_margin = roi_margin
+        self.roi_size = roi_size
+        self.detection_width = detection_width
+        self.min_roi_confidence = min_roi_confidence
+        # ROI 크롭은 프레임마다 좌표계가 달라지므로 전체 프레임용 그래프와 내부 추적 상태를 섞지 않게 따로 둠
+        self.roi_hands = self.mp_hands.Hands(max_num_hands=1, min_detection_confidence=detection_con, min_tracking_confidence=track_con) if self.roi_tracking else None
+        self.roi = None  # (x0, y0, x1, y1) 픽셀
+        self.full_detections = 0
+        self.roi_frames = 0
 
     def find_hands(self, image, draw=True):
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         self.results = self.hands.process(image_rgb)
+        self._collect_hands()
         
         if self.results.multi_hand_landmarks and draw:
             for hand_landmarks in self.results.multi_hand_landmarks:
@@ -24,10 +51,82 @@ class HandTracker:
                     image, hand_landmarks, self.mp_hands.HAND_CONNECTIONS)
         return image
 
+    def process_rgb(self, image_rgb):
+        """이미 RGB인 프레임을 추론합니다. 프레임에 그리지 않으므로 랜드마크는 오버레이로 그려야 합니다.
+        결과 랜드마크는 ROI 추론이어도 항상 전체 프레임 기준 정규화 좌표입니다."""
+        if self.roi_tracking and self.roi is not None:
+            if self._process_roi(image_rgb): self.roi_frames += 1; self._update_roi(image_rgb.shape); return self.results
+            self.roi = None  # 추적 실패 -> 같은 프레임을 전체 검출로 다시
+
+        self.full_detections += 1
+        height, width = image_rgb.shape[:2]
+        if self.detection_width and width > self.detection_width:
+            image_rgb = cv2.resize(image_rgb, (self.detection_width, height * self.detection_width // width), interpolation=cv2.INTER_AREA)
+        self.results = self._infer(self.hands, image_rgb)
+        self._collect_hands()
+        if self.roi_tracking: self._update_roi((height, width))
+        return self.results
+
+    def _collect_hands(self):
+        hand_landmarks = self.results.multi_hand_landmarks or []
+        labels = [h.classification[0].label for h in self.results.multi_handedness] if self.results.multi_handedness else [None] * len(hand_landmarks)
+        self.all_hands = [(hand.landmark, label) for hand, label in zip(hand_landmarks, labels)]
+        self.landmarks = self.all_hands[0][0] if self.all_hands else None
+
+    def _infer(self, hands, image_rgb):
+        image_rgb.flags.writeable = False  # MediaPipe가 복사하지 않고 참조로 받도록
+        results = hands.process(image_rgb)
+        image_rgb.flags.writeable = True
+        return results
+
+    def _process_roi(self, image_rgb):
+        x0, y0, x1, y1 = self.roi
+        crop = image_rgb[y0:y1, x0:x1]
+        crop_w, crop_h = x1 - x0, y1 - y0
+        scale = self.roi_size / max(crop_w, crop_h)
+        if scale < 1: crop = cv2.resize(crop, (max(1, round(crop_w * scale)), max(1, round(crop_h * scale))), interpolation=cv2.INTER_AREA)
+        else: crop = crop.copy()  # 잘라낸 뷰는 연속 메모리가 아니므로 MediaPipe에 넘기기 전에 한 번 복사
+
+        results = self._infer(self.roi_hands, crop)
+        if not results.multi_hand_landmarks: return False
+        if results.multi_handedness and results.multi_handedness[0].classification[0].score < self.min_roi_confidence: return False
+
+        # 크롭 기준 정규화 좌표 -> 전체 프레임 기준 정규화 좌표
+        height, width = image_rgb.shape[:2]
+        self.results = results
+        self.landmarks = [Landmark((x0 + lm.x * crop_w) / width, (y0 + lm.y * crop_h) / height, lm.z * crop_w / width)
+                          for lm in results.multi_hand_landmarks[0].landmark]
+        self.all_hands = [(self.landmarks, results.multi_handedness[0].classification[0].label if results.multi_handedness else None)]
+        return True
+
+    def _update_roi(self, frame_shape):
+        """현재 랜드마크를 감싸는 정사각형에 여유를 더한 영역을 다음 프레임의 ROI로 잡습니다."""
+        if not self.landmarks: self.roi = None; return
+        height, width = frame_shape[:2]
+        xs = [lm.x * width for lm in self.landmarks]; ys = [lm.y * height for lm in self.landmarks]
+        center_x, center_y = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+        half = max(max(xs) - min(xs), max(ys) - min(ys)) * (0.5 + self.roi_margin)
+        x0, y0 = max(0, int(center_x - half)), max(0, int(center_y - half))
+        x1, y1 = min(width, int(center_x + half)), min(height, int(center_y + half))
+        self.roi = (x0, y0, x1, y1) if x1 - x0 > 16 and y1 - y0 > 16 else None
+
+    def draw_landmarks(self, image, landmarks, line_color=(224, 224, 224), point_color=(0, 0, 255)):
+        """BGR 이미지에 랜드마크를 그립니다. ROI 추론 결과(Landmark 리스트)에도 쓸 수 있습니다."""
+        height, width = image.shape[:2]
+        points = [(int(lm.x * width), int(lm.y * height)) for lm in landmarks]
+        for start, end in HAND_CONNECTIONS: cv2.line(image, points[start], points[end], line_color, 2)
+        for point in points: cv2.circle(image, point, 3, point_color, -1)
+
     def get_landmarks(self):
-        if self.results and self.results.multi_hand_landmarks:
-            return self.results.multi_hand_landmarks[0].landmark
-        return None
+        return self.landmarks
+
+    def get_all_hands(self):
+        """이번 프레임에서 찾은 모든 손의 [(랜드마크, 'Left'/'Right'), ...] (전체 프레임 기준 정규화 좌표)."""
+        return self.all_hands
+
+    def close(self):
+        self.hands.close()
+        if self.roi_hands: self.roi_hands.close()
 
     def get_hand_position(self, image_width, image_height):
         """손목(landmark 0)의 화면 좌표 (x, y)를 반환합니다."""
@@ -1,8 +1,27 @@
 # judgement_engine.py
 # 이 파일의 내용을 아래 코드로 전체 교체하세요.
+from hand_motion import HandMotionTracker
+
+def apply_score(judgement_info, score, combo):
+    """판정 하나를 점수/콤보에 반영해 (score, combo)를 반환합니다. 게임과 리플레이가 같은 규칙을 씁니다."""
+    judgement = judgement_info['judgement']
+    if judgement in ["PERFECT", "GREAT"]: combo += 1; score += 100 if judgement == "PERFECT" else 50
+    elif judgement in ["MISS", "HOLD_BREAK", "SWIPE_BREAK"]: combo = 0
+    elif judgement == "HOLD_SUCCESS": combo += 1; score += 200
+    elif judgement == "SWIPE_SUCCESS": combo += 1; score += 300
+    if judgement_info['note'].is_holding or judgement_info['note'].is_swiping: score += 2
+    return score, combo
 
 class JudgementEngine:
-    def __init__(self, line_y, thresholds, note_speed, swipe_params, note_radius):
+    # mode='distance': 노트 y좌표와 판정선 사이 픽셀 거리로 판정 (프레임 속도에 따라 판정 폭이 달라짐)
+    # mode='time': 노트의 히트 시각과 포즈 샘플의 캡처 시각 차이(초)로 판정. 픽셀 판정 폭을 note_speed로 나눠 시간 폭으로 씀
+    # input_offset: 보정 모드(calibration.py)로 잰 기기별 입력 지연(초). time 모드에서 샘플 시각에서 빼서 실제 동작 시각으로 되돌림
+    # lane_x: 이 엔진이 맡은 레인의 가운데 x (스와이프 시작 위치). 여러 명 플레이면 플레이어마다 다름
+    def __init__(self, line_y, thresholds, note_speed, swipe_params, note_radius, mode='distance', input_offset=0.0, lane_x=800 // 2):
+        self.mode = mode
+        self.lane_x = lane_x
+        self.input_offset = input_offset
+        self.time_windows = {name: pixels / note_speed for name, pixels in thresholds.items()}
         self.judgement_line_y = line_y
         self.thresholds = thresholds
         self.note_speed = note_speed
@@ -10,8 +29,29 @@ class JudgementEngine:
         self.swipe_pos_tolerance = swipe_params['tolerance']
         self.swipe_pose_grace_period = swipe_params['grace_period']
         self.note_radius = note_radius
+        # 스와이프는 시작/끝 두 프레임만 보지 않고 손 궤적 전체로 판정 (프레임이 빠져도 짧은 공백은 예측으로 메움)
+        self.hand_motion = HandMotionTracker()
+        self._last_sample_time = None  # time 모드에서 마지막으로 판정한 샘플 시각
+
+    def reset(self):
+        self.hand_motion.reset(); self._last_sample_time = None
+
+    def hit_time(self, note):
+        """노트가 판정 위치에 닿는 게임 시각. tap/hold는 노트 아래쪽, swipe는 중심이 판정선에 닿는 시각입니다."""
+        travel_pixels = self.judgement_line_y if note.note_type == 'swipe' else self.judgement_line_y - self.note_radius
+        return note.spawn_time + travel_pixels / self.note_speed
 
-    def check_judgements(self, notes, current_pose, hand_pos, game_time, delta_time):
+    def check_judgements(self, notes, current_pose, hand_pos, game_time, delta_time, sample_time=None):
+        """sample_time: 현재 포즈/손 위치가 캡처된 게임 시각. 없으면 game_time을 씁니다 (이때는 input_offset도 적용하지 않음).
+        distance 모드에서는 손 궤적 기록에만 써서, 캡처 사이의 스텝이 같은 샘플을 새 시각으로 다시 넣지 않게 합니다 (같은 시각은 무시됨).
+        time 모드 판정은 샘플 시각과 입력만으로 정해지므로, 캡처 사이의 240Hz 스텝처럼 같은 샘플이 다시 들어오면 건너뜁니다."""
+        if self.mode == 'time':
+            sample_time = game_time if sample_time is None else sample_time - self.input_offset
+            if sample_time == self._last_sample_time: return []
+            self._last_sample_time = sample_time
+            self.hand_motion.update(sample_time, hand_pos)
+            return self._check_judgements_by_time(notes, current_pose, sample_time)
+        self.hand_motion.update(game_time if sample_time is None else sample_time, hand_pos)
         judgements = []
         for note in notes:
             if note.is_failed: continue
@@ -21,7 +61,7 @@ class JudgementEngine:
             elif note.note_type == 'hold':
                 self._judge_hold_note(note, current_pose, judgements)
             elif note.note_type == 'swipe':
-                self._judge_swipe_note(note, current_pose, hand_pos, game_time, delta_time, judgements)
+                self._judge_swipe_note(note, current_pose, game_time, delta_time, judgements)
 
             # <<< 핵심 변경 부분: 자동 MISS 판정 조건을 훨씬 너그럽게 변경
             # 이전: 노트 아랫부분이 GREAT 존을 벗어났을 때
@@ -41,9 +81,10 @@ class JudgementEngine:
             note.is_judged = True
             if note.target_pose == current_pose:
                 judgement = 'PERFECT' if distance <= self.thresholds['PERFECT'] else 'GREAT'
+                note.hit_error = (note_bottom_y - self.judgement_line_y) / self.note_speed
             else:
                 judgement = 'MISS'; note.is_failed = True
-            judgements.append({'judgement': judgement, 'note': note})
+            judgements.append({'judgement': judgement, 'note': note, 'error': note.hit_error})
 
     def _judge_hold_note(self, note, current_pose, judgements):
         note_head_bottom_y = note.y_pos + self.note_radius
@@ -54,10 +95,10 @@ class JudgementEngine:
             note.is_judged = True
             if note.target_pose == current_pose:
                 judgement = 'PERFECT' if distance <= self.thresholds['PERFECT'] else 'GREAT'
-                note.is_holding = True
+                note.is_holding = True; note.hit_error = (note_head_bottom_y - self.judgement_line_y) / self.note_speed
             else:
                 judgement = 'MISS'; note.is_failed = True
-            judgements.append({'judgement': judgement, 'note': note}); return
+            judgements.append({'judgement': judgement, 'note': note, 'error': note.hit_error}); return
         if note.is_holding:
             if note_tail_y < self.judgement_line_y < note.y_pos and note.target_pose != current_pose:
                 note.is_holding = False; note.is_failed = True
@@ -66,23 +107,34 @@ class JudgementEngine:
                 note.is_holding = False
                 judgements.append({'judgement': 'HOLD_SUCCESS', 'note': note})
 
-    def _judge_swipe_note(self, note, current_pose, hand_pos, game_time, delta_time, judgements):
-        start_x = 800 // 2
-        target_x = start_x + self.swipe_distance if note.direction == "RIGHT" else start_x - self.swipe_distance
+    def _swipe_start_ok(self, t):
+        """t 시각의 (예측 포함) 손 위치가 스와이프 시작 위치 근처인지."""
+        hand = self.hand_motion.position_at(t)
+        return hand is not None and abs(hand[0] - self.lane_x) <= self.swipe_pos_tolerance
+
+    def _swipe_reached_target(self, note):
+        """스와이프 구간 손 궤적 전체로 판정합니다: 끝 위치가 목표 ± 허용 오차 안이고, 구간 중 어느 시점에도 목표 + 허용 오차를 넘어가지 않아야 합니다.
+        목표에 닿았다가 되돌아온 손은 끝 위치에서, 크게 지나쳤다가 끝에 돌아온 손은 최대 진행 거리에서 걸러집니다.
+        끝 위치는 궤적의 마지막 값(끝 시각의 예측 위치, 없으면 마지막 실제 샘플)이라 끝 프레임이 빠져도 판정할 수 있습니다."""
+        trajectory = self.hand_motion.trajectory(note.swipe_end_time - note.duration, note.swipe_end_time)
+        if len(trajectory) == 0: return False
+        progress = (trajectory - self.lane_x) * (1 if note.direction == "RIGHT" else -1)
+        return abs(progress[-1] - self.swipe_distance) <= self.swipe_pos_tolerance and progress.max() <= self.swipe_distance + self.swipe_pos_tolerance
+
+    def _judge_swipe_note(self, note, current_pose, game_time, delta_time, judgements):
         if not note.is_judged and abs(note.y_pos - self.judgement_line_y) <= self.thresholds['GREAT']:
             note.is_judged = True
-            hand_x = hand_pos[0] if hand_pos else 0
             pose_ok = note.target_pose == current_pose
-            pos_ok = abs(hand_x - start_x) <= self.swipe_pos_tolerance
+            pos_ok = self._swipe_start_ok(game_time)
             if pose_ok and pos_ok:
                 distance = abs(note.y_pos - self.judgement_line_y)
                 judgement = 'PERFECT' if distance <= self.thresholds['PERFECT'] else 'GREAT'
                 note.is_swiping = True
                 note.swipe_end_time = game_time + note.duration
-                note.swipe_pose_grace_timer = self.swipe_pose_grace_period
+                note.swipe_pose_grace_timer = self.swipe_pose_grace_period; note.hit_error = (note.y_pos - self.judgement_line_y) / self.note_speed
             else:
                 judgement = 'MISS'; note.is_failed = True
-            judgements.append({'judgement': judgement, 'note': note}); return
+            judgements.append({'judgement': judgement, 'note': note, 'error': note.hit_error}); return
         if note.is_swiping:
             if note.target_pose == current_pose:
                 note.swipe_pose_grace_timer = self.swipe_pose_grace_period
@@ -93,9 +145,69 @@ class JudgementEngine:
                     judgements.append({'judgement': 'SWIPE_BREAK', 'note': note}); return
             if game_time >= note.swipe_end_time:
                 note.is_swiping = False
-                hand_x = hand_pos[0] if hand_pos else 0
-                if abs(hand_x - target_x) <= self.swipe_pos_tolerance:
+                if self._swipe_reached_target(note):
                     judgements.append({'judgement': 'SWIPE_SUCCESS', 'note': note})
                 else:
                     note.is_failed = True
-                    judgements.append({'judgement': 'SWIPE_BREAK', 'note': note})
\ No newline at end of file
+                    judgements.append({'judgement': 'SWIPE_BREAK', 'note': note})
+
+    # --- 시간 기준 판정 (mode='time') ---
+    def _check_judgements_by_time(self, notes, current_pose, sample_time):
+        judgements = []
+        for note in notes:
+            if note.is_failed: continue
+            error = sample_time - self.hit_time(note)  # 양수면 늦음
+            if note.note_type == 'swipe': self._judge_swipe_note_by_time(note, current_pose, sample_time, error, judgements)
+            elif not note.is_judged or note.is_holding: self._judge_head_by_time(note, note.target_pose == current_pose, sample_time, error, judgements)
+
+            if not note.is_judged and error > self.time_windows['GREAT']:
+                note.is_judged = True; note.is_failed = True
+                judgements.append({'judgement': 'MISS', 'note': note})
+        return judgements
+
+    def _timing_judgement(self, note, input_ok, error):
+        """판정 폭 안에서 입력이 맞은 첫 샘플의 오차로 PERFECT/GREAT를 정합니다. 아직 맞지 않았으면 None.
+        판정 폭이 열리기 전부터 포즈를 잡고 있었다면 폭에 들어온 첫 샘플(오차가 큰 쪽)로 판정되므로 distance 모드처럼 GREAT입니다."""
+        if abs(error) > self.time_windows['GREAT'] or not input_ok: return None
+        note.hit_error = error
+        return 'PERFECT' if abs(error) <= self.time_windows['PERFECT'] else 'GREAT'
+
+    def _judge_head_by_time(self, note, pose_ok, sample_time, error, judgements):
+        if not note.is_judged:
+            judgement = self._timing_judgement(note, pose_ok, error)
+            if judgement is None: return
+            note.is_judged = True
+            if note.note_type == 'hold': note.is_holding = True
+            judgements.append({'judgement': judgement, 'note': note, 'error': note.hit_error}); return
+        # hold 유지 구간: 끝 시각 전까지 포즈가 풀리면 HOLD_BREAK
+        if error >= note.duration:
+            note.is_holding = False
+            judgements.append({'judgement': 'HOLD_SUCCESS', 'note': note})
+        elif not pose_ok:
+            note.is_holding = False; note.is_failed = True
+            judgements.append({'judgement': 'HOLD_BREAK', 'note': note})
+
+    def _judge_swipe_note_by_time(self, note, current_pose, sample_time, error, judgements):
+        pose_ok = note.target_pose == current_pose
+        if not note.is_judged:
+            in_window = abs(error) <= self.time_windows['GREAT']  # 손 위치 확인은 판정 폭이 열렸을 때만
+            judgement = self._timing_judgement(note, in_window and pose_ok and self._swipe_start_ok(sample_time), error)
+            if judgement is None: return
+            note.is_judged = True; note.is_swiping = True
+            note.swipe_end_time = self.hit_time(note) + note.duration
+            note.swipe_pose_lost_time = None
+            judgements.append({'judgement': judgement, 'note': note, 'error': note.hit_error}); return
+        if not note.is_swiping: return
+        # 포즈가 풀린 시각부터 grace_period가 지나면 SWIPE_BREAK (프레임 delta 누적 대신 샘플 시각 차이 사용)
+        if pose_ok: note.swipe_pose_lost_time = None
+        elif note.swipe_pose_lost_time is None: note.swipe_pose_lost_time = sample_time
+        elif sample_time - note.swipe_pose_lost_time >= self.swipe_pose_grace_period:
+            note.is_swiping = False; note.is_failed = True
+            judgements.append({'judgement': 'SWIPE_BREAK', 'note': note}); return
+        if sample_time >= note.swipe_end_time:
+            note.is_swiping = False
+            if self._swipe_reached_target(note):
+                judgements.append({'judgement': 'SWIPE_SUCCESS', 'note': note})
+            else:
+                note.is_failed = True
+                judgements.append({'judgement': 'SWIPE_BREAK', 'note': note})
\ No newline at end of file
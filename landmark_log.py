@@ -0,0 +1,87 @@
+# landmark_log.py
+# HandTracker의 프레임별 출력(시각, 21개 랜드마크, 손목 위치)을 바이너리 로그로 기록/로드합니다.
+#
+# 파일 구조: MAGIC(4) | version(uint16) | 메타데이터 길이(uint32) | 메타데이터 JSON(utf-8) | FRAME_DTYPE 레코드...
+import json
+import struct
+import threading
+import numpy as np
+
+MAGIC = b'HXLM'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+# 프레임 하나 = 265 bytes. t는 게임 시작 기준 캡처 시각(초), hand_pos는 웹캠 픽셀 좌표(손이 없으면 -1)
+FRAME_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('has_hand', 'u1'),
+    ('hand_pos', '<i2', (2,)),
+    ('landmarks', '<f4', (21, 3)),
+])
+
+
+class LandmarkRecorder:
+    """한 판의 랜드마크 스트림을 파일에 기록합니다. 헤더는 첫 프레임에서 웹캠 크기와 함께 씁니다."""
+    def __init__(self, path, metadata, start_time):
+        self.path = path
+        self.metadata = dict(metadata)
+        self.start_time = start_time
+        self.frame_count = 0
+        self._file = open(path, 'wb')
+        self._header_written = False
+        self._lock = threading.Lock()  # 캡처 스레드에서 record, 메인 스레드에서 close
+        self._record = np.zeros(1, dtype=FRAME_DTYPE)
+
+    def record(self, timestamp, landmarks, hand_pos, frame_shape):
+        with self._lock:
+            if self._file is None: return
+            if not self._header_written:
+                self.metadata['frame_size'] = [int(frame_shape[1]), int(frame_shape[0])]
+                meta = json.dumps(self.metadata).encode('utf-8')
+                self._file.write(HEADER.pack(MAGIC, VERSION, len(meta)) + meta)
+                self._header_written = True
+
+            record = self._record[0]
+            record['t'] = timestamp - self.start_time
+            record['has_hand'] = 1 if landmarks else 0
+            record['hand_pos'] = hand_pos if hand_pos else (-1, -1)
+            record['landmarks'] = [[lm.x, lm.y, lm.z] for lm in landmarks] if landmarks else 0.0
+            self._file.write(self._record.tobytes())
+            self.frame_count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is None: return
+            if not self._header_written:  # 프레임이 하나도 없어도 읽을 수 있는 파일로 남김
+                self.metadata['frame_size'] = [0, 0]
+                meta = json.dumps(self.metadata).encode('utf-8')
+                self._file.write(HEADER.pack(MAGIC, VERSION, len(meta)) + meta)
+            self._file.close(); self._file = None
+        print(f"Saved {self.frame_count} frames to {self.path}")
+
+
+class LandmarkLog:
+    """기록된 로그 하나. frames는 FRAME_DTYPE 구조체 배열(메모리 맵)입니다."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, meta_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"'{path}' is not a landmark log (v{VERSION}).")
+            self.metadata = json.loads(f.read(meta_len).decode('utf-8'))
+        offset = HEADER.size + meta_len
+        self.frames = np.memmap(path, dtype=FRAME_DTYPE, mode='r', offset=offset) if _file_size(path) > offset else np.zeros(0, dtype=FRAME_DTYPE)
+
+    def __len__(self): return len(self.frames)
+
+    def screen_hand_positions(self):
+        """웹캠 픽셀 좌표를 게임 화면 좌표로 옮깁니다. (main.update_playing과 같은 변환)"""
+        frame_width = self.metadata['frame_size'][0]
+        offset = np.array([(self.metadata['screen_width'] - frame_width) // 2, self.metadata['webcam_y_offset']])
+        return self.frames['hand_pos'].astype(np.int64) + offset
+
+
+def _file_size(path):
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        return f.tell()
@@ -1,56 +1,126 @@
 # main.py
 # 이 파일의 내용을 아래 코드로 전체 교체하세요.
 
-import pygame, cv2, time, json, random, subprocess, sys, numpy as np
-from hand_tracker import HandTracker
-from pose_recognition import PoseComparator
+import pygame, time, json, random, subprocess, sys, os, numpy as np
+# cv2/mediapipe(hand_tracker, frame_buffer, capture_pipeline)는 import만 1초 이상 걸리므로 여기서 가져오지 않고,
+# 로딩 화면을 띄운 뒤 BackgroundLoader 작업 안에서 처음 import 합니다 (이후 지역 import는 sys.modules 조회만 함)
+from pose_recognition import PoseComparator, PoseSeparationMatrix
+from collections import deque
 from note_system import NoteController
-from judgement_engine import JudgementEngine
+from judgement_engine import JudgementEngine, apply_score
+from landmark_log import LandmarkRecorder
+from session_log import SessionLogger, JUDGEMENT_IDS, NOTE_TYPE_IDS
+from render_cache import TextCache, NoteSprites
+from profiler import StageProfiler, profiled
+from calibration import LatencyCalibrator, device_key, load_input_offset, save_input_offset
+from resource_loader import BackgroundLoader
+from charting import ChartEngine, beatmap_to_json
+from fixed_step import FixedStepClock
 
 # --- 상수 정의 ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
 SETUP_WEBCAM_WIDTH, SETUP_WEBCAM_HEIGHT = 320, 180 
+WEBCAM_Y_OFFSET = 20
 JUDGEMENT_LINE_Y = 500; NOTE_SPEED = 300; NOTE_RADIUS = 30
 SWIPE_PARAMS = {'distance': 150, 'tolerance': 120, 'grace_period': 0.25} 
 NOTE_COLOR_MAP = {"DEFAULT": (200, 200, 200), "GRAB": (255, 100, 100), "PICK": (100, 255, 100), "FIST": (255, 100, 100), "OPEN": (100, 255, 100), "V": (100, 100, 255)}
 JUDGEMENT_THRESHOLDS = {'PERFECT': 20, 'GREAT': 45} 
+PRACTICE_LEAD_TIME = (JUDGEMENT_LINE_Y - NOTE_RADIUS - JUDGEMENT_THRESHOLDS['GREAT']) / NOTE_SPEED
+JUDGEMENT_MODE = "time" # "time": 히트 시각 기준 판정 (프레임 속도와 무관), "distance": 픽셀 거리 기준 판정
+HAND_TRACKING_PARAMS = {'roi_tracking': True, 'roi_margin': 0.25, 'roi_size': 224, 'detection_width': 320} # 손을 찾은 뒤에는 주변 영역만 저해상도로 추적
+POSE_CAPTURE_BURST = 15 # 포즈 하나당 저장할 프레임 수
+POSE_SEPARATION_LIMIT = 0.97 # 포즈 설정: 이미 저장한 포즈와 코사인 유사도가 이 값 이상이면 너무 비슷해서 저장 불가
+POSE_STABILITY_MIN = 0.99; POSE_STABILITY_WINDOW = 10 # 포즈 설정: 최근 10프레임 단위 벡터 평균의 길이가 이 값 이상이어야 "멈춘 자세"
+FRAME_BUDGET_MS = 1000 / 60 # 프로파일러 오버레이에서 p95가 이 값을 넘는 단계는 빨간색
+PLAYER_COLORS = [(0, 255, 255), (255, 120, 255), (255, 200, 0), (120, 255, 120)] # 여러 명 플레이: 플레이어별 손 표시 색
 
 # --- UI 클래스 ---
 class Button:
     def __init__(self, rect, callback, is_enabled=True, text=""):
         self.rect = pygame.Rect(rect); self.callback = callback; self.is_hovered = False; self.is_enabled = is_enabled
         self.text = text; self.font = None # 폰트는 Game 클래스에서 설정
+        self._text_surfaces = {} # (텍스트, 색) -> 렌더된 Surface
     def handle_event(self, event):
-        if not self.is_enabled: return
+        # 비활성 상태에서도 hover는 추적 (다시 활성화됐을 때 마우스를 움직이지 않아도 바로 눌리게)
         if event.type == pygame.MOUSEMOTION: self.is_hovered = self.rect.collidepoint(event.pos)
-        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.is_hovered: self.callback()
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.is_hovered and self.is_enabled: self.callback()
     def draw(self, surface):
-        color = (255, 255, 0) if self.is_enabled and self.is_hovered else (255, 255, 255)
+        color = ((255, 255, 0) if self.is_hovered else (255, 255, 255)) if self.is_enabled else (120, 120, 120)
         pygame.draw.rect(surface, color, self.rect, 2, border_radius=5)
         if self.text and self.font:
-            text_surf = self.font.render(self.text, True, color)
+            text_surf = self._text_surfaces.get((self.text, color))
+            if text_surf is None: text_surf = self._text_surfaces[(self.text, color)] = self.font.render(self.text, True, color)
             surface.blit(text_surf, text_surf.get_rect(center=self.rect.center))
 
 # --- 포즈 설정 관리 클래스 (단순화) ---
 class PoseSetupManager:
-    def __init__(self):
-        self.poses_to_setup = ["DEFAULT", "GRAB", "PICK"]; self.reset()
+    # 프레임마다 라이브 손 모양과 이미 저장한 포즈들 사이 유사도(PoseSeparationMatrix)와 자세 안정도를 갱신해서,
+    # 멈춰 있고 다른 포즈와 충분히 다른 자세일 때만 저장을 시작/진행합니다 -> 인식 임계값을 느슨하게 하지 않아도 포즈가 헷갈리지 않음
+    def __init__(self, burst_size=POSE_CAPTURE_BURST, max_similarity=POSE_SEPARATION_LIMIT, min_stability=POSE_STABILITY_MIN, stability_window=POSE_STABILITY_WINDOW):
+        self.poses_to_setup = ["DEFAULT", "GRAB", "PICK"]; self.burst_size = burst_size
+        self.max_similarity = max_similarity; self.min_stability = min_stability; self.stability_window = stability_window; self.reset()
 
     def get_current_target(self): return self.poses_to_setup[self.current_step] if not self.is_complete else None
-    
-    def capture_and_advance(self, live_landmarks, pose_comparator):
-        if self.is_complete or live_landmarks is None: return
-        
-        target_pose_name = self.get_current_target()
-        normalized_landmarks = pose_comparator._normalize_landmarks(live_landmarks)
-        if normalized_landmarks is not None:
-            self.saved_poses[target_pose_name] = normalized_landmarks.tolist()
-            print(f"Pose '{target_pose_name}' captured.")
+
+    def closest_saved_pose(self):
+        """(포즈 이름, 유사도): 라이브 자세와 가장 비슷한 저장된 포즈. 저장된 포즈가 없거나 손이 안 보이면 None."""
+        if len(self.live_similarities) == 0: return None
+        index = int(np.argmax(self.live_similarities)); return self.separation.pose_names[index], float(self.live_similarities[index])
+
+    def is_stable(self): return self.stability >= self.min_stability
+    def is_separable(self): return len(self.live_similarities) == 0 or float(self.live_similarities.max()) < self.max_similarity
+    def can_capture(self): return not self.is_complete and not self.is_capturing and self.hand_visible and self.is_stable() and self.is_separable()
+
+    def start_capture(self):
+        # 버튼을 누르면 한 프레임이 아니라 이후 burst_size 프레임을 연속으로 모음 (멈춰 있고 구분되는 자세일 때만)
+        if not self.can_capture(): return False
+        self.is_capturing = True; self.burst = []; self.rejected_frames = 0; self.warning = None
+        return True
+
+    def observe(self, live_landmarks, pose_comparator):
+        """새 프레임마다 호출. 안정도와 저장된 포즈별 유사도를 갱신하고, 저장 중이면 통과한 프레임을 샘플에 추가합니다.
+        안정도 = 최근 stability_window 프레임 단위 벡터 평균의 길이 (합계를 들고 있다가 들어온/빠진 프레임만 더하고 뺌)."""
+        normalized = pose_comparator._normalize_landmarks(live_landmarks) if live_landmarks is not None else None
+        self.hand_visible = normalized is not None
+        if normalized is None:
+            self.recent.clear(); self.recent_sum[:] = 0.0; self.stability = 0.0; self.live_similarities = np.zeros(0)
+        else:
+            unit = normalized / max(np.linalg.norm(normalized), 1e-12)
+            if len(self.recent) == self.stability_window: self.recent_sum -= self.recent[0]
+            self.recent.append(unit); self.recent_sum += unit
+            self.stability = float(np.linalg.norm(self.recent_sum)) / self.stability_window  # 창이 차기 전(손을 막 올린 순간)에는 낮게 나옴
+            self.live_similarities = self.separation.similarities(normalized)[0]
+        if self.is_capturing: self._add_capture_frame(normalized)
+
+    def _add_capture_frame(self, normalized):
+        # 흔들리거나 다른 포즈와 너무 비슷한 프레임은 버리고, 그런 프레임이 burst_size개를 넘으면 저장을 취소
+        if normalized is not None and self.is_stable() and self.is_separable(): self.burst.append(normalized.tolist())
+        else:
+            self.rejected_frames += 1
+            if self.rejected_frames > self.burst_size:
+                self.is_capturing = False; self.burst = []; self.warning = "자세가 흔들리거나 다른 포즈와 너무 비슷해서 저장을 취소했습니다."; return
+        if len(self.burst) >= self.burst_size:
+            target_pose_name = self.get_current_target()
+            self.saved_poses[target_pose_name] = self.burst; self.separation.add_pose(target_pose_name, self.burst)
+            print(f"Pose '{target_pose_name}' captured ({len(self.burst)} samples).")
+            self.is_capturing = False; self.burst = []
             self.current_step += 1
             if self.current_step >= len(self.poses_to_setup): self.is_complete = True
+
+    def get_feedback(self):
+        """(안내 문구, 색): 라이브 자세를 지금 저장할 수 있는지와 그 이유."""
+        if self.is_complete: return "", (220, 220, 220)
+        if self.warning and not self.is_capturing: return self.warning, (255, 90, 90)
+        if not self.hand_visible: return "손이 보이지 않습니다.", (160, 160, 160)
+        closest = self.closest_saved_pose()
+        if not self.is_separable(): return f"'{closest[0]}' 포즈와 너무 비슷합니다 ({closest[1]:.3f}). 손 모양을 더 다르게 해 주세요.", (255, 90, 90)
+        if not self.is_stable(): return "자세를 멈추고 유지하세요.", (255, 200, 0)
+        if closest is None: return "저장할 수 있습니다.", (100, 255, 100)
+        return f"저장할 수 있습니다 (가장 가까운 '{closest[0]}' {closest[1]:.3f}).", (100, 255, 100)
     
     def get_instruction(self):
         if self.is_complete: return "모든 포즈가 설정되었습니다! '완료'를 누르세요."
+        if self.is_capturing: return f"자세를 그대로 유지하세요... ({len(self.burst)}/{self.burst_size})"
         target = self.get_current_target()
         if target == "DEFAULT": return "기본 자세를 취하고 '저장'을 누르세요."
         if target == "GRAB": return "잡기 자세를 취하고 '저장'을 누르세요."
@@ -58,99 +128,233 @@ class PoseSetupManager:
         return ""
     
     def reset(self):
-        self.current_step = 0; self.saved_poses = {}; self.is_complete = False
+        self.current_step = 0; self.saved_poses = {}; self.is_complete = False; self.is_capturing = False; self.burst = []
+        self.separation = PoseSeparationMatrix(); self.live_similarities = np.zeros(0); self.hand_visible = False
+        self.recent = deque(maxlen=self.stability_window); self.recent_sum = np.zeros(63); self.stability = 0.0; self.rejected_frames = 0; self.warning = None
+
+class Player:
+    """플레이어 한 명의 레인/노트/판정/점수 상태. 1인용이면 화면 가운데 레인 하나뿐입니다.
+    모든 플레이어가 같은 비트맵을 각자의 NoteController로 진행합니다 (컴파일된 비트맵은 캐시를 공유)."""
+    def __init__(self, index, lane_x, lane_width, beatmap_file, beatmap):
+        self.index = index; self.lane_x = lane_x; self.lane_width = lane_width
+        self.note_controller = NoteController(beatmap_file, speed=NOTE_SPEED, beatmap=beatmap, time_based=JUDGEMENT_MODE == "time")
+        self.judgement_engine = JudgementEngine(JUDGEMENT_LINE_Y, JUDGEMENT_THRESHOLDS, NOTE_SPEED, SWIPE_PARAMS, NOTE_RADIUS, mode=JUDGEMENT_MODE, lane_x=lane_x)
+        self.current_pose = "UNKNOWN"; self.similarity = 0.0; self.hand_pos = None; self.reset_scores()
+    def reset_scores(self): self.score = 0; self.combo = 0; self.last_judgement = ""; self.judgement_display_timer = 0
+
+def _first_player(name):
+    """1인용 코드(simulation.py, benchmark.py 등)가 쓰던 Game 속성을 1P 상태로 연결합니다."""
+    return property(lambda self: getattr(self.players[0], name), lambda self, value: setattr(self.players[0], name, value))
 
 class Game:
-    def __init__(self):
-        pygame.init(); self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT)); pygame.display.set_caption("Echo Shaper")
+    note_controller = _first_player('note_controller'); judgement_engine = _first_player('judgement_engine'); score = _first_player('score'); combo = _first_player('combo')
+    current_pose = _first_player('current_pose'); hand_pos = _first_player('hand_pos'); last_judgement = _first_player('last_judgement'); judgement_display_timer = _first_player('judgement_display_timer')
+    # headless=True: 창/웹캠/MediaPipe 없이 합성 시계(time_source)와 주입된 입력(InjectedInput)으로만 게임 로직을 돌림 (simulation.py)
+    # player_count > 1: 한 카메라 앞 여러 명. 화면을 player_count개 레인으로 나누고 플레이어마다 노트/판정/점수를 따로 둠
+    # session_dir: 플레이마다 판정 로그(.hxsl)를 남길 디렉터리 (session_stats.py로 집계)
+    # render_fps: 화면 프레임 상한 (0이면 제한 없음), vsync: 모니터 주사율에 맞춰 그림. 어느 쪽이든 게임 로직은 SIMULATION_STEP 간격
+    def __init__(self, record_dir=None, headless=False, time_source=time.time, beatmap=None, practice_start=0.0, profile_trace=None, player_count=1, session_dir=None, render_fps=60, vsync=False):
+        self.headless = headless; self.time_source = time_source; self.practice_start = practice_start
+        # F3: 단계별 p50/p95/p99 오버레이 / profile_trace 경로를 주면 종료할 때 프레임 트레이스를 씀
+        self.profiler = StageProfiler(trace=profile_trace is not None); self.profile_trace = profile_trace; self.show_profiler = False; self.profiler_panel = None; self.profiler_refresh_timer = 0
+        lane_width = SCREEN_WIDTH // player_count
+        self.players = [Player(i, lane_width * i + lane_width // 2, lane_width, 'level1.json' if beatmap is None else None, beatmap) for i in range(player_count)]; self.pose_setup_manager = PoseSetupManager()
+        self.start_time = 0; self.game_time = 0; self.render_time = 0; self.step_clock = FixedStepClock(); self.delta_time = 0; self.render_fps = render_fps; self.final_score = 0; self.webcam_result = None; self.last_setup_result = None; self.setup_frame_surface = None
+        self.record_dir = record_dir; self.recorder = None; self.session_dir = session_dir; self.session_log = None; self.session_pose_ids = {}
+        if headless:
+            from capture_pipeline import InjectedInput
+            self.game_state = "MENU"; self.cap = self.hand_tracker = self.pose_comparator = None
+            self.capture_pipeline = InjectedInput(time_source); return
+
+        pygame.init(); pygame.display.set_caption("Echo Shaper")
+        try: self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SCALED if vsync else 0, vsync=int(vsync))
+        except pygame.error: self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))  # vsync를 못 쓰는 드라이버
         self.clock = pygame.time.Clock(); self.font = pygame.font.Font(None, 72); self.medium_font = pygame.font.Font(None, 48); self.small_font = pygame.font.Font(None, 32)
         try: self.korean_font = pygame.font.Font("NanumGothic.ttf", 22); self.korean_font_btn = pygame.font.Font("NanumGothic.ttf", 24)
         except: self.korean_font = self.korean_font_btn = self.small_font
+        self.text_cache = TextCache(); self.profiler_font = pygame.font.Font(None, 22); self.note_sprites = NoteSprites(NOTE_COLOR_MAP, NOTE_RADIUS, self.small_font, NOTE_COLOR_MAP["DEFAULT"])
 
-        self.game_state = "LOADING"; self.loading_timer = 2.0; self.credits_timer = 0
-        self.loading_background = self._load_image('loading.png'); self.menu_background = self._load_image('main_menu.png'); self.setup_background = self._load_image('setting.png')
+        self.game_state = "LOADING"; self.credits_timer = 0
+        # 로딩 화면 배경만 바로 읽고, 나머지는 로딩 화면이 그려지는 동안 백그라운드에서 준비 (모두 끝나면 _on_resources_ready -> MENU)
+        self.loading_background = self._load_image('loading.png'); self.menu_background = self.setup_background = None
+        self.cap = self.hand_tracker = self.pose_comparator = self.capture_pipeline = None; self.device_key = None
+        self.loader = BackgroundLoader({'camera': _open_camera, 'hand_tracker': lambda: _build_hand_tracker(player_count), 'pose_comparator': lambda: PoseComparator('poses.json'),
+                                        'images': lambda: {name: _decode_image(name) for name in ('main_menu.png', 'setting.png')}}, self._on_resources_ready).start()
         self.menu_buttons = [Button((295, 308, 210, 50), self.start_game), Button((295, 373, 210, 50), self.go_to_pose_setup), Button((295, 438, 210, 50), self.show_credits), Button((295, 503, 210, 50), self.quit_game)]
         self.setup_capture_button = Button((550, 480, 155, 50), self.capture_pose)
         self.setup_capture_button.font = self.korean_font_btn
+        # 옵션(포즈 설정) 옆: 입력 지연 보정
+        self.calibration_button = Button((505, 357, 80, 36), self.start_calibration, text="보정"); self.calibration_button.font = self.korean_font_btn; self.menu_buttons.append(self.calibration_button)
+        self.calibrator = None; self.calibration_message = None; self.last_calibration_result = None
 
-        self.cap = cv2.VideoCapture(0); self.hand_tracker = HandTracker(); self.pose_comparator = PoseComparator('poses.json'); self.note_controller = NoteController('level1.json', speed=NOTE_SPEED); self.judgement_engine = JudgementEngine(JUDGEMENT_LINE_Y, JUDGEMENT_THRESHOLDS, NOTE_SPEED, SWIPE_PARAMS, NOTE_RADIUS); self.pose_setup_manager = PoseSetupManager()
-        self.start_time = 0; self.game_time = 0; self.delta_time = 0; self.score = 0; self.combo = 0; self.final_score = 0; self.current_pose = "UNKNOWN"; self.hand_pos = None; self.last_judgement = ""; self.judgement_display_timer = 0; self.annotated_frame = None
+    def _on_resources_ready(self, resources):
+        # 메인 스레드에서 호출됨: Surface 변환과 캡처 스레드 시작은 여기서
+        images = resources['images']; self.menu_background = _convert(images['main_menu.png']); self.setup_background = _convert(images['setting.png'])
+        from capture_pipeline import CapturePipeline; from frame_buffer import draw_landmark_overlay; from hand_tracker import HAND_CONNECTIONS
+        self.draw_landmark_overlay = draw_landmark_overlay; self.hand_connections = HAND_CONNECTIONS  # 그리기 메소드에서 매 프레임 import하지 않도록 한 번만 가져 둠
+        self.cap = resources['camera']; self.hand_tracker = resources['hand_tracker']; self.pose_comparator = resources['pose_comparator']
+        self.capture_pipeline = CapturePipeline(self.cap, self.hand_tracker, self.pose_comparator, profiler=self.profiler, player_count=len(self.players)); self.capture_pipeline.start()
+        self.device_key = device_key(self.cap); self.set_input_offset(load_input_offset(self.device_key))
+        self.game_state = "MENU"
 
-    def _load_image(self, path):
-        try: img = pygame.image.load(path).convert(); return pygame.transform.scale(img, (SCREEN_WIDTH, SCREEN_HEIGHT))
-        except pygame.error as e: print(f"Cannot load image '{path}': {e}"); return None
+    def _load_image(self, path): return _convert(_decode_image(path))
+    def set_input_offset(self, offset):
+        for player in self.players: player.judgement_engine.input_offset = offset
     
     # <<< 핵심 변경: '저장/완료' 버튼을 눌렀을 때의 로직
-    def capture_pose(self):
-        landmarks = self.hand_tracker.get_landmarks()
-        self.pose_setup_manager.capture_and_advance(landmarks, self.pose_comparator)
-        
-        # 마지막 포즈까지 완료되었다면
-        if self.pose_setup_manager.is_complete:
-            # 1. 파일에 저장
-            with open('poses.json', 'w') as f: json.dump(self.pose_setup_manager.saved_poses, f, indent=4)
-            print("New poses saved to poses.json!")
-            # 2. 포즈 인식기 다시 로드
-            self.pose_comparator = PoseComparator('poses.json')
-            # 3. 1초 로딩 후 메뉴로 복귀
-            self.game_state = "LOADING"
-            self.loading_timer = 1.0
+    def capture_pose(self): self.pose_setup_manager.start_capture()
+
+    # 마지막 포즈까지 캡처가 끝났을 때의 로직
+    def finish_pose_setup(self):
+        # 1. 파일에 저장
+        with open('poses.json', 'w') as f: json.dump(self.pose_setup_manager.saved_poses, f, indent=4)
+        print("New poses saved to poses.json!")
+        # 2. 로딩 화면을 띄운 채 백그라운드에서 포즈 인식기를 다시 만들고, 끝나면 메뉴로 복귀
+        self.game_state = "LOADING"
+        self.loader = BackgroundLoader({'pose_comparator': lambda: PoseComparator('poses.json')}, self._on_poses_reloaded).start()
 
-    def go_to_pose_setup(self): self.pose_setup_manager.reset(); self.game_state = "POSE_SETUP"
-    def start_game(self): self.reset_game(); self.game_state = "PLAYING"
+    def _on_poses_reloaded(self, resources):
+        self.pose_comparator = resources['pose_comparator']; self.capture_pipeline.set_pose_comparator(self.pose_comparator)
+        self.game_state = "MENU"
+
+    def go_to_pose_setup(self): self.pose_setup_manager.reset(); self.capture_pipeline.set_flip(False); self.game_state = "POSE_SETUP"
+    def start_game(self):
+        self.reset_game(); self.capture_pipeline.set_flip(True); self.game_state = "PLAYING"
+        if self.record_dir: self.start_recording()
+        if self.session_dir: self.start_session_log()
+    def start_session_log(self):
+        # 이번 플레이의 모든 판정을 남김 (쓰기는 SessionLogger 스레드가 모아서 함)
+        if self.session_log: self.session_log.close()
+        os.makedirs(self.session_dir, exist_ok=True)
+        beatmap = self.note_controller.beatmap; self.session_pose_ids = {name: i for i, name in enumerate(beatmap.pose_names)}
+        metadata = {'song': beatmap.metadata.get('song', ""), 'beatmap': self.note_controller.beatmap_file, 'poses': list(beatmap.pose_names), 'players': len(self.players), 'practice_start': self.practice_start,
+                    'judgement_mode': JUDGEMENT_MODE, 'thresholds': JUDGEMENT_THRESHOLDS, 'note_speed': NOTE_SPEED, 'input_offset': self.judgement_engine.input_offset, 'started': time.strftime("%Y-%m-%d %H:%M:%S")}
+        path = os.path.join(self.session_dir, time.strftime("session_%Y%m%d_%H%M%S")); suffix = 0
+        while os.path.exists(path + (f"_{suffix}" if suffix else "") + ".hxsl"): suffix += 1  # 같은 초에 다시 시작해도 이전 로그를 덮어쓰지 않음
+        self.session_log = SessionLogger(path + (f"_{suffix}" if suffix else "") + ".hxsl", metadata)
+    def start_recording(self):
+        # 이번 플레이의 랜드마크 스트림을 판정 설정/비트맵과 함께 기록 (replay.py로 재생)
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, time.strftime("play_%Y%m%d_%H%M%S.hxlm"))
+        metadata = {'beatmap': {'notes': self.note_controller.beatmap.to_notes()[self.note_controller.spawn_index:]}, 'screen_width': SCREEN_WIDTH, 'webcam_y_offset': WEBCAM_Y_OFFSET,
+                    'judgement_line_y': JUDGEMENT_LINE_Y, 'thresholds': JUDGEMENT_THRESHOLDS, 'note_speed': NOTE_SPEED, 'swipe_params': SWIPE_PARAMS, 'note_radius': NOTE_RADIUS, 'judgement_mode': JUDGEMENT_MODE, 'input_offset': self.judgement_engine.input_offset}
+        self.recorder = LandmarkRecorder(path, metadata, self.start_time); self.capture_pipeline.recorder = self.recorder
+        print(f"Recording landmarks to {path}")
+    def start_calibration(self):
+        self.calibrator = LatencyCalibrator(); self.calibrator.start(self.time_source()); self.calibration_message = None; self.last_calibration_result = None
+        self.capture_pipeline.set_flip(True); self.game_state = "CALIBRATION"
     def show_credits(self): self.game_state = "CREDITS"; self.credits_timer = 5.0
     def quit_game(self): pygame.event.post(pygame.event.Event(pygame.QUIT))
 
     def run(self):
         is_running = True
         while is_running:
-            self.delta_time = self.clock.tick(60) / 1000.0
+            self.delta_time = self.clock.tick(self.render_fps) / 1000.0
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: is_running = False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3: self.show_profiler = not self.show_profiler; continue
                 if self.game_state == "MENU":
                     for button in self.menu_buttons: button.handle_event(event)
                 elif self.game_state == "POSE_SETUP": self.setup_capture_button.handle_event(event)
                 elif self.game_state == "RESULTS":
                     if event.type == pygame.KEYDOWN or event.type == pygame.MOUSEBUTTONDOWN: self.game_state = "MENU"
+                elif self.game_state == "CALIBRATION":
+                    # 측정 중에는 ESC로 취소, 끝난 뒤에는 아무 키/클릭으로 메뉴 복귀
+                    if (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE) or (self.calibration_message and event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN)): self.game_state = "MENU"
+            # 카메라가 필요한 화면에서만 백그라운드 캡처를 돌림
+            if self.capture_pipeline: self.capture_pipeline.set_active(self.game_state in ("PLAYING", "POSE_SETUP", "CALIBRATION"))
             
+            self.profiler.next_frame(); frame_start = time.perf_counter()
             if self.game_state == "LOADING": self.update_loading(); self.draw_loading()
             elif self.game_state == "PLAYING": self.update_playing(); self.draw_playing()
             elif self.game_state == "MENU": self.draw_menu()
             elif self.game_state == "RESULTS": self.draw_results()
             elif self.game_state == "CREDITS": self.update_credits(); self.draw_credits()
             elif self.game_state == "POSE_SETUP": self.update_pose_setup(); self.draw_pose_setup()
+            elif self.game_state == "CALIBRATION": self.update_calibration(); self.draw_calibration()
             
-            pygame.display.flip()
+            with self.profiler.span('flip'): pygame.display.flip()
+            self.profiler.add('frame', frame_start, time.perf_counter())
         self.quit()
 
     def update_pose_setup(self):
-        frame = self._get_webcam_frame(flip=False);
-        if frame is None: return
-        self.annotated_frame = self.hand_tracker.find_hands(frame.copy())
+        result = self.capture_pipeline.latest()
+        if result is None: return
+        if result is not self.last_setup_result:
+            # 새 프레임이 들어올 때마다 캡처 중인 포즈 샘플에 추가
+            self.last_setup_result = result; self.pose_setup_manager.observe(result.landmarks, self.pose_comparator)
+            if self.pose_setup_manager.is_complete: self.finish_pose_setup(); return
+        self.webcam_result = result
         # 버튼 텍스트 동적 변경
         self.setup_capture_button.text = "완료" if self.pose_setup_manager.current_step == len(self.pose_setup_manager.poses_to_setup) - 1 else "저장"
+        self.setup_capture_button.is_enabled = self.pose_setup_manager.can_capture()
 
+    @profiled('draw_pose_setup')
     def draw_pose_setup(self):
         if self.setup_background: self.screen.blit(self.setup_background, (0, 0))
         else: self.screen.fill((20, 20, 30))
-        if self.annotated_frame is not None:
-            frame_rgb = cv2.cvtColor(self.annotated_frame, cv2.COLOR_BGR2RGB)
-            frame_pygame = pygame.image.frombuffer(frame_rgb.tobytes(), self.annotated_frame.shape[1::-1], "RGB")
-            frame_pygame = pygame.transform.scale(frame_pygame, (SETUP_WEBCAM_WIDTH, SETUP_WEBCAM_HEIGHT))
-            self.screen.blit(frame_pygame, (115, 245))
+        if self.webcam_result is not None:
+            # 캡처 버퍼를 공유하는 Surface를 미리 할당한 축소용 Surface에 바로 스케일하고, 랜드마크는 오버레이로 그림
+            frame_surface = self.capture_pipeline.frames.surface(self.webcam_result.frame_index); frame_rect = (115, 245, SETUP_WEBCAM_WIDTH, SETUP_WEBCAM_HEIGHT)
+            if self.setup_frame_surface is None: self.setup_frame_surface = pygame.Surface((SETUP_WEBCAM_WIDTH, SETUP_WEBCAM_HEIGHT), 0, frame_surface)
+            pygame.transform.scale(frame_surface, (SETUP_WEBCAM_WIDTH, SETUP_WEBCAM_HEIGHT), self.setup_frame_surface)
+            self.screen.blit(self.setup_frame_surface, frame_rect[:2]); self.draw_landmark_overlay(self.screen, self.webcam_result.landmarks, self.hand_connections, frame_rect)
         
-        instruction_text = self.korean_font.render(self.pose_setup_manager.get_instruction(), True, (220, 220, 220))
+        instruction_text = self.text_cache.render(self.korean_font, self.pose_setup_manager.get_instruction(), (220, 220, 220))
         self.screen.blit(instruction_text, (105, 500))
+        feedback, feedback_color = self.pose_setup_manager.get_feedback()
+        if feedback: self.screen.blit(self.text_cache.render(self.korean_font, feedback, feedback_color), (105, 535))
+        self._draw_pose_separation(460, 250)
         self.setup_capture_button.draw(self.screen)
 
+    def _draw_pose_separation(self, x, y, bar_width=180, floor=0.8):
+        # 저장된 포즈별 라이브 유사도 막대 (floor~1.0 구간을 막대 길이로). 흰 눈금이 저장 가능한 한계, 넘으면 빨간색
+        manager = self.pose_setup_manager; limit_x = x + 110 + int(bar_width * (manager.max_similarity - floor) / (1 - floor))
+        for row, name in enumerate(manager.separation.pose_names):
+            similarity = float(manager.live_similarities[row]) if len(manager.live_similarities) else 0.0; bar_y = y + row * 28
+            self.screen.blit(self.text_cache.render(self.small_font, name, (220, 220, 220)), (x, bar_y))
+            pygame.draw.rect(self.screen, (60, 60, 70), (x + 110, bar_y + 4, bar_width, 16))
+            length = int(bar_width * min(max((similarity - floor) / (1 - floor), 0.0), 1.0))
+            if length: pygame.draw.rect(self.screen, (255, 90, 90) if similarity >= manager.max_similarity else (100, 255, 100), (x + 110, bar_y + 4, length, 16))
+            pygame.draw.line(self.screen, (255, 255, 255), (limit_x, bar_y), (limit_x, bar_y + 23), 2)
+
+    def update_calibration(self):
+        result = self.capture_pipeline.latest()
+        if result is not None and result is not self.last_calibration_result:
+            self.last_calibration_result = result; self.current_pose = result.pose; self.calibrator.add_sample(result.timestamp, result.pose)
+        if self.calibration_message is None and self.calibrator.is_complete(self.time_source()):
+            measured = self.calibrator.result()
+            if measured is None: self.calibration_message = f"입력이 부족합니다 ({len(self.calibrator.errors)}회). 다시 시도해 주세요."; return
+            offset, spread = measured; self.set_input_offset(offset)
+            save_input_offset(self.device_key, offset, spread, len(self.calibrator.errors))
+            self.calibration_message = f"입력 지연 {offset * 1000:.0f} ms (±{spread * 1000:.0f} ms) 저장됨"
+
+    @profiled('draw_calibration')
+    def draw_calibration(self):
+        self.screen.fill((20, 20, 30)); center = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+        if self.calibration_message is None:
+            # 링이 가운데 원에 닿는 순간이 박자. 그 순간 포즈를 바꿈 (예: 손을 폈다 -> 주먹)
+            beat, remaining = self.calibrator.beat_phase(self.time_source())
+            pygame.draw.circle(self.screen, (255, 255, 0) if beat >= 0 and remaining > 0.85 else (80, 80, 100), center, NOTE_RADIUS)
+            pygame.draw.circle(self.screen, (255, 255, 255), center, int(NOTE_RADIUS + 150 * remaining), 3)
+            count = f"{max(0, beat + 1)} / {self.calibrator.beats}" if beat >= 0 else "준비"
+            count_text = self.text_cache.render(self.medium_font, count, (255, 255, 255)); self.screen.blit(count_text, count_text.get_rect(center=(center[0], 100)))
+            message = "링이 원에 닿을 때마다 포즈를 바꾸세요 (ESC: 취소)"
+        else: message = self.calibration_message + " - 아무 키나 누르세요"
+        message_text = self.text_cache.render(self.korean_font, message, (220, 220, 220)); self.screen.blit(message_text, message_text.get_rect(center=(center[0], 500)))
+        pose_text = self.text_cache.render(self.small_font, f"Pose: {self.current_pose}", (255, 255, 255)); self.screen.blit(pose_text, (SCREEN_WIDTH - pose_text.get_width() - 10, 10))
+
     def update_loading(self):
-        self.loading_timer -= self.delta_time
-        if self.loading_timer <= 0: self.game_state = "MENU"
+        self.loader.poll()  # 모든 작업이 끝나면 콜백이 MENU로 전환
+    @profiled('draw_loading')
     def draw_loading(self):
         if self.loading_background: self.screen.blit(self.loading_background, (0, 0))
-        else: self.screen.fill((0, 0, 0)); loading_text = self.font.render("Loading...", True, (255, 255, 255)); self.screen.blit(loading_text, loading_text.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)))
+        else: self.screen.fill((0, 0, 0)); loading_text = self.text_cache.render(self.font, "Loading...", (255, 255, 255)); self.screen.blit(loading_text, loading_text.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)))
+        done, total = self.loader.progress  # 끝난 백그라운드 작업 비율
+        pygame.draw.rect(self.screen, (80, 80, 80), (200, SCREEN_HEIGHT - 40, SCREEN_WIDTH - 400, 6)); pygame.draw.rect(self.screen, (255, 255, 255), (200, SCREEN_HEIGHT - 40, (SCREEN_WIDTH - 400) * done // total, 6))
     
     # 나머지 모든 메소드는 이전 버전과 거의 동일
+    @profiled('draw_menu')
     def draw_menu(self):
         if self.menu_background: self.screen.blit(self.menu_background, (0, 0))
         else: self.screen.fill((20, 20, 30))
@@ -158,103 +362,185 @@ class Game:
     def update_credits(self):
         self.credits_timer -= self.delta_time
         if self.credits_timer <= 0: self.game_state = "MENU"
+    @profiled('draw_credits')
     def draw_credits(self):
-        self.screen.fill((0, 0, 0)); credits_text = self.font.render("MGGA", True, (255, 255, 255)); self.screen.blit(credits_text, credits_text.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)))
+        self.screen.fill((0, 0, 0)); credits_text = self.text_cache.render(self.font, "MGGA", (255, 255, 255)); self.screen.blit(credits_text, credits_text.get_rect(center=(SCREEN_WIDTH/2, SCREEN_HEIGHT/2)))
     def update_playing(self):
-        self.game_time = time.time() - self.start_time; frame = self._get_webcam_frame()
-        if frame is None: return
-        self.annotated_frame = self.hand_tracker.find_hands(frame.copy())
-        self.current_pose, _ = self.pose_comparator.match_pose(self.hand_tracker.get_landmarks())
-        self.hand_pos = self.hand_tracker.get_hand_position(self.annotated_frame.shape[1], self.annotated_frame.shape[0])
-        if self.hand_pos:
-            webcam_x_offset = (SCREEN_WIDTH - self.annotated_frame.shape[1]) // 2; self.hand_pos = (self.hand_pos[0] + webcam_x_offset, self.hand_pos[1] + 20)
-        self.note_controller.update(self.game_time, self.delta_time)
-        judgements = self.judgement_engine.check_judgements(self.note_controller.notes, self.current_pose, self.hand_pos, self.game_time, self.delta_time)
-        notes_to_remove = []
-        for j in judgements:
-            self.process_judgement(j); note, judgement_type = j['note'], j['judgement']
-            if note.note_type == 'swipe' and judgement_type in ['PERFECT', 'GREAT']: note.y_pos = JUDGEMENT_LINE_Y
-            if note.note_type == 'tap' or judgement_type in ['MISS', 'HOLD_BREAK', 'HOLD_SUCCESS', 'SWIPE_BREAK', 'SWIPE_SUCCESS']: notes_to_remove.append(note)
-        if notes_to_remove: self.note_controller.notes = [n for n in self.note_controller.notes if n not in notes_to_remove]
-        if self.note_controller.spawn_index == len(self.note_controller.beatmap) and not self.note_controller.notes:
-            self.final_score = self.score; self.game_state = "RESULTS"
-    def process_judgement(self, judgement_info):
-        judgement = judgement_info['judgement']
-        if judgement in ["PERFECT", "GREAT"]: self.combo += 1; self.score += 100 if judgement == "PERFECT" else 50
-        elif judgement in ["MISS", "HOLD_BREAK", "SWIPE_BREAK"]: self.combo = 0
-        elif judgement == "HOLD_SUCCESS": self.combo += 1; self.score += 200
-        elif judgement == "SWIPE_SUCCESS": self.combo += 1; self.score += 300
-        if judgement_info['note'].is_holding or judgement_info['note'].is_swiping: self.score += 2
-        if judgement not in ['HOLD_SUCCESS', 'SWIPE_SUCCESS']: self.last_judgement = judgement; self.judgement_display_timer = 1.0
+        # 캡처/추론은 CapturePipeline 스레드가 담당하고, 여기서는 최신 결과만 읽음
+        # 게임 로직은 현재 시각까지 SIMULATION_STEP 간격으로 따라잡고(프레임 속도와 무관하게 같은 입력이면 같은 결과, replay.py와 같은 FixedStepClock),
+        # 그리기는 마지막 두 스텝 사이를 남은 시간 비율만큼 보간한 render_time 기준
+        target_time = self.time_source() - self.start_time; result = self.capture_pipeline.latest()
+        if result is None: return
+        self.webcam_result = result; webcam_x_offset = (SCREEN_WIDTH - result.frame.shape[1]) // 2 if result.frame is not None else None
+        for player, player_input in zip(self.players, result.players):
+            player.current_pose = player_input.pose; player.similarity = player_input.similarity; player.hand_pos = player_input.hand_pos
+            if player.hand_pos and webcam_x_offset is not None:  # 주입된 입력은 이미 화면 좌표
+                player.hand_pos = (player.hand_pos[0] + webcam_x_offset, player.hand_pos[1] + WEBCAM_Y_OFFSET)
+        sample_time = result.timestamp - self.start_time
+        with self.profiler.span('game_logic'):  # 이번 프레임에 밟은 스텝 전체 (스텝마다 재면 프레임 단위 단계들과 비교가 안 됨)
+            for game_time, delta_time in self.step_clock.advance(target_time):
+                self.step_playing(game_time, delta_time, sample_time)
+                if self.game_state != "PLAYING": break
+        self.render_time = self.step_clock.render_time(target_time)
+    def step_playing(self, game_time, delta_time, sample_time):
+        # 고정 간격 한 스텝: 노트 이동 -> 판정 -> 점수 반영 (delta_time은 SIMULATION_STEP, 오래 멈춘 뒤 합쳐진 스텝만 더 김)
+        self.game_time = game_time
+        for player in self.players: player.note_controller.update(self.game_time, delta_time)
+        judgements = [player.judgement_engine.check_judgements(player.note_controller.notes, player.current_pose, player.hand_pos, self.game_time, delta_time, sample_time=sample_time) for player in self.players]
+        for player, player_judgements in zip(self.players, judgements):
+            for j in player_judgements: self.process_judgement(j, player)
+            player.note_controller.resolve_judgements(player_judgements, JUDGEMENT_LINE_Y)
+        if all(player.note_controller.is_finished() for player in self.players): self.end_game()
+    def end_game(self):
+        self.final_score = self.score; self.game_state = "RESULTS"
+        if self.recorder: self.recorder.close(); self.recorder = self.capture_pipeline.recorder = None
+        if self.session_log: self.session_log.close(); self.session_log = None
+    def process_judgement(self, judgement_info, player=None):
+        player = player or self.players[0]; judgement = judgement_info['judgement']
+        player.score, player.combo = apply_score(judgement_info, player.score, player.combo)
+        if self.session_log:
+            note = judgement_info['note']
+            self.session_log.log(self.game_time, note.spawn_time, player.index, NOTE_TYPE_IDS[note.note_type], self.session_pose_ids.get(note.target_pose, 255), JUDGEMENT_IDS[judgement],
+                                 judgement_info.get('error'), player.similarity, player.score, player.combo)
+        if judgement not in ['HOLD_SUCCESS', 'SWIPE_SUCCESS']: player.last_judgement = judgement; player.judgement_display_timer = 1.0
+    @profiled('draw_playing')
     def draw_playing(self):
         self.screen.fill((20, 20, 30));
-        if self.annotated_frame is not None:
-            frame_rgb = cv2.cvtColor(self.annotated_frame, cv2.COLOR_BGR2RGB)
-            frame_pygame = pygame.image.frombuffer(frame_rgb.tobytes(), self.annotated_frame.shape[1::-1], "RGB")
-            self.screen.blit(frame_pygame, ((SCREEN_WIDTH - self.annotated_frame.shape[1]) // 2, 20))
+        if self.webcam_result is not None and self.webcam_result.frame is not None:
+            with self.profiler.span('draw_webcam'):
+                frame = self.webcam_result.frame; frame_rect = ((SCREEN_WIDTH - frame.shape[1]) // 2, WEBCAM_Y_OFFSET, frame.shape[1], frame.shape[0])
+                self.screen.blit(self.capture_pipeline.frames.surface(self.webcam_result.frame_index), frame_rect[:2])
+                for player_input in self.webcam_result.players: self.draw_landmark_overlay(self.screen, player_input.landmarks, self.hand_connections, frame_rect)
         pygame.draw.line(self.screen, (255, 255, 0), (0, JUDGEMENT_LINE_Y), (SCREEN_WIDTH, JUDGEMENT_LINE_Y), 3)
-        for note in self.note_controller.notes: self._draw_note(note)
-        self._draw_hud()
-    def _draw_note(self, note):
-        color = NOTE_COLOR_MAP.get(note.target_pose, NOTE_COLOR_MAP["DEFAULT"]); note_x_pos = SCREEN_WIDTH // 2
-        if note.note_type == 'tap': pygame.draw.circle(self.screen, color, (note_x_pos, int(note.y_pos)), NOTE_RADIUS)
-        elif note.note_type == 'hold':
+        for player in self.players[1:]: pygame.draw.line(self.screen, (90, 90, 110), (player.lane_x - player.lane_width // 2, 0), (player.lane_x - player.lane_width // 2, SCREEN_HEIGHT), 2)  # 레인 경계
+        with self.profiler.span('draw_notes'):
+            for player in self.players:
+                fall_offset = (self.render_time - self.game_time) * player.note_controller.note_speed  # 보간: 마지막 스텝 위치에서 render_time까지 덜/더 떨어진 만큼
+                for note in player.note_controller.notes: self._draw_note(note, player.lane_x, fall_offset)
+        with self.profiler.span('draw_hud'):
+            for player in self.players: self._draw_hud(player)
+        if self.show_profiler: self._draw_profiler()
+    def _draw_note(self, note, note_x_pos=SCREEN_WIDTH // 2, fall_offset=0.0):
+        color = NOTE_COLOR_MAP.get(note.target_pose, NOTE_COLOR_MAP["DEFAULT"]); note_y = note.y_pos if note.is_swiping else note.y_pos + fall_offset  # 스와이프 중인 노트는 판정선에 고정
+        # 노트 머리(원 + 포즈 이름)는 NoteSprites에 미리 그려 둔 Surface를 맨 마지막에 한 번 blit
+        if note.note_type == 'hold':
             hold_length = note.duration * NOTE_SPEED; body_color = (80, 80, 80) if note.is_failed else ((255, 255, 255) if note.is_holding else color)
-            pygame.draw.rect(self.screen, body_color, (note_x_pos - 25, int(note.y_pos - hold_length), 50, hold_length), border_radius=10)
-            pygame.draw.circle(self.screen, color, (note_x_pos, int(note.y_pos)), NOTE_RADIUS)
+            pygame.draw.rect(self.screen, body_color, (note_x_pos - 25, int(note_y - hold_length), 50, hold_length), border_radius=10)
         elif note.note_type == 'swipe':
-            y_draw_pos = int(note.y_pos); start_pos = (note_x_pos, y_draw_pos)
+            y_draw_pos = int(note_y); start_pos = (note_x_pos, y_draw_pos)
             end_x = start_pos[0] + SWIPE_PARAMS['distance'] if note.direction == "RIGHT" else start_pos[0] - SWIPE_PARAMS['distance']
             end_pos = (end_x, y_draw_pos)
             if note.is_swiping:
-                progress = ((self.game_time - (note.spawn_time + ((JUDGEMENT_LINE_Y) / NOTE_SPEED))) / note.duration) * 1.5; progress = max(0, min(1, progress))
+                progress = ((self.render_time - (note.spawn_time + ((JUDGEMENT_LINE_Y) / NOTE_SPEED))) / note.duration) * 1.5; progress = max(0, min(1, progress))
                 interp_x = start_pos[0] + (end_pos[0] - start_pos[0]) * progress; pygame.draw.circle(self.screen, (255,255,0,100), (interp_x, start_pos[1]), 15)
             line_color = (255,255,255) if note.is_swiping else color; pygame.draw.line(self.screen, line_color, start_pos, end_pos, 10)
-            pygame.draw.circle(self.screen, color, start_pos, NOTE_RADIUS); pygame.draw.circle(self.screen, color, end_pos, NOTE_RADIUS, 5)
-        pose_text_y = int(note.y_pos); pose_text = self.small_font.render(note.target_pose, True, (0,0,0)); self.screen.blit(pose_text, pose_text.get_rect(center=(note_x_pos, pose_text_y)))
-    def _draw_hud(self):
-        if self.hand_pos: pygame.draw.circle(self.screen, (0, 255, 255), self.hand_pos, 10)
-        score_text = self.medium_font.render(f"Score: {self.score}", True, (255, 255, 255)); self.screen.blit(score_text, (10, 10))
-        if self.combo > 2:
-            combo_text = self.medium_font.render(f"{self.combo} Combo", True, (255, 200, 0)); self.screen.blit(combo_text, (SCREEN_WIDTH // 2 - combo_text.get_width() // 2, 150))
-        pose_text = self.small_font.render(f"Pose: {self.current_pose}", True, (255, 255, 255)); self.screen.blit(pose_text, (SCREEN_WIDTH - pose_text.get_width() - 10, 10))
-        if self.judgement_display_timer > 0:
-            self.judgement_display_timer -= self.delta_time
+            pygame.draw.circle(self.screen, color, end_pos, NOTE_RADIUS, 5)
+        self.note_sprites.blit(self.screen, note.target_pose, (note_x_pos, int(note_y)))
+    def _draw_hud(self, player):
+        # 플레이어 레인 안에 그림 (1인용이면 레인 = 화면 전체)
+        lane_left = player.lane_x - player.lane_width // 2; lane_right = lane_left + player.lane_width; multi = len(self.players) > 1
+        if player.hand_pos: pygame.draw.circle(self.screen, PLAYER_COLORS[player.index % len(PLAYER_COLORS)], player.hand_pos, 10)
+        # HUD 텍스트는 값이 바뀐 프레임에만 새로 렌더되고 나머지는 캐시된 Surface를 blit
+        score_text = self.text_cache.render(self.medium_font, f"P{player.index + 1} {player.score}" if multi else f"Score: {player.score}", (255, 255, 255)); self.screen.blit(score_text, (lane_left + 10, 10))
+        if player.combo > 2:
+            combo_text = self.text_cache.render(self.medium_font, f"{player.combo} Combo", (255, 200, 0)); self.screen.blit(combo_text, (player.lane_x - combo_text.get_width() // 2, 150))
+        pose_text = self.text_cache.render(self.small_font, f"Pose: {player.current_pose}", (255, 255, 255)); self.screen.blit(pose_text, (lane_right - pose_text.get_width() - 10, 50 if multi else 10))
+        if player.judgement_display_timer > 0:
+            player.judgement_display_timer -= self.delta_time
             judgement_color = {"PERFECT": (0,255,255), "GREAT": (0,255,0), "MISS": (255,0,0), "HOLD_BREAK": (255,0,0), "SWIPE_BREAK": (255,0,0)}
-            text = self.font.render(self.last_judgement, True, judgement_color.get(self.last_judgement, (255,255,255))); self.screen.blit(text, text.get_rect(center=(SCREEN_WIDTH // 2, 300)))
+            text = self.text_cache.render(self.font if len(self.players) <= 2 else self.medium_font, player.last_judgement, judgement_color.get(player.last_judgement, (255,255,255))); self.screen.blit(text, text.get_rect(center=(player.lane_x, 300)))
+    def _draw_profiler(self):
+        # 퍼센타일 계산과 패널 렌더는 0.5초마다만 하고, 나머지 프레임은 만들어 둔 패널을 blit (값이 매번 바뀌므로 TextCache는 쓰지 않음)
+        self.profiler_refresh_timer -= self.delta_time
+        if self.profiler_panel is None or self.profiler_refresh_timer <= 0: self.profiler_panel = self._build_profiler_panel(); self.profiler_refresh_timer = 0.5
+        self.screen.blit(self.profiler_panel, (10, 60))
+    def _build_profiler_panel(self):
+        stats = sorted(self.profiler.percentiles().items(), key=lambda item: -item[1][1]); line_height = self.profiler_font.get_linesize()
+        panel = pygame.Surface((340, line_height * (len(stats) + 1) + 8), pygame.SRCALPHA); panel.fill((0, 0, 0, 170))
+        rows = [(("stage (ms)", "p50", "p95", "p99"), (200, 200, 200))]
+        # 60fps 한 프레임 예산을 p95가 넘는 단계는 빨간색
+        rows += [((name, f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}"), (255, 80, 80) if p95 > FRAME_BUDGET_MS else (255, 255, 255)) for name, (p50, p95, p99) in stats]
+        for i, (cells, color) in enumerate(rows):
+            y = 4 + line_height * i; panel.blit(self.profiler_font.render(cells[0], True, color), (6, y))
+            for right, cell in zip((200, 260, 320), cells[1:]):  # 숫자 열은 오른쪽 정렬
+                text = self.profiler_font.render(cell, True, color); panel.blit(text, (right - text.get_width(), y))
+        return panel
     def reset_game(self):
-        self.score = 0; self.combo = 0; self.last_judgement = ""; self.judgement_display_timer = 0
-        self.note_controller.reset(); self.start_time = time.time()
+        # 연습 모드: practice_start초 지점부터 시작 (판정 폭에 아직 안 들어온 노트부터 생성)
+        for player in self.players: player.reset_scores(); player.note_controller.reset(self.practice_start, PRACTICE_LEAD_TIME); player.judgement_engine.reset()
+        self.start_time = self.time_source() - self.practice_start; self.game_time = self.render_time = self.practice_start; self.step_clock.reset(self.practice_start)
+    @profiled('draw_results')
     def draw_results(self):
-        self.screen.fill((20, 20, 30)); title = self.font.render("RESULTS", True, (255, 200, 0)); score = self.medium_font.render(f"Final Score: {self.final_score}", True, (255, 255, 255)); prompt = self.small_font.render("Press any key or click to return to Menu", True, (200, 200, 200))
+        final_text = f"Final Score: {self.final_score}" if len(self.players) == 1 else "   ".join(f"P{player.index + 1}: {player.score}" for player in self.players)
+        self.screen.fill((20, 20, 30)); title = self.text_cache.render(self.font, "RESULTS", (255, 200, 0)); score = self.text_cache.render(self.medium_font, final_text, (255, 255, 255)); prompt = self.text_cache.render(self.small_font, "Press any key or click to return to Menu", (200, 200, 200))
         self.screen.blit(title, title.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 - 100))); self.screen.blit(score, score.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2))); self.screen.blit(prompt, prompt.get_rect(center=(SCREEN_WIDTH//2, SCREEN_HEIGHT//2 + 100)))
-    def _get_webcam_frame(self, flip=True):
-        success, frame = self.cap.read();
-        if not success: return None
-        return cv2.flip(frame, 1) if flip else frame
-    def quit(self): self.cap.release(); pygame.quit()
+    def quit(self):
+        if self.capture_pipeline: self.capture_pipeline.stop()  # 로딩 중에 종료하면 아직 없음
+        if self.session_log: self.session_log.close(); self.session_log = None  # 플레이 도중 종료해도 그때까지의 판정은 남김
+        if self.headless: return
+        if self.cap: self.cap.release()
+        pygame.quit()
+        if self.recorder: self.recorder.close()
+        if self.profile_trace: print(f"Wrote {self.profiler.dump_trace(self.profile_trace)} trace events to {self.profile_trace}")
+
+# --- 백그라운드 로딩 작업 (BackgroundLoader 스레드에서 실행) ---
+def _open_camera():
+    import cv2
+    return cv2.VideoCapture(0)
+def _build_hand_tracker(max_hands=1):
+    # mediapipe import + 그래프 생성이 가장 오래 걸림. 캡처 파이프라인 모듈(cv2)도 여기서 미리 import
+    from hand_tracker import HandTracker
+    import capture_pipeline
+    return HandTracker(max_hands=max_hands, **HAND_TRACKING_PARAMS)
+def _decode_image(path):
+    # PNG 디코딩/축소는 디스플레이 없이 가능하므로 백그라운드에서, convert()는 메인 스레드에서
+    try: return pygame.transform.scale(pygame.image.load(path), (SCREEN_WIDTH, SCREEN_HEIGHT))
+    except (pygame.error, FileNotFoundError) as e: print(f"Cannot load image '{path}': {e}"); return None
+def _convert(image): return image.convert() if image is not None else None
+
+def generate_test_beatmap(poses, rng=random):
+    notes = []; current_time = 2.0
+    available_game_poses = [p for p in poses if p in ["DEFAULT", "GRAB", "PICK"]]
+    if not available_game_poses: available_game_poses = ["DEFAULT"]
+    for _ in range(12):
+        note_type = rng.choice(['tap', 'hold', 'swipe']); pose = rng.choice(available_game_poses)
+        if note_type == 'tap': notes.append({"time": current_time, "pose": pose, "type": "tap"}); current_time += rng.uniform(0.8, 1.2)
+        elif note_type == 'hold':
+            duration = rng.uniform(1.0, 2.0)
+            notes.append({"time": current_time, "pose": pose, "type": "hold", "duration": duration})
+            current_time += duration + rng.uniform(0.5, 1.0)
+        elif note_type == 'swipe':
+            duration = rng.uniform(1.2, 2.25); direction = rng.choice(["LEFT", "RIGHT"])
+            notes.append({"time": current_time, "pose": pose, "type": "swipe", "duration": duration, "direction": direction})
+            current_time += duration + rng.uniform(0.5, 1.0)
+    return {"song": "dynamic_test_beatmap", "bpm": 120, "notes": notes}
 
 if __name__ == '__main__':
-    def generate_test_beatmap(poses):
-        notes = []; current_time = 2.0
-        available_game_poses = [p for p in poses if p in ["DEFAULT", "GRAB", "PICK"]]
-        if not available_game_poses: available_game_poses = ["DEFAULT"]
-        for _ in range(12):
-            note_type = random.choice(['tap', 'hold', 'swipe']); pose = random.choice(available_game_poses)
-            if note_type == 'tap': notes.append({"time": current_time, "pose": pose, "type": "tap"}); current_time += random.uniform(0.8, 1.2)
-            elif note_type == 'hold':
-                duration = random.uniform(1.0, 2.0)
-                notes.append({"time": current_time, "pose": pose, "type": "hold", "duration": duration})
-                current_time += duration + random.uniform(0.5, 1.0)
-            elif note_type == 'swipe':
-                duration = random.uniform(1.2, 2.25); direction = random.choice(["LEFT", "RIGHT"])
-                notes.append({"time": current_time, "pose": pose, "type": "swipe", "duration": duration, "direction": direction})
-                current_time += duration + random.uniform(0.5, 1.0)
-        return {"song": "dynamic_test_beatmap", "bpm": 120, "notes": notes}
-    available_poses = []
-    try:
-        with open('poses.json', 'r') as f: available_poses = list(json.load(f).keys())
-    except FileNotFoundError: pass
-    if not available_poses: available_poses = ["DEFAULT", "GRAB", "PICK"]
-    with open('level1.json', 'w') as f: json.dump(generate_test_beatmap(available_poses), f, indent=4)
-    game = Game(); game.run()
\ No newline at end of file
+    # 비트맵은 level1.json이 없거나 --generate를 줬을 때만 새로 만듦 (매번 덮어쓰면 컴파일 캐시도 매번 무효화됨)
+    # 자동 채보: 기존 level1.json의 bpm 박자에 맞춰, --difficulty 난이도(1~10, 기본 3)로 칠 수 있는 노트만 배치
+    if '--generate' in sys.argv or not os.path.exists('level1.json'):
+        available_poses = []; bpm = 120
+        try:
+            with open('poses.json', 'r') as f: available_poses = [p for p in json.load(f).keys() if p in ["DEFAULT", "GRAB", "PICK"]]
+        except FileNotFoundError: pass
+        try:
+            with open('level1.json', 'r') as f: bpm = json.load(f).get('bpm') or bpm
+        except (FileNotFoundError, ValueError): pass
+        if not available_poses: available_poses = ["DEFAULT", "GRAB", "PICK"]
+        difficulty = float(sys.argv[sys.argv.index('--difficulty') + 1]) if '--difficulty' in sys.argv[:-1] else 3.0
+        chart_engine = ChartEngine(NOTE_SPEED, JUDGEMENT_LINE_Y, NOTE_RADIUS, JUDGEMENT_THRESHOLDS['GREAT'])
+        try: chart = chart_engine.generate(available_poses, bpm, difficulty, length=60.0, song="level1")
+        except ValueError as e: sys.exit(f"Cannot generate level1.json: {e}")  # 빈/잘못된 차트로 기존 레벨을 덮어쓰지 않음
+        with open('level1.json', 'w') as f: json.dump(beatmap_to_json(chart), f, indent=4)
+    # --record 디렉터리: 플레이마다 랜드마크 로그를 남김 / --practice 초: 곡 중간부터 연습
+    record_dir = sys.argv[sys.argv.index('--record') + 1] if '--record' in sys.argv[:-1] else None
+    practice_start = float(sys.argv[sys.argv.index('--practice') + 1]) if '--practice' in sys.argv[:-1] else 0.0
+    # --profile-trace 파일: 종료 시 단계별 프레임 트레이스(Chrome trace JSON)를 씀
+    profile_trace = sys.argv[sys.argv.index('--profile-trace') + 1] if '--profile-trace' in sys.argv[:-1] else None
+    # --players N: 한 카메라 앞에서 N명(최대 4) 동시 플레이
+    player_count = min(4, max(1, int(sys.argv[sys.argv.index('--players') + 1]))) if '--players' in sys.argv[:-1] else 1
+    # --session-dir 디렉터리: 판정 로그 위치 (기본 sessions) / --no-sessions: 판정 로그를 남기지 않음
+    session_dir = None if '--no-sessions' in sys.argv else sys.argv[sys.argv.index('--session-dir') + 1] if '--session-dir' in sys.argv[:-1] else 'sessions'
+    # --fps N: 화면 프레임 상한 (기본 60, 0이면 제한 없음) / --vsync: 모니터 주사율에 맞춤. 게임 로직은 어느 쪽이든 240Hz 고정
+    render_fps = int(sys.argv[sys.argv.index('--fps') + 1]) if '--fps' in sys.argv[:-1] else 60; vsync = '--vsync' in sys.argv
+    game = Game(record_dir=record_dir, practice_start=practice_start, profile_trace=profile_trace, player_count=player_count, session_dir=session_dir, render_fps=render_fps, vsync=vsync); game.run()
\ No newline at end of file
@@ -1,9 +1,13 @@
 # note_system.py
 # 이 파일의 내용을 아래 코드로 전체 교체하세요.
-import json
+from beatmap_format import CompiledBeatmap, load_beatmap
 
 class Note:
     """스와이프 노트 유예 시간 타이머 추가"""
+    # 노트가 수천 개여도 가볍도록 __dict__ 없이 고정 슬롯만 사용
+    __slots__ = ('spawn_time', 'target_pose', 'note_type', 'duration', 'direction', 'swipe_pose_grace_timer', 'swipe_end_time', 'hit_error',
+                 'swipe_pose_lost_time', 'is_judged', 'is_holding', 'is_swiping', 'is_failed', 'y_pos')
+
     def __init__(self, spawn_time, target_pose, note_type='tap', duration=0, direction=None):
         self.spawn_time = spawn_time
         self.target_pose = target_pose
@@ -13,6 +17,10 @@ class Note:
         
         # <<< 추가된 부분: 스와이프 포즈 유지를 위한 유예 시간 타이머
         self.swipe_pose_grace_timer = 0.0
+        self.swipe_end_time = 0.0
+        # 시간 기준 판정용: 스와이프 중 포즈가 풀린 시각
+        self.swipe_pose_lost_time = None
+        self.hit_error = None  # PERFECT/GREAT로 맞춘 입력의 타이밍 오차(초, 양수면 늦음). 세션 로그용
 
         self.is_judged = False
         self.is_holding = False
@@ -22,24 +30,42 @@ class Note:
 
 class NoteController:
     # 이 클래스는 변경 사항이 없습니다. 이전 버전과 동일합니다.
-    def __init__(self, beatmap_file, speed=300):
-        self.beatmap_file = beatmap_file; self.note_speed = speed 
-        self.beatmap = self._load_beatmap(self.beatmap_file)
-        self.notes = []; self.spawn_index = 0
+    # notes: 활성 노트를 키로 쓰는 dict (생성 순서 유지 + O(1) 제거). 순회하면 노트가 나옴
+    def __init__(self, beatmap_file, speed=300, beatmap=None, time_based=False):
+        # beatmap을 직접 넘기면 파일 대신 그 노트 목록을 사용 (리플레이 등)
+        # time_based=True면 노트 위치를 delta 누적 대신 (game_time - spawn_time)으로 계산 (시간 기준 판정과 짝)
+        self.beatmap_file = beatmap_file; self.note_speed = speed; self.time_based = time_based
+        # self.beatmap은 컴파일된 비트맵(CompiledBeatmap). 파일은 .hxbm으로 한 번 컴파일된 뒤 캐시되어 reset 때 다시 파싱하지 않음
+        self.beatmap = CompiledBeatmap.from_notes(beatmap) if beatmap is not None else self._load_beatmap(self.beatmap_file)
+        self.notes = {}; self.spawn_index = 0
     def _load_beatmap(self, beatmap_file):
-        try:
-            with open(beatmap_file, 'r') as f: return sorted(json.load(f)['notes'], key=lambda x: x['time'])
-        except FileNotFoundError: print(f"Error: Beatmap file '{beatmap_file}' not found."); return []
-    def reset(self):
-        self.notes = []; self.spawn_index = 0
-        self.beatmap = self._load_beatmap(self.beatmap_file)
-    def update(self, game_time, delta_time):
-        if self.spawn_index < len(self.beatmap):
-            note_data = self.beatmap[self.spawn_index]
-            if game_time >= note_data['time']:
-                new_note = Note(note_data['time'], note_data['pose'], note_data.get('type', 'tap'), note_data.get('duration', 0), note_data.get('direction', None))
-                self.notes.append(new_note)
-                self.spawn_index += 1
+        try: return load_beatmap(beatmap_file)
+        except FileNotFoundError: print(f"Error: Beatmap file '{beatmap_file}' not found."); return CompiledBeatmap.from_notes([])
+    def reset(self, start_time=0.0, lead_time=0.0):
+        """start_time(초)부터 다시 시작합니다 (연습 모드). 시간 인덱스로 start_time - lead_time 이후 노트로 바로 건너뛰어,
+        그 시각에 이미 떨어지고 있어야 할 노트부터 생성합니다."""
+        self.notes = {}
+        if self.beatmap_file: self.beatmap = self._load_beatmap(self.beatmap_file)
+        self.spawn_index = self.beatmap.seek(start_time - lead_time) if start_time > 0 else 0
+    def resolve_judgements(self, judgements, judgement_line_y):
+        """판정 결과에 따라 끝난 노트를 제거하고, 스와이프 시작 노트를 판정선에 고정합니다."""
+        for j in judgements:
+            note, judgement_type = j['note'], j['judgement']
+            if note.note_type == 'swipe' and judgement_type in ['PERFECT', 'GREAT']: note.y_pos = judgement_line_y
+            if note.note_type == 'tap' or judgement_type in ['MISS', 'HOLD_BREAK', 'HOLD_SUCCESS', 'SWIPE_BREAK', 'SWIPE_SUCCESS']: self.notes.pop(note, None)
+    def is_finished(self): return self.spawn_index == len(self.beatmap) and not self.notes
+    def update(self, game_time, delta_time, move_notes=True):
+        # 정렬된 beatmap 위의 커서로, 이번 틱까지 시간이 된 노트를 모두 생성
+        # 늦게 생성된 노트는 지난 시간만큼 내려간 위치에서 시작해 밀리지 않게 함
+        # move_notes=False: time_based면 y_pos는 그리기에만 쓰이므로 그리지 않는 경우(리플레이) 위치 갱신을 생략. 누적 이동(distance 모드)에서는 무시
+        times = self.beatmap.times
+        while self.spawn_index < len(times) and game_time >= times[self.spawn_index]:
+            new_note = Note(*self.beatmap.note_fields(self.spawn_index))
+            new_note.y_pos = max(0.0, game_time - new_note.spawn_time - delta_time) * self.note_speed
+            self.notes[new_note] = None
+            self.spawn_index += 1
+        if self.time_based and not move_notes: return
         for note in self.notes:
             if note.note_type == 'swipe' and note.is_swiping: continue
-            note.y_pos += self.note_speed * delta_time
\ No newline at end of file
+            if self.time_based: note.y_pos = (game_time - note.spawn_time) * self.note_speed
+            else: note.y_pos += self.note_speed * delta_time
\ No newline at end of file
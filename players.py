@@ -0,0 +1,49 @@
+# players.py
+# 여러 명이 한 카메라 앞에서 플레이할 때, 프레임마다 검출된 손들을 고정된 플레이어 번호에 배정합니다.
+import itertools
+
+
+class PlayerAssigner:
+    """검출된 손 -> 플레이어 번호 배정.
+    - 플레이어 i의 기준점은 최근 memory초 안에 본 마지막 손목 위치, 없으면 자기 레인(화면을 player_count등분한 구간)의 가운데
+    - 비용 = 기준점과의 거리(정규화 좌표) + 처음 배정된 손과 handedness(왼손/오른손)가 다르면 handedness_penalty
+    - 전체 비용이 가장 작은 배정을 고르되(플레이어가 몇 명 안 되므로 모든 순열을 비교), max_distance보다 먼 손은 배정하지 않음
+    손이 서로 교차하거나 한 프레임 놓쳐도 번호가 뒤바뀌지 않습니다."""
+    def __init__(self, player_count, handedness_penalty=0.25, max_distance=0.35, memory=0.5):
+        self.player_count = player_count
+        self.handedness_penalty = handedness_penalty
+        self.max_distance = max_distance
+        self.memory = memory
+        self.homes = [(index + 0.5) / player_count for index in range(player_count)]
+        self.reset()
+
+    def reset(self):
+        self.last_positions = [None] * self.player_count  # (x, y, 본 시각)
+        self.handedness = [None] * self.player_count
+
+    def _cost(self, player, wrist, label, timestamp):
+        last = self.last_positions[player]
+        if last is not None and timestamp - last[2] <= self.memory:
+            distance = ((wrist[0] - last[0]) ** 2 + (wrist[1] - last[1]) ** 2) ** 0.5
+        else: distance = abs(wrist[0] - self.homes[player])  # 한동안 안 보였으면 레인 위치만 봄
+        if distance > self.max_distance: return None
+        if self.handedness[player] is not None and label is not None and label != self.handedness[player]: distance += self.handedness_penalty
+        return distance
+
+    def assign(self, wrists, labels, timestamp):
+        """wrists: 손마다 손목 (x, y) 정규화 좌표, labels: handedness 라벨.
+        플레이어 수 길이의 리스트를 반환합니다. 각 원소는 배정된 손의 인덱스 또는 None."""
+        costs = [[self._cost(player, wrist, label, timestamp) for wrist, label in zip(wrists, labels)] for player in range(self.player_count)]
+        best, best_key = [None] * self.player_count, None
+        hand_slots = list(range(len(wrists))) + [None] * self.player_count  # None: 이 플레이어는 이번 프레임에 손 없음
+        for choice in set(itertools.permutations(hand_slots, self.player_count)):
+            if any(hand is not None and costs[player][hand] is None for player, hand in enumerate(choice)): continue
+            # 배정한 손이 많을수록 우선, 같으면 비용 합이 작은 쪽
+            key = (-sum(hand is not None for hand in choice), sum(costs[player][hand] for player, hand in enumerate(choice) if hand is not None))
+            if best_key is None or key < best_key: best, best_key = list(choice), key
+
+        for player, hand in enumerate(best):
+            if hand is None: continue
+            self.last_positions[player] = (wrists[hand][0], wrists[hand][1], timestamp)
+            if self.handedness[player] is None: self.handedness[player] = labels[hand]
+        return best
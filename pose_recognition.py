@@ -3,25 +3,52 @@ import json
 
 class PoseComparator:
     """저장된 포즈와 실시간 랜드마크를 비교하여 현재 포즈를 인식하는 클래스"""
-    def __init__(self, pose_file='poses.json', threshold=0.85):
-        self.pose_library = self._load_poses(pose_file)
+    # pose_file: poses.json(포즈 설정 화면/create_pose_data.py) 또는 오프라인으로 만든 .npz 데이터셋
+    # pose_library: {이름: 샘플 배열}을 직접 넘기면 파일을 읽지 않음 (평가용)
+    # max_samples_per_pose: 포즈당 중심에 가까운 샘플만 이만큼 남김. None이면 전부 사용 (큰 .npz 데이터셋용)
+    def __init__(self, pose_file='poses.json', threshold=0.85, k_neighbors=5, max_samples_per_pose=8, pose_library=None):
+        self.pose_library = pose_library if pose_library is not None else self._load_poses(pose_file)
         self.similarity_threshold = threshold
+        self.k_neighbors = k_neighbors
+        self.max_samples_per_pose = max_samples_per_pose
+        self._build_pose_matrix()
         print(f"Pose library loaded with: {list(self.pose_library.keys())}")
 
+    def _build_pose_matrix(self):
+        """라이브러리를 단위 벡터 행렬로 한 번만 변환해 둡니다.
+        pose_matrix: (포즈 수 x 63) 포즈별 중심(centroid), sample_matrix: (샘플 수 x 63) 압축된 샘플 집합"""
+        self.pose_names = list(self.pose_library.keys())
+        centroids, samples, labels = [], [], []
+        for index, name in enumerate(self.pose_names):
+            pose_samples = _unit_rows(np.array(self.pose_library[name], dtype=np.float64).reshape(-1, 63))
+            centroid = _unit_rows(pose_samples.mean(axis=0, keepdims=True))[0]
+            # 중심에서 먼 샘플(흔들린 프레임)부터 버리고 max_samples_per_pose개만 유지
+            keep = np.argsort(-(pose_samples @ centroid))[:self.max_samples_per_pose]
+            centroids.append(centroid); samples.append(pose_samples[keep]); labels.extend([index] * len(keep))
+        self.pose_matrix = np.array(centroids) if centroids else np.zeros((0, 63))
+        self.sample_matrix = np.vstack(samples) if samples else np.zeros((0, 63))
+        self.sample_labels = np.array(labels, dtype=np.intp)
+
     def _load_poses(self, pose_file):
+        """포즈 파일을 {이름: [샘플, ...]} 형태로 읽습니다. 예전 형식(포즈당 63개 값 하나)도 샘플 1개로 취급합니다."""
         try:
+            if pose_file.endswith('.npz'):
+                vectors, labels, names, _ = load_pose_dataset(pose_file)
+                return {name: vectors[labels == index] for index, name in enumerate(names) if np.any(labels == index)}
             with open(pose_file, 'r') as f:
-                return json.load(f)
+                poses = json.load(f)
         except FileNotFoundError:
             print(f"Error: {pose_file} not found. Please run create_pose_data.py first.")
             return {}
+        return {name: (data if data and isinstance(data[0], list) else [data]) for name, data in poses.items()}
 
     def _normalize_landmarks(self, landmarks):
         """실시간 랜드마크를 정규화합니다."""
-        if not landmarks:
+        if landmarks is None or len(landmarks) == 0:
             return None
         
-        coords = np.array([[lm.x, lm.y, lm.z] for lm in landmarks])
+        if isinstance(landmarks, np.ndarray): coords = landmarks.astype(np.float64).reshape(21, 3)
+        else: coords = np.array([[lm.x, lm.y, lm.z] for lm in landmarks])
         wrist = coords[0]
         coords -= wrist
 
@@ -34,27 +61,227 @@ class PoseComparator:
 
     def match_pose(self, live_landmarks):
         """실시간 랜드마크와 라이브러리의 모든 포즈를 비교하여 가장 유사한 포즈를 찾습니다."""
-        if not live_landmarks or not self.pose_library:
+        if live_landmarks is None or len(live_landmarks) == 0 or not self.pose_library:
             return "UNKNOWN", 0.0
 
         normalized_live = self._normalize_landmarks(live_landmarks)
         if normalized_live is None:
             return "UNKNOWN", 0.0
 
-        best_match_pose = "UNKNOWN"
-        max_similarity = 0.0
+        names, similarities = self.match_pose_batch(normalized_live[np.newaxis, :])
+        return names[0], similarities[0]
+
+    def match_pose_batch(self, normalized_vectors):
+        """정규화된 (프레임 수 x 63) 배열을 한 번에 분류합니다. (포즈 이름 리스트, 유사도 배열)을 반환합니다.
+        샘플 k-NN 투표로 포즈를 고르고, 유사도는 그 포즈의 중심/최근접 샘플 중 높은 값을 씁니다."""
+        votes, similarities = self.pose_votes(normalized_vectors)
+        frame_count = len(votes)
+        if len(self.pose_names) == 0:
+            return ["UNKNOWN"] * frame_count, np.zeros(frame_count)
+        best_indices = np.argmax(votes, axis=1)
+        max_similarities = similarities[np.arange(frame_count), best_indices]
+        names = [self.pose_names[i] if sim > 0 and sim >= self.similarity_threshold else "UNKNOWN"
+                 for i, sim in zip(best_indices, max_similarities)]
+        return names, max_similarities
+
+    def pose_votes(self, normalized_vectors):
+        """(프레임 수 x 포즈 수) 배열 두 개 (votes, similarities). match_pose_batch와 StreamingPoseClassifier가 같은 값으로 분류합니다.
+        votes: 가장 가까운 k개 샘플이 유사도만큼 자기 포즈에 던진 표 (동점이면 중심 유사도가 큰 쪽이 이기도록 아주 작은 값을 더함)
+        similarities: 포즈 중심 유사도와 k개 이웃 중 그 포즈 샘플의 최대 유사도 중 큰 값"""
+        vectors = np.asarray(normalized_vectors, dtype=np.float64).reshape(-1, 63)
+        frame_count = len(vectors)
+        if len(self.pose_names) == 0:
+            return np.zeros((frame_count, 0)), np.zeros((frame_count, 0))
+
+        norms = np.linalg.norm(vectors, axis=1)
+        norms[norms == 0] = np.inf  # 영벡터는 유사도 0 -> UNKNOWN
+        unit_vectors = vectors / norms[:, np.newaxis]
+
+        centroid_sims = unit_vectors @ self.pose_matrix.T
+        sample_sims = unit_vectors @ self.sample_matrix.T
+
+        # k-NN: 가장 가까운 k개 샘플이 유사도만큼 자기 포즈에 투표
+        k = min(self.k_neighbors, len(self.sample_labels))
+        rows = np.arange(frame_count)[:, np.newaxis]
+        neighbors = np.argpartition(-sample_sims, k - 1, axis=1)[:, :k] if k < sample_sims.shape[1] else np.broadcast_to(np.arange(k), (frame_count, k))
+        neighbor_sims = np.maximum(sample_sims[rows, neighbors], 0.0)
+        neighbor_labels = self.sample_labels[neighbors]
+        votes = np.zeros((frame_count, len(self.pose_names))); neighbor_best = np.zeros((frame_count, len(self.pose_names)))
+        vote_index = (np.broadcast_to(rows, neighbor_labels.shape), neighbor_labels)
+        np.add.at(votes, vote_index, neighbor_sims); np.maximum.at(neighbor_best, vote_index, neighbor_sims)
+        return votes + 1e-9 * centroid_sims, np.maximum(np.maximum(centroid_sims, neighbor_best), 0.0)
+
+
+class StreamingPoseClassifier:
+    """프레임마다 독립적으로 판단하지 않는 실시간 포즈 분류기.
+    정규화된 랜드마크에 One-Euro 필터를 걸고, 포즈 전환에 히스테리시스를 둡니다.
+    - 현재 포즈는 유사도가 exit_threshold 아래로 떨어질 때까지 유지
+    - 다른 포즈로 바꾸려면 similarity_threshold 이상인 최고 후보로 switch_hold초 동안 유지되어야 함
+      (현재 포즈가 exit_threshold 아래면 즉시 전환)
+    포즈 선택은 match_pose_batch와 같은 k-NN 투표(pose_votes)를 씁니다.
+    지연 예산 max_latency를 필터 지연(1/(2π·cutoff))과 switch_hold에 반씩 나누므로 둘을 합한 전환 지연이 max_latency 이하이고,
+    그 합이 latency_ms로 보고됩니다."""
+    def __init__(self, pose_comparator, min_cutoff=1.0, beta=0.5, d_cutoff=1.0, exit_margin=0.05, max_latency=1 / 30):
+        self.pose_comparator = pose_comparator
+        self.switch_hold = max_latency / 2
+        self.min_cutoff = max(min_cutoff, 1.0 / (2 * np.pi * (max_latency - self.switch_hold)))
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.exit_threshold = pose_comparator.similarity_threshold - exit_margin
+        self.dropout_hold = max_latency  # 손이 한 프레임 끊겨도 바로 UNKNOWN으로 떨어지지 않게 유지하는 시간
+        self.switch_count = 0
+        self.reset()
+
+    def reset(self):
+        self._x = None; self._dx = None; self._t = None; self._last_seen = None
+        self._candidate = None; self._candidate_since = None
+        self.current_pose = "UNKNOWN"; self.current_similarity = 0.0
+
+    @property
+    def latency_ms(self):
+        """필터 지연 + 전환 대기 (ms)."""
+        filter_delay = float(np.mean(1.0 / (2 * np.pi * (self.min_cutoff + self.beta * np.abs(self._dx))))) if self._dx is not None else 0.0
+        return (filter_delay + self.switch_hold) * 1000.0
+
+    def update(self, live_landmarks, timestamp):
+        """새 샘플 하나를 반영하고 (포즈, 유사도)를 반환합니다."""
+        normalized = self.pose_comparator._normalize_landmarks(live_landmarks)
+        if normalized is None: return self._decide(None, timestamp)
+        votes, similarities = self.pose_comparator.pose_votes(self._filter(normalized, timestamp))
+        return self._decide(_best_scores(votes, similarities)[0], timestamp)
+
+    def classify_sequence(self, normalized_vectors, valid, timestamps):
+        """기록된 (프레임 수 x 63) 시퀀스를 실시간과 같은 결과로 분류합니다. 필터만 순서대로 돌리고 유사도는 한 번에 계산합니다.
+        리플레이가 로그마다 프레임 전체를 다시 돌리므로 프레임별 반복은 파이썬 float/list로 합니다."""
+        self.reset()
+        vectors = np.asarray(normalized_vectors, dtype=np.float64); filtered = np.zeros_like(vectors)
+        times = np.asarray(timestamps, dtype=np.float64).tolist(); valid = np.asarray(valid, dtype=bool)
+        for i in np.flatnonzero(valid).tolist(): filtered[i] = self._filter(vectors[i], times[i])
+        scores = _best_scores(*self.pose_comparator.pose_votes(filtered))
+        results = [self._decide(frame_scores if ok else None, t) for frame_scores, ok, t in zip(scores, valid.tolist(), times)]
+        self.reset()
+        return [name for name, _ in results], np.array([sim for _, sim in results])
+
+    def _filter(self, x, t):
+        """63차원 벡터 전체에 대한 One-Euro 필터 한 스텝."""
+        if self._x is None or self._t is None or t - self._t > 0.5:  # 처음이거나 오래 끊겼으면 필터를 새로 시작
+            self._x = x.copy(); self._dx = np.zeros_like(x); self._t = t
+            return self._x
+        dt = t - self._t
+        if dt <= 0: return self._x
+        self._t = t
+        alpha_d = _smoothing_alpha(dt, self.d_cutoff); delta = x - self._x
+        self._dx *= 1 - alpha_d; self._dx += (alpha_d / dt) * delta
+        # x_prev + alpha * delta 에서 alpha = k*cutoff / (1 + k*cutoff), k = 2π·dt 이므로 x - delta / (1 + k*cutoff)와 같음 (배열 연산 수를 줄인 형태)
+        k = 2 * np.pi * dt; remaining = np.abs(self._dx); remaining *= k * self.beta; remaining += 1.0 + k * self.min_cutoff
+        np.divide(delta, remaining, out=remaining)
+        self._x = x - remaining
+        return self._x
+
+    def _decide(self, scores, t):
+        """scores: 이 프레임의 (투표 1위 포즈 인덱스, 포즈별 유사도 list), 손이 없거나 포즈 라이브러리가 비었으면 None."""
+        if scores is None:
+            if self.current_pose != "UNKNOWN" and self._last_seen is not None and t - self._last_seen <= self.dropout_hold:
+                return self.current_pose, self.current_similarity
+            return self._set("UNKNOWN", 0.0)
+        self._last_seen = t
+
+        names = self.pose_comparator.pose_names; best, similarities = scores
+        best_similarity = similarities[best]
+        enter_threshold = self.pose_comparator.similarity_threshold
+        current_similarity = similarities[names.index(self.current_pose)] if self.current_pose in names else -1.0
+        if names[best] != self.current_pose and best_similarity >= enter_threshold:
+            if self._candidate != names[best]: self._candidate, self._candidate_since = names[best], t
+            if current_similarity < self.exit_threshold or t - self._candidate_since >= self.switch_hold:
+                return self._set(names[best], best_similarity)
+            return self._set(self.current_pose, current_similarity)
+        self._candidate = None
+        if current_similarity >= self.exit_threshold: return self._set(self.current_pose, current_similarity)
+        if best_similarity >= enter_threshold: return self._set(names[best], best_similarity)
+        return self._set("UNKNOWN", best_similarity)
+
+    def _set(self, pose, similarity):
+        if pose != self.current_pose: self.switch_count += 1; self._candidate = None
+        self.current_pose = pose; self.current_similarity = similarity
+        return pose, similarity
+
+
+class PoseSeparationMatrix:
+    """포즈 설정 화면용. 이미 저장한 포즈 샘플(단위 벡터)과 포즈 사이 유사도 행렬을 들고 있다가,
+    포즈를 하나 저장할 때마다 새 포즈의 행/열만 계산해 붙입니다 (기존 쌍은 다시 계산하지 않음).
+    포즈 사이 유사도는 두 포즈 샘플 사이 코사인 유사도의 최댓값, 즉 가장 헷갈리는 샘플 쌍 기준입니다."""
+    def __init__(self):
+        self.pose_names = []
+        self.samples = np.zeros((0, 63))
+        self.sample_starts = np.zeros(0, dtype=np.intp)  # 포즈별 샘플 시작 위치 (reduceat 구간)
+        self.matrix = np.zeros((0, 0))
+
+    def similarities(self, normalized_vectors):
+        """(프레임 수 x 저장된 포즈 수) 각 프레임과 저장된 포즈별 최대 코사인 유사도. 라이브 프레임마다 행렬-벡터 곱 한 번입니다."""
+        unit_vectors = _unit_rows(np.asarray(normalized_vectors, dtype=np.float64).reshape(-1, 63))
+        if not self.pose_names: return np.zeros((len(unit_vectors), 0))
+        return np.maximum.reduceat(unit_vectors @ self.samples.T, self.sample_starts, axis=1)
+
+    def add_pose(self, name, normalized_samples):
+        """포즈를 추가하고 새 포즈와 기존 포즈들 사이 유사도(새 행/열)를 반환합니다."""
+        unit_samples = _unit_rows(np.asarray(normalized_samples, dtype=np.float64).reshape(-1, 63))
+        row = self.similarities(unit_samples).max(axis=0)
+        self.matrix = np.block([[self.matrix, row[:, np.newaxis]], [row[np.newaxis, :], np.ones((1, 1))]])
+        self.sample_starts = np.append(self.sample_starts, len(self.samples)); self.samples = np.vstack([self.samples, unit_samples]); self.pose_names.append(name)
+        return row
+
+    def closest_pair(self):
+        """(포즈 a, 포즈 b, 유사도): 서로 가장 비슷한 저장된 포즈 쌍. 포즈가 2개 미만이면 None."""
+        if len(self.pose_names) < 2: return None
+        off_diagonal = self.matrix - 2 * np.eye(len(self.pose_names))
+        a, b = np.unravel_index(np.argmax(off_diagonal), off_diagonal.shape)
+        return self.pose_names[a], self.pose_names[b], float(self.matrix[a, b])
+
+
+def update_classifiers(classifiers, landmarks_list, timestamp):
+    """같은 PoseComparator를 쓰는 여러 플레이어의 분류기를 한 프레임 분량 갱신하고 [(포즈, 유사도), ...]를 반환합니다.
+    필터/히스테리시스 상태는 플레이어마다 따로 두고, 라이브러리 유사도는 보이는 손들을 쌓아 한 번의 행렬 곱으로 계산합니다."""
+    comparator = classifiers[0].pose_comparator
+    visible, filtered = [], []
+    for index, (classifier, landmarks) in enumerate(zip(classifiers, landmarks_list)):
+        normalized = comparator._normalize_landmarks(landmarks)
+        if normalized is not None: visible.append(index); filtered.append(classifier._filter(normalized, timestamp))
+    scores = dict(zip(visible, _best_scores(*comparator.pose_votes(np.array(filtered))))) if filtered else {}
+    return [classifier._decide(scores.get(index), timestamp) for index, classifier in enumerate(classifiers)]
+
+
+def save_pose_dataset(path, vectors, labels, names, sources):
+    """정규화된 샘플 배열 데이터셋을 .npz 하나로 저장합니다.
+    vectors: (샘플 수 x 63), labels: 샘플별 names 인덱스, sources: 샘플별 출처 (파일 경로, 영상이면 '#프레임 번호' 포함)"""
+    np.savez_compressed(path, vectors=np.asarray(vectors, dtype=np.float32).reshape(-1, 63), labels=np.asarray(labels, dtype=np.int32),
+                        names=np.array(names, dtype=str), sources=np.array(sources, dtype=str))
+
+def load_pose_dataset(path):
+    """save_pose_dataset으로 저장한 데이터셋 -> (vectors float64, labels, 포즈 이름 리스트, sources)"""
+    with np.load(path) as data:
+        return data['vectors'].astype(np.float64), data['labels'].astype(np.intp), [str(name) for name in data['names']], data['sources']
+
+
+def _best_scores(votes, similarities):
+    """pose_votes 결과를 프레임마다 (투표 1위 인덱스, 유사도 list)로 바꿉니다. 포즈가 없으면 프레임마다 None."""
+    if votes.shape[1] == 0: return [None] * len(votes)
+    return list(zip(np.argmax(votes, axis=1).tolist(), similarities.tolist()))
 
-        for pose_name, pose_landmarks in self.pose_library.items():
-            pose_vec = np.array(pose_landmarks)
-            
-            # 코사인 유사도 계산
-            similarity = np.dot(normalized_live, pose_vec) / (np.linalg.norm(normalized_live) * np.linalg.norm(pose_vec))
 
-            if similarity > max_similarity:
-                max_similarity = similarity
-                best_match_pose = pose_name
+def _smoothing_alpha(dt, cutoff):
+    tau = 1.0 / (2 * np.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
 
-        if max_similarity < self.similarity_threshold:
-            return "UNKNOWN", max_similarity
+def normalize_landmark_array(coords):
+    """(프레임 수 x 21 x 3) 원본 좌표를 한 번에 정규화합니다. (정규화된 (프레임 수 x 63) 배열, 유효 마스크)를 반환합니다."""
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 21, 3)
+    coords = coords - coords[:, :1, :]
+    scales = np.linalg.norm(coords[:, 9, :], axis=1)
+    valid = scales > 0
+    scales[~valid] = 1.0
+    return (coords / scales[:, np.newaxis, np.newaxis]).reshape(-1, 63), valid
 
-        return best_match_pose, max_similarity
\ No newline at end of file
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,68 @@
+# profiler.py
+# 프레임 단계별 소요 시간을 가볍게 재서 최근 window 프레임의 p50/p95/p99를 보여 주고, 필요하면 트레이스 파일로 남깁니다.
+# 트레이스는 Chrome trace 형식(JSON)이라 chrome://tracing 이나 https://ui.perfetto.dev 에서 바로 열 수 있습니다.
+import functools
+import json
+import threading
+import time
+from collections import deque
+import numpy as np
+
+
+class _Span:
+    __slots__ = ('profiler', 'name', 'start')
+    def __init__(self, profiler, name): self.profiler = profiler; self.name = name
+    def __enter__(self): self.start = time.perf_counter(); return self
+    def __exit__(self, *exc_info): self.profiler.add(self.name, self.start, time.perf_counter())
+
+
+class StageProfiler:
+    """단계 이름마다 최근 window개의 소요 시간(ms)을 링 버퍼에 보관합니다.
+    각 단계는 한 스레드에서만 기록한다고 가정하므로 락이 없습니다 (캡처 스레드와 메인 스레드는 서로 다른 단계 이름을 씀).
+    trace=True면 모든 구간을 (이름, 스레드, 시작, 끝, 프레임 번호)로 max_trace_events개까지 추가로 남깁니다."""
+    def __init__(self, window=240, trace=False, max_trace_events=500000):
+        self.window = window
+        self.trace_enabled = trace
+        self._rings = {}  # 이름 -> [소요 시간 배열, 누적 개수]
+        self._trace = deque(maxlen=max_trace_events)
+        self.frame_index = 0
+
+    def span(self, name):
+        """with profiler.span('stage'): ... 형태로 구간 하나를 잽니다."""
+        return _Span(self, name)
+
+    def add(self, name, start, end):
+        ring = self._rings.get(name)
+        if ring is None: ring = self._rings[name] = [np.zeros(self.window), 0]
+        ring[0][ring[1] % self.window] = (end - start) * 1000.0; ring[1] += 1
+        if self.trace_enabled: self._trace.append((name, threading.current_thread().name, start, end, self.frame_index))
+
+    def next_frame(self): self.frame_index += 1
+
+    def percentiles(self):
+        """{단계 이름: (p50, p95, p99)} (ms). 아직 기록이 없는 단계는 빠집니다."""
+        stats = {}
+        for name, (durations, count) in list(self._rings.items()):
+            if count == 0: continue
+            p50, p95, p99 = np.percentile(durations[:min(count, self.window)], (50, 95, 99))
+            stats[name] = (float(p50), float(p95), float(p99))
+        return stats
+
+    def dump_trace(self, path):
+        """기록한 구간을 Chrome trace 이벤트 파일로 씁니다. 기록한 이벤트 수를 반환합니다."""
+        events = list(self._trace)
+        origin = min((start for _, _, start, _, _ in events), default=0.0)
+        trace_events = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': thread, 'ts': (start - origin) * 1e6, 'dur': (end - start) * 1e6, 'args': {'frame': frame}}
+                        for name, thread, start, end, frame in events]
+        with open(path, 'w') as f: json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, f)
+        return len(trace_events)
+
+
+def profiled(name):
+    """self.profiler가 있는 클래스의 메소드 전체를 한 구간으로 재는 데코레이터."""
+    def decorator(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            with self.profiler.span(name): return method(self, *args, **kwargs)
+        return timed
+    return decorator
@@ -0,0 +1,61 @@
+# render_cache.py
+# 매 프레임 다시 그리던 텍스트/노트 그림을 Surface로 캐시합니다.
+from collections import OrderedDict
+import pygame
+
+
+class TextCache:
+    """(폰트, 텍스트, 색) 키로 렌더된 텍스트 Surface를 보관하는 LRU 캐시.
+    점수/콤보처럼 값이 바뀔 때만 새로 렌더되고, 오래 안 쓴 항목부터 버립니다."""
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self._entries.get(key)
+        if surface is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self._entries[key] = font.render(text, True, color)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self._entries.clear()
+
+
+class NoteSprites:
+    """포즈마다 노트 머리(색 원 + 포즈 이름)를 한 장의 Surface로 미리 그려 둡니다.
+    color_map에 있는 포즈는 생성 시 바로, 없는 포즈는 처음 쓸 때 default_color로 만듭니다."""
+    def __init__(self, color_map, radius, font, default_color, label_color=(0, 0, 0)):
+        self.color_map = color_map
+        self.radius = radius
+        self.font = font
+        self.default_color = default_color
+        self.label_color = label_color
+        self._sprites = {pose: self._build(pose) for pose in color_map}
+
+    def _build(self, pose):
+        label = self.font.render(pose, True, self.label_color)
+        width = max(self.radius * 2, label.get_width())
+        height = max(self.radius * 2, label.get_height())
+        sprite = pygame.Surface((width, height), pygame.SRCALPHA)
+        center = (width // 2, height // 2)
+        pygame.draw.circle(sprite, self.color_map.get(pose, self.default_color), center, self.radius)
+        sprite.blit(label, label.get_rect(center=center))
+        return sprite
+
+    def get(self, pose):
+        sprite = self._sprites.get(pose)
+        if sprite is None: sprite = self._sprites[pose] = self._build(pose)
+        return sprite
+
+    def blit(self, surface, pose, center):
+        sprite = self.get(pose)
+        surface.blit(sprite, (center[0] - sprite.get_width() // 2, center[1] - sprite.get_height() // 2))
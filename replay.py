@@ -0,0 +1,93 @@
+# replay.py
+# 기록된 랜드마크 로그(.hxlm)를 카메라/MediaPipe/화면 없이 판정 엔진에 흘려보내 점수를 다시 계산합니다.
+# 사용법: python replay.py [--poses poses.json] [--tick-rate 60] recordings/*.hxlm
+import argparse
+import time
+import numpy as np
+from pose_recognition import PoseComparator, StreamingPoseClassifier, normalize_landmark_array
+from note_system import NoteController
+from judgement_engine import JudgementEngine, apply_score
+from landmark_log import LandmarkLog
+from fixed_step import FixedStepClock
+
+
+class ReplaySource:
+    """로그의 모든 프레임을 게임과 같은 StreamingPoseClassifier로 미리 분류해 두고,
+    게임 시각 기준 가장 최근 프레임의 (캡처 시각, 포즈, 손 위치)를 돌려줍니다."""
+    def __init__(self, log, pose_comparator):
+        frames = log.frames
+        self.timestamps = np.asarray(frames['t'], dtype=np.float64); self._times = self.timestamps.tolist()  # 커서 이동은 파이썬 float로
+        has_hand = np.asarray(frames['has_hand'], dtype=bool)
+
+        normalized, valid = normalize_landmark_array(frames['landmarks'])
+        self.poses, _ = StreamingPoseClassifier(pose_comparator).classify_sequence(normalized, valid & has_hand, self.timestamps)
+        positions = log.screen_hand_positions().tolist() if len(frames) else []
+        self.hand_positions = [tuple(pos) if ok else None for pos, ok in zip(positions, has_hand)]
+
+        self.end_time = self.timestamps[-1] if len(self.timestamps) else 0.0
+        self._cursor = -1
+
+    def sample(self, game_time):
+        """game_time은 단조 증가한다고 가정합니다. 아직 프레임이 없으면 None."""
+        while self._cursor + 1 < len(self._times) and self._times[self._cursor + 1] <= game_time:
+            self._cursor += 1
+        if self._cursor < 0: return None
+        return self._times[self._cursor], self.poses[self._cursor], self.hand_positions[self._cursor]
+
+
+def replay_log(log, pose_comparator, tick_rate=60.0):
+    """로그 하나를 tick_rate 프레임으로 재생합니다. 게임 로직은 게임 루프와 같은 FixedStepClock(240Hz) 스텝으로 진행하며
+    (판정 결과가 달라지지 않는 스텝은 건너뜀), 같은 로그/포즈 파일이면 항상 같은 결과가 나옵니다."""
+    meta = log.metadata
+    mode = meta.get('judgement_mode', 'distance')
+    note_controller = NoteController(None, speed=meta['note_speed'], beatmap=meta['beatmap']['notes'], time_based=mode == 'time')
+    judgement_engine = JudgementEngine(meta['judgement_line_y'], meta['thresholds'], meta['note_speed'], meta['swipe_params'], meta['note_radius'], mode=mode, input_offset=meta.get('input_offset', 0.0))
+    source = ReplaySource(log, pose_comparator)
+
+    # time 모드 판정은 노트 위치를 보지 않고 샘플 시각/입력만으로 정해지므로(같은 샘플이면 check_judgements가 건너뜀),
+    # 새 샘플이 들어온 첫 스텝만 진행하고 나머지 스텝은 시계만 넘깁니다. 그 사이 생성될 노트는 다음 샘플 스텝에서 한꺼번에 생성됩니다.
+    score = combo = max_combo = 0; counts = {}; time_mode = mode == 'time'; last_sample_time = None
+    frame_time = 1.0 / tick_rate; tick = 0; step_clock = FixedStepClock()
+    while not note_controller.is_finished():
+        tick += 1; target_time = tick * frame_time
+        if target_time > source.end_time + frame_time: break  # 플레이 도중 기록이 끝남
+        sample = source.sample(target_time)
+        if sample is None: continue
+        sample_time, current_pose, hand_pos = sample
+
+        steps = step_clock.advance(target_time)
+        if time_mode:
+            if sample_time == last_sample_time: continue
+            last_sample_time = sample_time; steps = steps[:1]
+        for game_time, delta_time in steps:
+            note_controller.update(game_time, delta_time, not time_mode)
+            judgements = judgement_engine.check_judgements(note_controller.notes, current_pose, hand_pos, game_time, delta_time, sample_time=sample_time)
+            if not judgements: continue  # 대부분의 스텝 (노트 제거도 없으니 끝났는지 다시 볼 필요 없음)
+            for j in judgements:
+                score, combo = apply_score(j, score, combo); max_combo = max(max_combo, combo)
+                counts[j['judgement']] = counts.get(j['judgement'], 0) + 1
+            note_controller.resolve_judgements(judgements, meta['judgement_line_y'])
+            if note_controller.is_finished(): break
+
+    return {'path': log.path, 'score': score, 'max_combo': max_combo, 'judgements': counts,
+            'complete': note_controller.is_finished(), 'frames': len(log), 'ticks': tick}
+
+
+def replay_many(paths, pose_comparator, tick_rate=60.0):
+    return [replay_log(LandmarkLog(path), pose_comparator, tick_rate) for path in paths]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded landmark logs headlessly.")
+    parser.add_argument('logs', nargs='+')
+    parser.add_argument('--poses', default='poses.json')
+    parser.add_argument('--tick-rate', type=float, default=60.0)
+    args = parser.parse_args()
+
+    pose_comparator = PoseComparator(args.poses)
+    started = time.perf_counter()
+    results = replay_many(args.logs, pose_comparator, args.tick_rate)
+    elapsed = time.perf_counter() - started
+    for r in results:
+        print(f"{r['path']}: score={r['score']} max_combo={r['max_combo']} complete={r['complete']} {r['judgements']}")
+    print(f"Replayed {len(results)} plays in {elapsed:.3f}s ({len(results) / max(elapsed, 1e-9) * 60:.0f} plays/min)")
@@ -0,0 +1,56 @@
+# resource_loader.py
+# 로딩 화면이 도는 동안 무거운 준비 작업(cv2/mediapipe import, 카메라 열기, 모델 생성, 이미지 디코딩)을 백그라운드 스레드에서 실행합니다.
+import threading
+import time
+
+
+class BackgroundLoader:
+    """{이름: 인자 없는 함수} 작업을 각각 별도 데몬 스레드에서 동시에 실행합니다.
+    카메라 열기처럼 I/O를 기다리는 작업과 import/모델 생성이 겹쳐서 진행됩니다.
+    메인 루프는 매 프레임 poll()만 부르고, 모든 작업이 끝나면 on_ready(결과 dict)가 메인 스레드에서 한 번 호출됩니다.
+    작업 중 예외가 나면 poll()이 그 예외를 메인 스레드에서 다시 던집니다."""
+    def __init__(self, tasks, on_ready):
+        self.tasks = tasks
+        self.on_ready = on_ready
+        self.results = {}
+        self.durations = {}  # 작업별 소요 시간(초)
+        self._errors = []
+        self._lock = threading.Lock()
+        self._threads = []
+        self.started = None
+        self.finished = False
+
+    def start(self):
+        self.started = time.perf_counter()
+        for name, task in self.tasks.items():
+            thread = threading.Thread(target=self._run, args=(name, task), name=f"Loader-{name}", daemon=True)
+            thread.start(); self._threads.append(thread)
+        return self
+
+    def _run(self, name, task):
+        started = time.perf_counter()
+        try: result = task()
+        except BaseException as error:
+            with self._lock: self._errors.append(error)
+            return
+        with self._lock: self.results[name] = result; self.durations[name] = time.perf_counter() - started
+
+    @property
+    def progress(self):
+        """(끝난 작업 수, 전체 작업 수)"""
+        with self._lock: return len(self.results) + len(self._errors), len(self.tasks)
+
+    def poll(self):
+        """모든 작업이 끝났으면 on_ready를 (한 번만) 호출하고 True를 반환합니다."""
+        if self.finished: return True
+        with self._lock:
+            if self._errors: raise self._errors[0]
+            if len(self.results) < len(self.tasks): return False
+        self.finished = True
+        self.on_ready(self.results)
+        return True
+
+    def wait(self, timeout=None):
+        """모든 작업 스레드가 끝날 때까지 기다린 뒤 poll() 결과를 반환합니다 (헤드리스/벤치마크용)."""
+        for thread in self._threads: thread.join(timeout)
+        return self.poll()
@@ -0,0 +1,94 @@
+# session_log.py
+# 플레이 한 판의 모든 판정(노트, 판정 종류, 타이밍 오차, 포즈 유사도, 그 시점 점수/콤보)을 추가 전용 바이너리 로그로 남깁니다.
+# 게임 루프는 큐에 튜플을 넣기만 하고, 배열 변환과 파일 쓰기는 백그라운드 스레드가 모아서 한 번에 합니다.
+#
+# 파일 구조: MAGIC(4) | version(uint16) | 메타데이터 길이(uint32) | 메타데이터 JSON(utf-8) | JUDGEMENT_DTYPE 레코드...
+import json
+import struct
+import threading
+from collections import deque
+import numpy as np
+from beatmap_format import NOTE_TYPES
+
+MAGIC = b'HXSL'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+JUDGEMENTS = ('PERFECT', 'GREAT', 'MISS', 'HOLD_SUCCESS', 'HOLD_BREAK', 'SWIPE_SUCCESS', 'SWIPE_BREAK')
+JUDGEMENT_IDS = {name: i for i, name in enumerate(JUDGEMENTS)}
+NOTE_TYPE_IDS = {name: i for i, name in enumerate(NOTE_TYPES)}
+
+# 판정 하나 = 36 bytes. t는 게임 시작 기준 판정 시각(초), note_time은 노트 생성 시각(비트맵의 time, 노트 식별용)
+# pose는 메타데이터 'poses'의 인덱스, error는 PERFECT/GREAT 입력의 타이밍 오차(초, 양수면 늦음, 없으면 NaN)
+JUDGEMENT_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('note_time', '<f8'),
+    ('player', 'u1'),
+    ('note_type', 'u1'),
+    ('pose', 'u1'),
+    ('judgement', 'u1'),
+    ('error', '<f4'),
+    ('similarity', '<f4'),
+    ('score', '<i4'),
+    ('combo', '<i4'),
+])
+
+
+class SessionLogger:
+    """한 판의 판정 로그를 씁니다. log()는 큐에 넣기만 하므로 프레임 루프에서 불러도 가볍고,
+    쓰기 스레드가 flush_interval초마다 쌓인 레코드를 배열 하나로 만들어 파일 끝에 붙입니다.
+    게임이 비정상 종료돼도 마지막 flush까지의 레코드는 읽을 수 있습니다."""
+    def __init__(self, path, metadata, flush_interval=0.5):
+        self.path = path
+        self.metadata = dict(metadata)
+        self.flush_interval = flush_interval
+        self.record_count = 0
+        self._queue = deque()  # append/popleft는 스레드 간에 안전
+        self._stop = threading.Event()
+        self._file = open(path, 'wb')
+        meta = json.dumps(self.metadata).encode('utf-8')
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(meta)) + meta)
+        self._thread = threading.Thread(target=self._run, name="SessionLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, t, note_time, player, note_type, pose, judgement, error, similarity, score, combo):
+        self._queue.append((t, note_time, player, note_type, pose, judgement, np.nan if error is None else error, similarity, score, combo))
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval): self._flush()
+        self._flush()
+
+    def _flush(self):
+        count = len(self._queue)
+        if count == 0: return
+        records = np.array([self._queue.popleft() for _ in range(count)], dtype=JUDGEMENT_DTYPE)
+        self._file.write(records.tobytes()); self._file.flush()
+        self.record_count += count
+
+    def close(self):
+        """남은 레코드를 쓰고 파일을 닫습니다 (쓰기 스레드가 끝날 때까지 기다림)."""
+        if self._file is None: return
+        self._stop.set(); self._thread.join()
+        self._file.close(); self._file = None
+        print(f"Saved {self.record_count} judgements to {self.path}")
+
+
+class SessionLog:
+    """기록된 세션 로그 하나. records는 JUDGEMENT_DTYPE 구조체 배열(메모리 맵)이라 큰 파일도 필요한 구간만 읽습니다."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, meta_len = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"'{path}' is not a session log (v{VERSION}).")
+            self.metadata = json.loads(f.read(meta_len).decode('utf-8'))
+            f.seek(0, 2); size = f.tell()
+        offset = HEADER.size + meta_len
+        count = (size - offset) // JUDGEMENT_DTYPE.itemsize  # 쓰는 도중에 읽어도 완성된 레코드까지만
+        self.records = np.memmap(path, dtype=JUDGEMENT_DTYPE, mode='r', offset=offset, shape=(count,)) if count else np.zeros(0, dtype=JUDGEMENT_DTYPE)
+
+    def __len__(self): return len(self.records)
+
+    def chunks(self, size=65536):
+        """records를 size개씩 잘라 차례로 돌려줍니다 (한 번에 메모리에 올리지 않음)."""
+        for start in range(0, len(self.records), size): yield self.records[start:start + size]
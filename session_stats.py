@@ -0,0 +1,114 @@
+# session_stats.py
+# 여러 세션 로그(.hxsl)를 모아 타이밍 오차 히스토그램과 포즈별 미스율을 냅니다.
+# 로그를 하나씩, 큰 로그는 청크 단위로 읽어 누적하므로 로그가 계속 쌓여도 메모리는 히스토그램/포즈 표 크기만큼만 씁니다.
+# 사용법: python session_stats.py sessions/ [more.hxsl ...] [--range-ms 200] [--bins 40] [--json stats.json]
+import argparse
+import json
+import os
+import time
+import numpy as np
+from session_log import SessionLog, JUDGEMENTS, JUDGEMENT_IDS
+
+HEAD_JUDGEMENTS = [JUDGEMENT_IDS[name] for name in ('PERFECT', 'GREAT', 'MISS')]  # 노트마다 한 번씩 나오는 머리 판정
+LONG_JUDGEMENTS = [JUDGEMENT_IDS[name] for name in ('HOLD_SUCCESS', 'HOLD_BREAK', 'SWIPE_SUCCESS', 'SWIPE_BREAK')]
+BREAK_JUDGEMENTS = [JUDGEMENT_IDS[name] for name in ('HOLD_BREAK', 'SWIPE_BREAK')]
+
+
+class SessionStats:
+    """세션 로그 누적 집계. add_log()를 로그마다 부르고 report()로 결과 dict를 받습니다.
+    타이밍 오차는 고정 구간 히스토그램과 합/제곱합으로, 포즈별 판정은 (포즈 x 판정) 개수 표로만 들고 있습니다."""
+    def __init__(self, range_ms=200.0, bins=40, chunk_size=65536):
+        self.edges = np.linspace(-range_ms, range_ms, bins + 1)
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.early = 0; self.late = 0  # 히스토그램 범위 밖
+        self.error_count = 0; self.error_sum = 0.0; self.error_sq_sum = 0.0
+        self.pose_counts = {}  # 포즈 이름 -> 판정별 개수
+        self.pose_error_sums = {}  # 포즈 이름 -> [오차 합(ms), 개수]
+        self.chunk_size = chunk_size
+        self.sessions = 0; self.judgements = 0
+        self.score_count = 0; self.score_sum = 0; self.best_score = None
+
+    def add_log(self, log):
+        names = log.metadata.get('poses', [])
+        final_scores = {}
+        for chunk in log.chunks(self.chunk_size):
+            errors = chunk['error'].astype(np.float64) * 1000.0
+            has_error = ~np.isnan(errors); hit_errors = errors[has_error]
+            self.histogram += np.histogram(hit_errors, self.edges)[0]
+            self.early += int(np.count_nonzero(hit_errors < self.edges[0])); self.late += int(np.count_nonzero(hit_errors > self.edges[-1]))
+            self.error_count += len(hit_errors); self.error_sum += float(hit_errors.sum()); self.error_sq_sum += float(np.square(hit_errors).sum())
+
+            poses = chunk['pose'].astype(np.intp)
+            counts = np.bincount(poses * len(JUDGEMENTS) + chunk['judgement'], minlength=256 * len(JUDGEMENTS)).reshape(256, len(JUDGEMENTS))
+            error_sums = np.bincount(poses[has_error], weights=hit_errors, minlength=256); error_counts = np.bincount(poses[has_error], minlength=256)
+            for pose in np.flatnonzero(counts.sum(axis=1)):
+                name = names[pose] if pose < len(names) else f"#{pose}"
+                self.pose_counts[name] = self.pose_counts.get(name, np.zeros(len(JUDGEMENTS), dtype=np.int64)) + counts[pose]
+                totals = self.pose_error_sums.setdefault(name, [0.0, 0]); totals[0] += float(error_sums[pose]); totals[1] += int(error_counts[pose])
+
+            # 플레이어별 마지막 레코드의 점수 = 그 판의 최종 점수
+            players = chunk['player']
+            for player in np.unique(players): final_scores[int(player)] = int(chunk['score'][np.flatnonzero(players == player)[-1]])
+            self.judgements += len(chunk)
+        self.sessions += 1
+        for score in final_scores.values():
+            self.score_count += 1; self.score_sum += score; self.best_score = score if self.best_score is None else max(self.best_score, score)
+
+    def report(self):
+        mean = self.error_sum / self.error_count if self.error_count else 0.0
+        std = float(np.sqrt(max(self.error_sq_sum / self.error_count - mean ** 2, 0.0))) if self.error_count else 0.0
+        poses = {}
+        for name, counts in sorted(self.pose_counts.items()):
+            notes = int(counts[HEAD_JUDGEMENTS].sum()); long_notes = int(counts[LONG_JUDGEMENTS].sum())
+            misses = int(counts[JUDGEMENT_IDS['MISS']]); breaks = int(counts[BREAK_JUDGEMENTS].sum()); error_sum, error_count = self.pose_error_sums[name]
+            poses[name] = {'notes': notes, 'misses': misses, 'miss_rate': misses / notes if notes else 0.0, 'breaks': breaks, 'break_rate': breaks / long_notes if long_notes else 0.0,
+                           'mean_error_ms': error_sum / error_count if error_count else None, 'judgements': {JUDGEMENTS[i]: int(c) for i, c in enumerate(counts) if c}}
+        return {'sessions': self.sessions, 'judgements': self.judgements,
+                'scores': {'count': self.score_count, 'mean': self.score_sum / self.score_count if self.score_count else None, 'best': self.best_score},
+                'timing': {'hits': self.error_count, 'mean_ms': mean, 'std_ms': std, 'earlier': self.early, 'later': self.late,
+                           'edges_ms': self.edges.tolist(), 'histogram': self.histogram.tolist()},
+                'poses': poses}
+
+
+def find_logs(paths):
+    """파일과 디렉터리(하위 폴더 포함 *.hxsl)를 로그 경로 목록으로 펼칩니다."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                for name in sorted(names):
+                    if name.endswith('.hxsl'): yield os.path.join(directory, name)
+        else: yield path
+
+
+def print_report(report, bar_width=40):
+    scores = report['scores']; timing = report['timing']
+    print(f"{report['sessions']} sessions, {report['judgements']} judgements" + (f", score mean {scores['mean']:.0f} best {scores['best']}" if scores['count'] else ""))
+    print(f"timing error: mean {timing['mean_ms']:+.1f} ms, std {timing['std_ms']:.1f} ms over {timing['hits']} hits "
+          f"({timing['earlier']} earlier than {timing['edges_ms'][0]:+.0f} ms, {timing['later']} later than {timing['edges_ms'][-1]:+.0f} ms)")
+    peak = max(max(timing['histogram']), 1)
+    for low, high, count in zip(timing['edges_ms'][:-1], timing['edges_ms'][1:], timing['histogram']):
+        print(f"  {low:+7.1f} .. {high:+7.1f} ms | {'#' * int(round(bar_width * count / peak)):<{bar_width}} {count}")
+    print(f"{'pose':<12}{'notes':>8}{'misses':>8}{'miss%':>8}{'breaks':>8}{'break%':>8}{'mean error':>12}")
+    for name, pose in report['poses'].items():
+        error = f"{pose['mean_error_ms']:+.1f} ms" if pose['mean_error_ms'] is not None else "-"
+        print(f"{name:<12}{pose['notes']:>8}{pose['misses']:>8}{pose['miss_rate']:>8.1%}{pose['breaks']:>8}{pose['break_rate']:>8.1%}{error:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Aggregate session judgement logs into timing-error histograms and per-pose miss rates.")
+    parser.add_argument('paths', nargs='+', help="session logs (.hxsl) or directories containing them")
+    parser.add_argument('--range-ms', type=float, default=200.0, help="histogram covers -RANGE..+RANGE ms")
+    parser.add_argument('--bins', type=int, default=40)
+    parser.add_argument('--json', help="also write the aggregated report as JSON")
+    args = parser.parse_args()
+
+    stats = SessionStats(args.range_ms, args.bins); started = time.perf_counter()
+    for path in find_logs(args.paths):
+        try: stats.add_log(SessionLog(path))
+        except (ValueError, OSError) as e: print(f"Skipping {path}: {e}")
+    elapsed = time.perf_counter() - started
+    report = stats.report()
+    print_report(report)
+    print(f"Aggregated in {elapsed:.3f}s")
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
@@ -0,0 +1,97 @@
+# simulation.py
+# Game 상태 머신을 헤드리스 모드로 돌립니다. 창/웹캠/MediaPipe 없이 합성 시계로 update_playing을 최대 속도로 반복합니다.
+# 사용법: python simulation.py [--charts 100] [--seed 0] [--tick-rate 60] [--players 1] [--difficulty 5 --bpm 120] [beatmap.json ...]
+import argparse
+import json
+import random
+import time
+from main import Game, generate_test_beatmap, SWIPE_PARAMS, JUDGEMENT_LINE_Y, NOTE_SPEED, NOTE_RADIUS, JUDGEMENT_THRESHOLDS
+from charting import ChartEngine
+
+BREAK_JUDGEMENTS = ('MISS', 'HOLD_BREAK', 'SWIPE_BREAK')
+
+
+class SimulationClock:
+    """Game.time_source로 쓰는 합성 시계. advance()로만 흐릅니다."""
+    def __init__(self): self.now = 0.0
+    def __call__(self): return self.now
+    def advance(self, seconds): self.now += seconds
+
+
+def autoplay_input(game, player=None):
+    """항상 정답을 내는 플레이어. 지금 입력이 필요한 가장 앞의 노트에 맞춰 (포즈, 손 위치)를 고릅니다.
+    player를 주면 그 플레이어의 레인/노트 기준 (여러 명 모드)."""
+    player = player or game.players[0]; start_x = player.lane_x
+    for note in player.note_controller.notes:
+        if note.is_failed or (note.is_judged and not (note.is_holding or note.is_swiping)): continue
+        if note.note_type == 'swipe' and note.is_swiping:
+            target_x = start_x + SWIPE_PARAMS['distance'] if note.direction == "RIGHT" else start_x - SWIPE_PARAMS['distance']
+            return note.target_pose, (target_x, JUDGEMENT_LINE_Y)
+        return note.target_pose, (start_x, JUDGEMENT_LINE_Y)
+    return "UNKNOWN", (start_x, JUDGEMENT_LINE_Y)
+
+
+def simulate_beatmap(beatmap, input_fn=autoplay_input, tick_rate=60.0, max_time=None, player_count=1):
+    """비트맵 하나를 끝까지 플레이합니다. input_fn(game) -> (pose, hand_pos)가 매 틱 입력을 만듭니다.
+    tick_rate는 화면 프레임/입력 주기이고, 게임 로직은 그 안에서 SIMULATION_STEP(240Hz) 간격으로 진행됩니다.
+    player_count > 1이면 input_fn(game, player)를 플레이어마다 불러 같은 비트맵을 동시에 진행합니다 (점수/콤보는 1P 기준)."""
+    notes = beatmap['notes'] if isinstance(beatmap, dict) else beatmap
+    clock = SimulationClock()
+    game = Game(headless=True, time_source=clock, beatmap=notes, player_count=player_count)
+    game.start_game()
+    if max_time is None:
+        max_time = max((n['time'] + n.get('duration', 0) for n in notes), default=0.0) + JUDGEMENT_LINE_Y / game.note_controller.note_speed + 5.0
+
+    delta_time = 1.0 / tick_rate; max_combo = 0; counts = {}
+    game.process_judgement = _counting(game.process_judgement, counts)
+    while game.game_state == "PLAYING" and clock.now < max_time:
+        clock.advance(delta_time); game.delta_time = delta_time
+        if player_count > 1: game.capture_pipeline.inject(None, None, players=[input_fn(game, player) for player in game.players])
+        else: pose, hand_pos = input_fn(game); game.capture_pipeline.inject(pose, hand_pos)
+        game.update_playing()
+        max_combo = max(max_combo, game.combo)
+    game.quit()
+
+    breaks = sum(counts.get(j, 0) for j in BREAK_JUDGEMENTS)
+    return {'score': game.score, 'max_combo': max_combo, 'judgements': counts, 'notes': len(notes),
+            'finished': game.game_state == "RESULTS", 'cleared': game.game_state == "RESULTS" and breaks == 0, 'sim_time': clock.now}
+
+
+def _counting(process_judgement, counts):
+    def wrapper(judgement_info, player=None):
+        counts[judgement_info['judgement']] = counts.get(judgement_info['judgement'], 0) + 1
+        process_judgement(judgement_info, player)
+    return wrapper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batch-simulate beatmaps with an autoplayer, no window or camera.")
+    parser.add_argument('beatmaps', nargs='*', help="beatmap JSON files (default: generated test charts)")
+    parser.add_argument('--charts', type=int, default=100, help="number of generate_test_beatmap charts to simulate")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tick-rate', type=float, default=60.0, help="frame/input rate; game logic always steps at 240 Hz")
+    parser.add_argument('--players', type=int, default=1, help="simulate N players on split lanes")
+    parser.add_argument('--difficulty', type=float, default=None, help="simulate charting-engine charts at this difficulty instead of random test charts")
+    parser.add_argument('--bpm', type=float, default=120)
+    args = parser.parse_args()
+
+    if args.beatmaps:
+        charts = []
+        for path in args.beatmaps:
+            with open(path, 'r') as f: charts.append((path, json.load(f)))
+    elif args.difficulty is not None:
+        engine = ChartEngine(NOTE_SPEED, JUDGEMENT_LINE_Y, NOTE_RADIUS, JUDGEMENT_THRESHOLDS['GREAT'])
+        try: charts = [(f"chart_{i}", engine.generate(["DEFAULT", "GRAB", "PICK"], args.bpm, args.difficulty, length=60.0, seed=args.seed + i).to_notes()) for i in range(args.charts)]
+        except ValueError as e: parser.error(str(e))
+    else:
+        rng = random.Random(args.seed)
+        charts = [(f"test_chart_{i}", generate_test_beatmap(["DEFAULT", "GRAB", "PICK"], rng)) for i in range(args.charts)]
+
+    started = time.perf_counter()
+    results = [(name, simulate_beatmap(chart, tick_rate=args.tick_rate, player_count=args.players)) for name, chart in charts]
+    elapsed = time.perf_counter() - started
+    for name, r in results:
+        if not r['cleared'] or args.beatmaps:
+            print(f"{name}: cleared={r['cleared']} max_score={r['score']} max_combo={r['max_combo']} {r['judgements']}")
+    cleared = sum(r['cleared'] for _, r in results)
+    print(f"{cleared}/{len(results)} charts cleared, simulated in {elapsed:.3f}s ({sum(r['sim_time'] for _, r in results) / max(elapsed, 1e-9):.0f}x real time)")